@@ -0,0 +1,62 @@
+"""Benchmark of MapManager.floodfill with a point predicate (frontier BFS) vs. a mask (scipy.ndimage.label).
+
+Requires a StarCraft II installation: each map is started in its own process, the benchmark runs after
+MapManager.on_start for all start locations, and the bot leaves the game afterward.
+"""
+from argparse import ArgumentParser
+from multiprocessing import Process
+from timeit import repeat
+
+import numpy
+from sc2.data import Race
+from sc2.player import Bot
+
+from avocados import api
+from game_runner import GameRunner
+
+
+AIE_S2_2025_MAPS = [
+    'MagannathaAIE_v2',
+    'UltraloveAIE_v2',
+    'LeyLinesAIE_v3',
+    'TorchesAIE_v4',
+    'PylonAIE_v4',
+    'PersephoneAIE_v4',
+]
+
+
+def run_map(map_name: str, number: int, max_distance: float) -> None:
+    from avocados.bot.avocados import AvocaDOS
+    bot = AvocaDOS(leave_at=1)
+
+    async def benchmark() -> None:
+        map_manager = bot.map
+        heights = map_manager.terrain_height
+        for location in map_manager.all_start_locations:
+            height = heights[location.center]
+            region_bfs = map_manager.floodfill(location.center, lambda p: heights[p] == height,
+                                               max_distance=max_distance)
+            region_mask = map_manager.floodfill(location.center, heights.data == height, max_distance=max_distance)
+            assert region_bfs.points == region_mask.points
+            bfs = repeat(lambda: map_manager.floodfill(location.center, lambda p: heights[p] == height,
+                                                       max_distance=max_distance), number=1, repeat=number)
+            mask = repeat(lambda: map_manager.floodfill(location.center, heights.data == height,
+                                                        max_distance=max_distance), number=1, repeat=number)
+            print(f"{map_name:>18} {location.center}: {region_mask.size:5d} cells, "
+                  f"BFS {1000 * numpy.median(bfs):7.3f} ms, label {1000 * numpy.median(mask):7.3f} ms")
+
+    api.register_on_start(benchmark)
+    GameRunner(bot=Bot(Race.Terran, api, name='AvocaDOS'), map_=map_name).run()
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--maps", nargs='+', default=AIE_S2_2025_MAPS)
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--max-distance", type=float, default=32)
+    args = parser.parse_args()
+
+    for map_name in args.maps:
+        process = Process(target=run_map, args=(map_name, args.repeat, args.max_distance))
+        process.start()
+        process.join()
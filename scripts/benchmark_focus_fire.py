@@ -0,0 +1,33 @@
+from argparse import ArgumentParser
+from timeit import repeat
+
+import numpy
+
+from avocados.combat.focusfire import allocate_targets
+
+
+parser = ArgumentParser()
+parser.add_argument("--units", type=int, default=40)
+parser.add_argument("--enemies", type=int, default=40)
+parser.add_argument("--repeat", type=int, default=1000)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+rng = numpy.random.default_rng(args.seed)
+marine_stats = numpy.array([5.0, 6.0, 1, 5.0, 6.0, 1])
+kwargs = dict(
+    attacker_positions=rng.uniform(0, 8, size=(args.units, 2)),
+    attacker_radii=numpy.full(args.units, 0.375),
+    attacker_stats=numpy.tile(marine_stats, (args.units, 1)),
+    target_positions=rng.uniform(6, 14, size=(args.enemies, 2)),
+    target_radii=numpy.full(args.enemies, 0.375),
+    target_flying=numpy.zeros(args.enemies, dtype=bool),
+    target_hp=numpy.full(args.enemies, 35.0),
+    target_armor=numpy.zeros(args.enemies),
+    target_priorities=rng.uniform(0.5, 0.7, size=args.enemies),
+)
+
+times = repeat(lambda: allocate_targets(**kwargs), number=1, repeat=args.repeat)
+assignment = allocate_targets(**kwargs)
+print(f"{args.units}v{args.enemies}: {1000 * numpy.median(times):.3f} ms median, {1000 * min(times):.3f} ms min, "
+      f"{numpy.count_nonzero(assignment >= 0)} attackers on {len(numpy.unique(assignment[assignment >= 0]))} targets")
@@ -0,0 +1,40 @@
+from argparse import ArgumentParser
+from timeit import repeat
+
+import numpy
+from scipy.signal import convolve2d
+from sc2.position import Point2
+
+from avocados.geometry.field import Field
+from avocados.geometry.util import Rectangle
+
+
+parser = ArgumentParser()
+parser.add_argument("--width", type=int, default=176)
+parser.add_argument("--height", type=int, default=140)
+parser.add_argument("--repeat", type=int, default=200)
+parser.add_argument("--seed", type=int, default=0)
+args = parser.parse_args()
+
+rng = numpy.random.default_rng(args.seed)
+field = Field(rng.uniform(size=(args.width, args.height)) < 0.9, offset=Point2((8, 8)))
+areas = {
+    '40x40': Rectangle(60, 50, 40, 40),
+    'full map': Rectangle(field.offset.x, field.offset.y, args.width, args.height),
+}
+
+
+def rebuild_and_sum(footprint: tuple[int, int], area: Rectangle) -> numpy.ndarray:
+    field.invalidate()
+    return field.window_sums(footprint, area)
+
+
+for name, area in areas.items():
+    for footprint in [(2, 2), (3, 3), (5, 5), (7, 5)]:
+        kernel = numpy.ones(footprint, dtype=int)
+        convolve = repeat(lambda: convolve2d(field[area].astype(int), kernel, mode='same'),
+                          number=1, repeat=args.repeat)
+        cold = repeat(lambda: rebuild_and_sum(footprint, area), number=1, repeat=args.repeat)
+        warm = repeat(lambda: field.window_sums(footprint, area), number=1, repeat=args.repeat)
+        print(f"{name:>8} {footprint[0]}x{footprint[1]}: convolve2d {1000 * numpy.median(convolve):.3f} ms, "
+              f"rebuilt table {1000 * numpy.median(cold):.3f} ms, cached table {1000 * numpy.median(warm):.3f} ms")
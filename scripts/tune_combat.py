@@ -0,0 +1,166 @@
+"""Offline tuning of the CombatParameters on simulated micro scenarios.
+
+Example:
+    python scripts/tune_combat.py --method cmaes --iterations 20 --output combat_parameters.json
+
+The output file contains the best parameter sets ranked by score and can be loaded by the bot via
+AvocaDOS(combat_parameters=...).
+"""
+import itertools
+import json
+from argparse import ArgumentParser
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import asdict
+from pathlib import Path
+
+import numpy
+from numpy import ndarray
+from sc2.ids.unit_typeid import UnitTypeId
+
+from avocados.combat.parameters import CombatParameters
+from avocados.combat.simulator import simulate
+
+
+# Same scenarios as in run_micro.py
+SCENARIOS: list[tuple[dict[UnitTypeId, int], dict[UnitTypeId, int]]] = [
+    ({UnitTypeId.MARINE: 8}, {UnitTypeId.MARINE: 8}),
+    ({UnitTypeId.MARINE: 3}, {UnitTypeId.SIEGETANKSIEGED: 1}),
+    ({UnitTypeId.MARINE: 8}, {UnitTypeId.SIEGETANKSIEGED: 1}),
+    ({UnitTypeId.MARINE: 8}, {UnitTypeId.ZEALOT: 4}),
+    ({UnitTypeId.MARINE: 8}, {UnitTypeId.ZERGLING: 8, UnitTypeId.BANELING: 4}),
+    ({UnitTypeId.REAPER: 8}, {UnitTypeId.REAPER: 8}),
+    ({UnitTypeId.REAPER: 8}, {UnitTypeId.MARINE: 12}),
+    ({UnitTypeId.REAPER: 8}, {UnitTypeId.ZERGLING: 8, UnitTypeId.BANELING: 4}),
+]
+
+BOUNDS: dict[str, tuple[float, float]] = {
+    'attack_priority_base_weight': (0.0, 1.0),
+    'attack_priority_weakness_weight': (0.0, 0.5),
+    'attack_priority_distance_weight': (0.0, 0.5),
+    'attack_priority_base_weakness_correlation': (-0.25, 0.25),
+    'attack_priority_base_distance_correlation': (-0.25, 0.25),
+    'attack_priority_weakness_distance_correlation': (-0.25, 0.25),
+    'attack_priority_threshold': (0.0, 1.0),
+    'defense_priority_threshold': (0.0, 1.0),
+}
+
+
+def get_bounds() -> tuple[ndarray, ndarray]:
+    lower, upper = zip(*(BOUNDS[name] for name in CombatParameters.names()))
+    return numpy.asarray(lower), numpy.asarray(upper)
+
+
+def evaluate(values: ndarray, seeds: list[int]) -> float:
+    """Mean rating over all scenarios and seeds. All candidates use the same seeds."""
+    parameters = CombatParameters.from_array(values)
+    ratings = [simulate(units, parameters, seed=seed).get_rating() for units in SCENARIOS for seed in seeds]
+    return float(numpy.mean(ratings))
+
+
+class CMAES:
+    """Minimal (mu/mu_w, lambda)-CMA-ES for maximization, operating on coordinates normalized to [0, 1]."""
+
+    def __init__(self, mean: ndarray, *, sigma: float, population_size: int, rng: numpy.random.Generator) -> None:
+        self.rng = rng
+        self.dim = n = len(mean)
+        self.mean = mean.astype(float)
+        self.sigma = sigma
+        self.population_size = population_size
+        self.mu = population_size // 2
+        weights = numpy.log(self.mu + 0.5) - numpy.log(numpy.arange(1, self.mu + 1))
+        self.weights = weights / weights.sum()
+        self.mu_eff = 1 / numpy.sum(self.weights**2)
+        self.c_sigma = (self.mu_eff + 2) / (n + self.mu_eff + 5)
+        self.d_sigma = 1 + 2 * max(0.0, numpy.sqrt((self.mu_eff - 1) / (n + 1)) - 1) + self.c_sigma
+        self.c_c = (4 + self.mu_eff / n) / (n + 4 + 2 * self.mu_eff / n)
+        self.c_1 = 2 / ((n + 1.3)**2 + self.mu_eff)
+        self.c_mu = min(1 - self.c_1, 2 * (self.mu_eff - 2 + 1 / self.mu_eff) / ((n + 2)**2 + self.mu_eff))
+        self.chi_n = numpy.sqrt(n) * (1 - 1 / (4 * n) + 1 / (21 * n**2))
+        self.p_sigma = numpy.zeros(n)
+        self.p_c = numpy.zeros(n)
+        self.covariance = numpy.eye(n)
+        self.generation = 0
+
+    def ask(self) -> ndarray:
+        eigenvalues, eigenvectors = numpy.linalg.eigh(self.covariance)
+        self._sqrt_covariance = eigenvectors * numpy.sqrt(numpy.maximum(eigenvalues, 1e-20))
+        self._inv_sqrt_covariance = (eigenvectors / numpy.sqrt(numpy.maximum(eigenvalues, 1e-20))) @ eigenvectors.T
+        z = self.rng.standard_normal((self.population_size, self.dim))
+        return numpy.clip(self.mean + self.sigma * z @ self._sqrt_covariance.T, 0, 1)
+
+    def tell(self, candidates: ndarray, scores: ndarray) -> None:
+        n = self.dim
+        self.generation += 1
+        order = numpy.argsort(-scores, kind='stable')[:self.mu]
+        steps = (candidates[order] - self.mean) / self.sigma
+        mean_step = self.weights @ steps
+        self.mean = self.mean + self.sigma * mean_step
+        self.p_sigma = ((1 - self.c_sigma) * self.p_sigma
+                        + numpy.sqrt(self.c_sigma * (2 - self.c_sigma) * self.mu_eff)
+                        * self._inv_sqrt_covariance @ mean_step)
+        norm_p_sigma = numpy.linalg.norm(self.p_sigma)
+        h_sigma = (norm_p_sigma / numpy.sqrt(1 - (1 - self.c_sigma)**(2 * self.generation))
+                   < (1.4 + 2 / (n + 1)) * self.chi_n)
+        self.p_c = (1 - self.c_c) * self.p_c + h_sigma * numpy.sqrt(self.c_c * (2 - self.c_c) * self.mu_eff) * mean_step
+        rank_mu = (self.weights[:, None] * steps).T @ steps
+        self.covariance = ((1 - self.c_1 - self.c_mu) * self.covariance
+                           + self.c_1 * (numpy.outer(self.p_c, self.p_c)
+                                         + (1 - h_sigma) * self.c_c * (2 - self.c_c) * self.covariance)
+                           + self.c_mu * rank_mu)
+        self.sigma *= numpy.exp((self.c_sigma / self.d_sigma) * (norm_p_sigma / self.chi_n - 1))
+
+
+def tune(method: str, *, iterations: int, population_size: int, grid_points: int, seeds: list[int],
+         rng: numpy.random.Generator, executor: ProcessPoolExecutor) -> list[tuple[float, ndarray]]:
+    lower, upper = get_bounds()
+    default = (CombatParameters().to_array() - lower) / (upper - lower)
+    results: list[tuple[float, ndarray]] = []
+
+    def run(normalized: ndarray) -> ndarray:
+        values = lower + normalized * (upper - lower)
+        scores = numpy.asarray(list(executor.map(evaluate, values, itertools.repeat(seeds))))
+        results.extend(zip(scores, values))
+        print(f"evaluated {len(results):5d} candidates, best score = {max(results, key=lambda r: r[0])[0]:.4f}")
+        return scores
+
+    match method:
+        case 'random':
+            run(numpy.vstack([default, rng.uniform(size=(iterations * population_size - 1, len(default)))]))
+        case 'grid':
+            axis = numpy.linspace(0, 1, grid_points)
+            run(numpy.asarray(list(itertools.product(axis, repeat=len(default)))))
+        case 'cmaes':
+            cmaes = CMAES(default, sigma=0.2, population_size=population_size, rng=rng)
+            for _ in range(iterations):
+                candidates = cmaes.ask()
+                cmaes.tell(candidates, run(candidates))
+        case _:
+            raise ValueError(f"unknown method: {method}")
+    return sorted(results, key=lambda r: r[0], reverse=True)
+
+
+if __name__ == "__main__":
+    parser = ArgumentParser()
+    parser.add_argument("--method", choices=['random', 'grid', 'cmaes'], default='cmaes')
+    parser.add_argument("--iterations", type=int, default=20)
+    parser.add_argument("--population-size", type=int, default=16)
+    parser.add_argument("--grid-points", type=int, default=3)
+    parser.add_argument("--repetitions", type=int, default=4, help="Simulations per scenario and candidate")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--top", type=int, default=10, help="Number of parameter sets to write")
+    parser.add_argument("--output", type=Path, default=Path("combat_parameters.json"))
+    args = parser.parse_args()
+
+    rng = numpy.random.default_rng(args.seed)
+    seeds = rng.integers(2**31, size=args.repetitions).tolist()
+    print(f"default score = {evaluate(CombatParameters().to_array(), seeds):.4f}")
+    with ProcessPoolExecutor(max_workers=args.workers) as executor:
+        ranked = tune(args.method, iterations=args.iterations, population_size=args.population_size,
+                      grid_points=args.grid_points, seeds=seeds, rng=rng, executor=executor)
+
+    output = [{'score': score, 'parameters': asdict(CombatParameters.from_array(values))}
+              for score, values in ranked[:args.top]]
+    with open(args.output, 'w') as file:
+        json.dump(output, file, indent=4)
+    print(f"best score = {ranked[0][0]:.4f}, written {len(output)} parameter sets to {args.output}")
@@ -1,3 +1,4 @@
+from pathlib import Path
 from typing import Optional, Any
 
 from loguru._logger import Logger
@@ -26,6 +27,7 @@ from avocados.mapdata.mapmanager import MapManager
 from avocados.bot.resourcemanager import ResourceManager
 from avocados.bot.objectivemanager import ObjectiveManager
 from avocados.combat.combatmanager import CombatManager
+from avocados.combat.parameters import CombatParameters
 from avocados.combat.squadmanager import SquadManager
 
 
@@ -62,6 +64,7 @@ class AvocaDOS:
                  debug: bool = False,
                  micro_scenario: Optional[dict[UnitTypeId, int] | tuple[dict[UnitTypeId, int], dict[UnitTypeId, int]]] = None,
                  leave_at: Optional[float] = None,
+                 combat_parameters: Optional[str | Path] = None,
                  ) -> None:
         super().__init__()
         self.cache = {}
@@ -74,9 +77,11 @@ class AvocaDOS:
         self.taunt = TauntManager()
         self.intel = IntelManager(map_manager=self.map)
         self.scan = ScanManager(intel_manager=self.intel)
-        self.squads = SquadManager(map_manager=self.map)
+        self.squads = SquadManager(map_manager=self.map, intel_manager=self.intel, validate=debug)
         self.building = BuildingManager(map_manager=self.map)
-        self.combat = CombatManager(memory_manager=self.memory, taunt_manager=self.taunt, squad_manager=self.squads)
+        self.combat = CombatManager(memory_manager=self.memory, intel_manager=self.intel, taunt_manager=self.taunt,
+                                    squad_manager=self.squads,
+                                    parameters=CombatParameters.load(combat_parameters) if combat_parameters else None)
         self.expand = ExpansionManager(map_manager=self.map, scan_manager=self.scan)
         self.request = RequestManager(map_manager=self.map, squad_manager=self.squads, expansion_manager=self.expand)
         self.defense = DefenseManager(expansion_manager=self.expand)
@@ -213,7 +218,10 @@ class AvocaDOS:
                 await func(unit)
 
     async def on_unit_destroyed(self, unit_tag: int) -> None:
-        pass
+        for manager in self.managers:
+            func = getattr(manager, 'on_unit_destroyed', None)
+            if func is not None:
+                await func(unit_tag)
 
     # --- Private
 
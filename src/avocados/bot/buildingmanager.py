@@ -5,7 +5,6 @@ import numpy
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
-from scipy.signal import convolve2d
 
 from avocados import api
 from avocados.core.constants import (PRODUCTION_BUILDING_TYPE_IDS, TOWNHALL_TYPE_IDS, MINERAL_FIELD_TYPE_IDS,
@@ -46,6 +45,7 @@ class BuildingManager(BotManager):
             self._update_resource_blocking_grid()
             self._update_static_reserved_grid()
         self.reserved_grid.data[:] = self.static_reserved_grid.data
+        self.reserved_grid.invalidate()
         self._update_blocking_grid()
         self.timings['step'].add(t0)
 
@@ -209,19 +209,17 @@ class BuildingManager(BotManager):
         return self._can_place_footprint(footprint)
 
     def _get_possible_locations(self, building_area: Rectangle, footprint: tuple[int, int]) -> list[Point2]:
-        array = (
-                self.map.placement_grid[building_area]
-                & self.blocking_grid[building_area]
-                & self.map.pathing_grid[building_area]
-                & numpy.invert(self.reserved_grid[building_area])
-                & numpy.invert(self.map.creep[building_area])
-        ).astype(int)
-        kernel = numpy.ones(footprint, dtype=int)
-        count = convolve2d(array, kernel, mode='same')
-        mask = (count == kernel.size)
+        size = footprint[0] * footprint[1]
+        mask = (
+                (self.map.placement_grid.window_sums(footprint, building_area) == size)
+                & (self.blocking_grid.window_sums(footprint, building_area) == size)
+                & (self.map.pathing_grid.window_sums(footprint, building_area) == size)
+                & (self.reserved_grid.window_sums(footprint, building_area) == 0)
+                & (self.map.creep.window_sums(footprint, building_area) == 0)
+        )
         offset = (
-            -0.5 if kernel.shape[0] % 2 == 0 else 0,
-            -0.5 if kernel.shape[1] % 2 == 0 else 0,
+            -0.5 if footprint[0] % 2 == 0 else 0,
+            -0.5 if footprint[1] % 2 == 0 else 0,
         )
         grid_points = building_area.get_grid_points(offset=offset)
         try:
@@ -231,8 +229,7 @@ class BuildingManager(BotManager):
                 self.logger.exception(exc)
                 self.logger.error('_rect_to_mask={}', self.map.placement_grid._rect_to_mask(building_area))
                 self.logger.error("building_area={}", building_area)
-                self.logger.error("shape of array={}", array.shape)
-                self.logger.error("kernel={}", kernel)
+                self.logger.error("footprint={}", footprint)
                 self.logger.error("shape of mask={}", mask.shape)
                 self.logger.error("offset={}", offset)
                 self.logger.error("shape of grid points={}", grid_points.shape)
@@ -242,21 +239,22 @@ class BuildingManager(BotManager):
 
     def _can_place_footprint(self, footprint: Rectangle) -> bool:
         return (
-            numpy.all(self.map.placement_grid[footprint])
-            and numpy.all(self.blocking_grid[footprint])
-            and numpy.all(self.map.pathing_grid[footprint])
-            and not numpy.any(self.reserved_grid[footprint])
-            and not numpy.any(self.map.creep[footprint])
+            self.map.placement_grid.all(footprint)
+            and self.blocking_grid.all(footprint)
+            and self.map.pathing_grid.all(footprint)
+            and not self.reserved_grid.any(footprint)
+            and not self.map.creep.any(footprint)
         )
 
     def _update_blocking_grid(self) -> None:
         self.blocking_grid.data[:] = self.resource_blocking_grid.data
+        self.blocking_grid.invalidate()
         for structure in (api.structures + api.enemy_structures).not_flying:
             footprint = self._get_footprint(structure.type_id, structure.position)
             self.blocking_grid[footprint] = False
 
     def _update_resource_blocking_grid(self) -> None:
-        self.resource_blocking_grid.data[:] = True
+        self.resource_blocking_grid.fill(True)
         for structure in api.mineral_field + api.vespene_geyser:
             footprint = self._get_footprint(structure.type_id, structure.position)
             self.resource_blocking_grid[footprint] = False
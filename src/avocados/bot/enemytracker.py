@@ -0,0 +1,131 @@
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy
+from numpy import ndarray
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.position import Point2
+from sc2.units import Units
+
+from avocados.combat.util import get_strength
+
+
+GAME_LOOPS_PER_SECOND: float = 22.4
+GHOST_TIMEOUT: int = 1344  # 60 seconds; structures do not time out
+EXTRAPOLATION_HORIZON: float = 2.0  # Seconds of constant velocity motion assumed after leaving vision
+MAX_UNCERTAINTY: float = 30.0
+
+# Columns of the float table
+_STATS = ('radius', 'speed', 'ground_dps', 'ground_range', 'air_dps', 'air_range', 'strength')
+
+
+@dataclass(frozen=True)
+class EnemyGhost:
+    tag: int
+    utype: UnitTypeId
+    position: Point2
+    velocity: Point2
+    last_seen: int
+    uncertainty: float
+
+
+class EnemyTracker:
+    """Memory of enemy units, as arrays with one row per tag.
+
+    Rows store the last seen position, step, velocity, type and the combat stats, so that no Unit objects are kept
+    alive. Positions of units in the fog are extrapolated along their last velocity for EXTRAPOLATION_HORIZON
+    seconds, and their uncertainty grows with their movement speed. Rows are evicted when the unit dies, or when it
+    has not been seen for GHOST_TIMEOUT steps.
+    """
+    tags: ndarray
+    type_ids: ndarray
+    positions: ndarray
+    velocities: ndarray
+    last_seen: ndarray
+    is_structure: ndarray
+    stats: ndarray
+    _tag_to_index: Optional[dict[int, int]]
+
+    def __init__(self) -> None:
+        super().__init__()
+        self.tags = numpy.zeros(0, dtype=numpy.uint64)
+        self.type_ids = numpy.zeros(0, dtype=int)
+        self.positions = numpy.zeros((0, 2))
+        self.velocities = numpy.zeros((0, 2))
+        self.last_seen = numpy.zeros(0, dtype=int)
+        self.is_structure = numpy.zeros(0, dtype=bool)
+        self.stats = numpy.zeros((0, len(_STATS)))
+        self._tag_to_index = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={len(self)})"
+
+    def __len__(self) -> int:
+        return len(self.tags)
+
+    def __contains__(self, tag: int) -> bool:
+        return self.index(tag) is not None
+
+    def index(self, tag: int) -> Optional[int]:
+        if self._tag_to_index is None:
+            self._tag_to_index = {tag: index for index, tag in enumerate(self.tags.tolist())}
+        return self._tag_to_index.get(tag)
+
+    def stat(self, name: str) -> ndarray:
+        return self.stats[:, _STATS.index(name)]
+
+    def update(self, step: int, units: Units, velocities: ndarray, alive_tags: set[int]) -> None:
+        """Replace the rows of the visible units and evict dead and timed out rows.
+
+        velocities has one row per unit, in the order of units.
+        """
+        seen_tags = numpy.fromiter((unit.tag for unit in units), dtype=numpy.uint64, count=len(units))
+        keep = ~numpy.isin(self.tags, seen_tags)
+        keep &= numpy.fromiter((tag in alive_tags for tag in self.tags.tolist()), dtype=bool, count=len(self))
+        keep &= self.is_structure | (step - self.last_seen <= GHOST_TIMEOUT)
+
+        stats = numpy.array([(unit.radius, 1.4 * unit.real_speed, unit.ground_dps, unit.ground_range,
+                              unit.air_dps, unit.air_range, get_strength(unit)) for unit in units],
+                            dtype=float).reshape(-1, len(_STATS))
+        self.tags = numpy.concatenate((self.tags[keep], seen_tags))
+        self.type_ids = numpy.concatenate((self.type_ids[keep], numpy.fromiter(
+            (unit.type_id.value for unit in units), dtype=int, count=len(units))))
+        self.positions = numpy.concatenate((self.positions[keep], numpy.array(
+            [unit.position_tuple for unit in units], dtype=float).reshape(-1, 2)))
+        self.velocities = numpy.concatenate((self.velocities[keep], velocities.reshape(-1, 2)))
+        self.last_seen = numpy.concatenate((self.last_seen[keep], numpy.full(len(units), step)))
+        self.is_structure = numpy.concatenate((self.is_structure[keep], numpy.fromiter(
+            (unit.is_structure for unit in units), dtype=bool, count=len(units))))
+        self.stats = numpy.concatenate((self.stats[keep], stats))
+        self._tag_to_index = None
+
+    def get_ages(self, step: int) -> ndarray:
+        """Seconds since each row was last seen."""
+        return (step - self.last_seen) / GAME_LOOPS_PER_SECOND
+
+    def get_positions(self, step: int) -> ndarray:
+        """Predicted positions at step, shape (n, 2)."""
+        ages = numpy.minimum(self.get_ages(step), EXTRAPOLATION_HORIZON)
+        return self.positions + ages[:, None] * self.velocities
+
+    def get_uncertainties(self, step: int) -> ndarray:
+        """Radius around the predicted position within which each unit is expected; 0 for visible units."""
+        return numpy.minimum(self.get_ages(step) * self.stat('speed'), MAX_UNCERTAINTY)
+
+    def get(self, tag: int, step: int) -> Optional[EnemyGhost]:
+        if (index := self.index(tag)) is None:
+            return None
+        age = self.get_ages(step)[index]
+        position = self.positions[index] + min(age, EXTRAPOLATION_HORIZON) * self.velocities[index]
+        return EnemyGhost(
+            tag=tag,
+            utype=UnitTypeId(int(self.type_ids[index])),
+            position=Point2(position.tolist()),
+            velocity=Point2(self.velocities[index].tolist()),
+            last_seen=int(self.last_seen[index]),
+            uncertainty=float(min(age * self.stats[index, _STATS.index('speed')], MAX_UNCERTAINTY)),
+        )
+
+    def of_types(self, type_ids: set[UnitTypeId] | frozenset[UnitTypeId]) -> ndarray:
+        """Boolean row mask of the units of the given types."""
+        return numpy.isin(self.type_ids, [utype.value for utype in type_ids])
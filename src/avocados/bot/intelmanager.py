@@ -1,4 +1,5 @@
 from dataclasses import dataclass
+from functools import cache
 from time import perf_counter
 from typing import Optional
 
@@ -8,20 +9,35 @@ from sc2.data import Race
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
+from scipy.ndimage import distance_transform_edt
 
 from avocados import api
-from avocados.combat.util import get_strength
+from avocados.bot.enemytracker import EnemyTracker
+from avocados.bot.scouting import ScoutingGrid
 from avocados.core.constants import (RESOURCE_COLLECTOR_TYPE_IDS, BURROWED_TYPE_IDS,
-                                     UNBURROWED_TYPE_IDS)
+                                     UNBURROWED_TYPE_IDS, STATIC_DEFENSE_TYPE_IDS)
 from avocados.core.manager import BotManager
 from avocados.core.timeseries import Timeseries
-from avocados.geometry.field import Field
+from avocados.geometry.circle import Circle
+from avocados.geometry.field import Field, get_disc_stamp
+from avocados.geometry.region import Region
 from avocados.geometry.util import Rectangle
 from avocados.mapdata import MapManager
 from avocados.mapdata.expansion import ExpansionLocation
 
 
 BURROW_TRACK_DURATION: int = 224  # 10 seconds
+THREAT_MARGIN: float = 1.0
+THREAT_HALF_LIFE: int = 112  # 5 seconds
+THREAT_MEMORY_DURATION: int = 448  # 20 seconds
+SCOUT_LOCATION_INTERVAL: int = 224  # 10 seconds
+SCOUT_RADIUS: float = 3.0
+SCOUT_ENEMY_WEIGHT: float = 1.0
+
+
+@cache
+def get_threat_stamp(weapon_range: float, unit_radius: float) -> ndarray:
+    return get_disc_stamp(weapon_range + unit_radius + THREAT_MARGIN)
 
 
 @dataclass(frozen=True)
@@ -40,17 +56,50 @@ class BurrowedUnit:
         return NotImplemented
 
 
+@dataclass(frozen=True)
+class ThreatSource:
+    position: Point2
+    radius: float
+    ground_dps: float
+    ground_range: float
+    air_dps: float
+    air_range: float
+
+    @classmethod
+    def of_unit(cls, unit: Unit) -> 'ThreatSource':
+        return cls(unit.position, unit.radius, unit.ground_dps, unit.ground_range, unit.air_dps, unit.air_range)
+
+    def add_to(self, ground_threat: Field[float], air_threat: Field[float], *, weight: float = 1.0) -> None:
+        if self.ground_dps > 0:
+            ground_threat.add_stamp(self.position, get_threat_stamp(self.ground_range, self.radius),
+                                    weight * self.ground_dps)
+        if self.air_dps > 0:
+            air_threat.add_stamp(self.position, get_threat_stamp(self.air_range, self.radius),
+                                 weight * self.air_dps)
+
+
 class IntelManager(BotManager):
     map: MapManager
 
     last_known_enemy_base: Optional[ExpansionLocation]
     visibility: Field[int]
-    last_visible: Field[float]
+    visible: Field[bool]
+    _last_visible: Field[float]
+    _previous_time: float
+    _pathable: ndarray
+    scouting: ScoutingGrid
+    _scout_locations: dict[float, tuple[int, Circle]]
     enemy_race: Optional[Race]
-    enemy_units: set[Unit]
+    enemies: EnemyTracker
     enemy_burrowed_units: dict[int, BurrowedUnit]
+    ground_threat: Field[float]
+    air_threat: Field[float]
+    _static_ground_threat: Field[float]
+    _static_air_threat: Field[float]
+    _static_threat_sources: dict[int, ThreatSource]
     enemy_army_strength: Timeseries[float]
     enemy_utype_last_spotted: dict[UnitTypeId, int]
+    _expansion_cells: Optional[tuple[ndarray, ndarray, ndarray]]
 
     def __init__(self, map_manager: MapManager) -> None:
         super().__init__()
@@ -58,56 +107,189 @@ class IntelManager(BotManager):
 
         self.last_known_enemy_base = None
         self.enemy_race = api.enemy_race if api.enemy_race != Race.Random else None   # Update for random players
-        self.enemy_units = set()
+        self.enemies = EnemyTracker()
         self.enemy_burrowed_units = {}
+        self._static_threat_sources = {}
         self.enemy_army_strength = Timeseries.empty(float, initial_size=4096)
         self.enemy_utype_last_spotted = {}
+        self._expansion_cells = None
 
     async def on_start(self) -> None:
         self.last_known_enemy_base = self.map.known_enemy_start_location
-        self.visibility = self.map.create_field_from_pixelmap(api.state.visibility)
-        self.last_visible = Field((self.map.width, self.map.height), offset=self.map.playable_offset)
+        # Shared with the MapManager, which updates it before the IntelManager each step
+        self.visibility = self.map.visibility
+        self.visible = Field(self.visibility.data == 2, offset=self.visibility.offset)
+        self._last_visible = Field((self.map.width, self.map.height), offset=self.map.playable_offset)
+        self._previous_time = 0.0
+        self._pathable = self.map.pathing_grid.data | self.map.placement_grid.data
+        self.scouting = ScoutingGrid(self._pathable, self.map.playable_offset,
+                                     [expansion.center for expansion in self.map.expansions])
+        self.scouting.update_visibility(numpy.nonzero(self.visible.data), (numpy.zeros(0, dtype=int),) * 2, 0.0)
+        self._scout_locations = {}
+        self.ground_threat = Field((self.map.width, self.map.height), offset=self.map.playable_offset)
+        self.air_threat = Field.zeros_like(self.ground_threat)
+        self._static_ground_threat = Field.zeros_like(self.ground_threat)
+        self._static_air_threat = Field.zeros_like(self.ground_threat)
 
     async def on_step_start(self, step: int) -> None:
         t0 = perf_counter()
-        self.visibility.data = api.state.visibility.data_numpy.transpose()[self.map.playable_mask]
-        mask: ndarray = (self.visibility.data == 2)  # noqa
-        self.last_visible.data[mask] = api.time
+        self._update_last_visible()
 
-        self.enemy_units = {unit for unit in self.enemy_units if unit.tag in api.alive_tags}
+        enemy_units = api.all_enemy_units
+        self.enemies.update(api.step, enemy_units, api.ext.kinematics.get_velocities(unit.tag for unit in enemy_units),
+                            api.alive_tags)
         self.enemy_burrowed_units = {tag: unit for tag, unit in self.enemy_burrowed_units.items()
                                      if tag in api.alive_tags and step <= unit.last_spotted + BURROW_TRACK_DURATION}
-        self.enemy_units.update(api.all_enemy_units)
-        for unit in api.all_enemy_units:
+        self.scouting.update_enemies(self.enemies.get_positions(api.step), self.enemies.stat('strength'))
+        for unit in enemy_units:
             self.enemy_utype_last_spotted[unit.type_id] = step
             if unit.type_id in BURROWED_TYPE_IDS:
                 self.enemy_burrowed_units[unit.tag] = BurrowedUnit(unit.tag, unit.position, unit.type_id, step)
             elif unit.type_id in UNBURROWED_TYPE_IDS:
                 self.enemy_burrowed_units.pop(unit.tag, None)
 
-        enemy_army = {unit for unit in self.enemy_units if unit.type_id not in RESOURCE_COLLECTOR_TYPE_IDS}
-        self.enemy_army_strength.append(step, get_strength(enemy_army))
+        enemy_army = ~self.enemies.of_types(RESOURCE_COLLECTOR_TYPE_IDS)
+        self.enemy_army_strength.append(step, round(float(self.enemies.stat('strength')[enemy_army].sum()), 2))
         self.timings['step_start'].add(t0)
 
+        t0 = perf_counter()
+        self._update_static_threat()
+        self._update_threat(api.step)
+        self.timings['threat'].add(t0)
+
     def get_percentage_scouted(self) -> float:
         return numpy.sum(self.visibility.data > 0) / self.visibility.size
 
+    def any_visible(self, area: Circle | Rectangle | Region) -> bool:
+        return self.visible.any(area)
+
+    def all_visible(self, area: Circle | Rectangle | Region) -> bool:
+        return self.visible.all(area)
+
+    def get_fraction_visible(self, area: Circle | Rectangle | Region) -> float:
+        """Fraction of the cells of area that are currently visible."""
+        return self.visible.mean(area)
+
     def get_time_since_expansions_last_visible(self) -> dict[ExpansionLocation, float]:
-        return {expansion : self.get_time_since_last_visible(expansion.get_townhall_area())
-                for expansion in self.map.expansions}
+        """Time since any part of each expansion's townhall area was last visible, from a single gather."""
+        x, y, starts = self._get_expansion_cells()
+        last_visible = numpy.where(self.visible.data[x, y], api.time, self._last_visible.data[x, y])
+        return dict(zip(self.map.expansions, (api.time - numpy.maximum.reduceat(last_visible, starts)).tolist()))
 
-    def get_time_since_last_visible(self, location: Point2 | Rectangle) -> float:
+    def get_time_since_last_visible(self, location: Point2 | Circle | Rectangle | Region) -> float:
         if isinstance(location, Point2):
-            return api.time - self.last_visible[location]
-        if isinstance(location, Rectangle):
-            return (api.time - self.last_visible[location]).min()
+            return 0.0 if self.visible[location] else api.time - self._last_visible[location]
+        if isinstance(location, (Circle, Rectangle, Region)):
+            return 0.0 if self.visible.any(location) else api.time - self._last_visible.max(location)
         raise TypeError(f"invalid type: {type(location)}")
 
-    # def get_next_scout_location(self, time_since_scout: float = 30, *, sigma: float = 3.0) -> Circle:
-    #     tss = api.time_since_visible_map(sigma=sigma)
-    #     dist = distance_transform_edt(tss > time_since_scout)
-    #     #radius = dist.max()
-    #     radius = 3
-    #     center = Point2(numpy.unravel_index(dist.argmax(), dist.shape)) + self.map.playable_offset
-    #     self.logger.info("RADIUS={}, CENTER={}".format(dist.max(), center))
-    #     return Circle(center=center, radius=radius)
\ No newline at end of file
+    @property
+    def last_visible(self) -> Field[float]:
+        """Game time at which each cell was last visible."""
+        data = numpy.where(self.visible.data, api.time, self._last_visible.data)
+        return Field(data, offset=self._last_visible.offset)
+
+    def get_threat(self, point: Point2, *, air: bool = False) -> float:
+        threat = self.air_threat if air else self.ground_threat
+        if point not in threat:
+            return 0.0
+        return float(threat[point])
+
+    def get_safest_point(self, center: Point2, radius: float, *, air: bool = False) -> Point2:
+        """Cell center with the lowest threat within radius, preferring cells closer to center."""
+        threat = self.air_threat if air else self.ground_threat
+        stamp = get_disc_stamp(radius)
+        slices = threat.stamp_slices(center, stamp.shape)
+        if slices is None:
+            return center
+        data_slice, stamp_slice = slices
+        candidates = stamp[stamp_slice]
+        if not air:
+            candidates = candidates & (self.map.pathing_grid.data[data_slice] > 0)
+        if not numpy.any(candidates):
+            return center
+        x0, y0 = data_slice[0].start, data_slice[1].start
+        xs = numpy.arange(x0, data_slice[0].stop) + 0.5 + threat.offset.x - center.x
+        ys = numpy.arange(y0, data_slice[1].stop) + 0.5 + threat.offset.y - center.y
+        # Distance acts as a tie-breaker only
+        distance_sq = xs[:, None] ** 2 + ys[None, :] ** 2
+        score = numpy.where(candidates, threat.data[data_slice] + 1e-3 * distance_sq, numpy.inf)
+        i, j = numpy.unravel_index(numpy.argmin(score), score.shape)
+        return Point2((x0 + i + 0.5, y0 + j + 0.5)) + threat.offset
+
+    def get_next_scout_location(self, time_since_scout: float = 30) -> Circle:
+        """Center of the largest pathable area that has not been visible for time_since_scout seconds.
+
+        The full resolution distance transform is only recomputed every SCOUT_LOCATION_INTERVAL steps. If every
+        area was seen recently, the best block of the scouting grid is used.
+        """
+        cached = self._scout_locations.get(time_since_scout)
+        if cached is not None and api.step - cached[0] < SCOUT_LOCATION_INTERVAL:
+            return cached[1]
+        unscouted = (api.time - self.last_visible.data > time_since_scout) & self._pathable
+        distance = distance_transform_edt(unscouted)
+        i, j = numpy.unravel_index(numpy.argmax(distance), distance.shape)
+        if distance[i, j] > 0:
+            center = Point2((i + 0.5, j + 0.5)) + self.map.playable_offset
+        else:
+            center = self.scouting.get_best_location(api.time, enemy_weight=SCOUT_ENEMY_WEIGHT)
+        location = Circle(center=center, radius=SCOUT_RADIUS)
+        self._scout_locations[time_since_scout] = (api.step, location)
+        return location
+
+    # --- Private
+
+    def _get_expansion_cells(self) -> tuple[ndarray, ndarray, ndarray]:
+        """Concatenated cell indices of all townhall areas, and the start of each expansion's cells."""
+        if self._expansion_cells is None:
+            indices = [self._last_visible.get_indices(expansion.get_townhall_area())
+                       for expansion in self.map.expansions]
+            starts = numpy.cumsum([0] + [len(x) for x, _ in indices[:-1]])
+            self._expansion_cells = (numpy.concatenate([x for x, _ in indices]),
+                                     numpy.concatenate([y for _, y in indices]), starts)
+        return self._expansion_cells
+
+    def _update_last_visible(self) -> None:
+        """Store the time at which each cell was last visible only when it leaves vision.
+
+        Cells that are visible now are resolved to the current time at query time, so only the cells whose visibility
+        changed since the previous step are written.
+        """
+        visible = self.visibility.data == 2
+        changed = self.visible.data ^ visible
+        entering, leaving = numpy.nonzero(changed & visible), numpy.nonzero(changed & self.visible.data)
+        if len(leaving[0]):
+            self._last_visible.data[leaving] = self._previous_time
+            self._last_visible.invalidate()
+        self.scouting.update_visibility(entering, leaving, self._previous_time)
+        self.visible.data = visible
+        self._previous_time = api.time
+
+    def _update_static_threat(self) -> None:
+        """Static defense only changes when structures finish, morph or die, so it is updated incrementally."""
+        sources = {structure.tag: ThreatSource.of_unit(structure)
+                   for structure in api.enemy_structures.of_type(STATIC_DEFENSE_TYPE_IDS).ready}
+        for tag, source in list(self._static_threat_sources.items()):
+            if sources.get(tag) != source:
+                source.add_to(self._static_ground_threat, self._static_air_threat, weight=-1)
+                self._static_threat_sources.pop(tag)
+        for tag, source in sources.items():
+            if tag not in self._static_threat_sources:
+                source.add_to(self._static_ground_threat, self._static_air_threat)
+                self._static_threat_sources[tag] = source
+
+    def _update_threat(self, step: int) -> None:
+        self.ground_threat.data[:] = self._static_ground_threat.data
+        self.air_threat.data[:] = self._static_air_threat.data
+        self.ground_threat.invalidate()
+        self.air_threat.invalidate()
+        enemies = self.enemies
+        ages = step - enemies.last_seen
+        indices = numpy.flatnonzero(~enemies.is_structure & (ages <= THREAT_MEMORY_DURATION))
+        # Units last seen in the fog of war still pose a threat at their predicted position, with decreasing certainty
+        weights = 0.5 ** (ages[indices] / THREAT_HALF_LIFE)
+        positions = enemies.get_positions(step)[indices]
+        columns = [enemies.stat(name)[indices].tolist()
+                   for name in ('radius', 'ground_dps', 'ground_range', 'air_dps', 'air_range')]
+        for position, weight, *stats in zip(positions.tolist(), weights.tolist(), *columns):
+            ThreatSource(Point2(position), *stats).add_to(self.ground_threat, self.air_threat, weight=weight)
@@ -174,11 +174,21 @@ class RequestManager(BotManager):
             return units
 
         if position is None:
-            units.sorted(lambda u: squad.task_priority if (squad := self.squads.get_squad_of(u.tag)) is not None else 0)
+            units = units.sorted(lambda u: squad.task_priority if (squad := self.squads.get_squad_of(u.tag)) is not None else 0)
         else:
-            # Pick units with smallest distance / priority difference
-            units.sorted(lambda u: u.distance_to(position)
-                                   / (max_priority - (squad.task_priority if (squad := self.squads.get_squad_of(u.tag)) is not None else 0)))
+            # Pick units with smallest distance / priority difference, keeping proximity clusters together
+            keys = [u.distance_to(position)
+                    / (max_priority - (squad.task_priority if (squad := self.squads.get_squad_of(u.tag)) is not None else 0))
+                    for u in units]
+            clusters = self.squads.get_cluster_labels(units).tolist()
+            # Units without cluster (-1) are not related to each other, each forms a group of its own
+            groups = [cluster if cluster >= 0 else -1 - index for index, cluster in enumerate(clusters)]
+            group_keys: dict[int, float] = {}
+            for group, key in zip(groups, keys):
+                group_keys[group] = min(key, group_keys.get(group, float('inf')))
+            # The group id keeps clusters with equal keys contiguous
+            order = sorted(range(len(units)), key=lambda i: (group_keys[groups[i]], groups[i], keys[i]))
+            units = Units([units[i] for i in order], api)
         if strength is not None:
             units_strength = 0.0
             for index, unit in enumerate(units):
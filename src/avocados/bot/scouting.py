@@ -0,0 +1,105 @@
+import math
+from collections.abc import Sequence
+
+import numpy
+from numpy import ndarray
+from sc2.position import Point2
+
+
+SCOUTING_BLOCK_SIZE: int = 4
+EXPANSION_PROXIMITY_SIGMA: float = 8.0
+
+
+class ScoutingGrid:
+    """Coarse grid over the map, with one block per block_size x block_size cells, for scouting and attack queries.
+
+    Per block, it stores the number of currently visible cells and the game time at which the block was last
+    partly visible. Both are updated incrementally from the cells that entered or left vision. A block counts as
+    visible while any of its cells is. Blocks without pathable cells are never selected.
+    """
+    block_size: int
+    offset: Point2
+    shape: tuple[int, int]
+    centers: ndarray
+    valid: ndarray
+    expansion_proximity: ndarray
+    enemy_strength: ndarray
+    _visible_counts: ndarray
+    _last_visible: ndarray
+
+    def __init__(self, pathable: ndarray, offset: Point2, expansions: Sequence[Point2], *,
+                 block_size: int = SCOUTING_BLOCK_SIZE) -> None:
+        super().__init__()
+        self.block_size = block_size
+        self.offset = offset
+        width, height = pathable.shape
+        self.shape = (math.ceil(width / block_size), math.ceil(height / block_size))
+        padded = numpy.zeros((self.shape[0] * block_size, self.shape[1] * block_size), dtype=bool)
+        padded[:width, :height] = pathable
+        blocks = padded.reshape(self.shape[0], block_size, self.shape[1], block_size)
+        counts = blocks.sum(axis=(1, 3))
+        self.valid = counts > 0
+
+        # Centroid of the pathable cells of each block, so that targets are reachable
+        cell = numpy.arange(block_size) + 0.5
+        weights = blocks.astype(float)
+        xs = numpy.einsum('iajb,a->ij', weights, cell) / numpy.maximum(counts, 1)
+        ys = numpy.einsum('iajb,b->ij', weights, cell) / numpy.maximum(counts, 1)
+        xs += (numpy.arange(self.shape[0]) * block_size)[:, None]
+        ys += (numpy.arange(self.shape[1]) * block_size)[None, :]
+        self.centers = numpy.stack((xs, ys), axis=-1) + numpy.asarray(offset)
+
+        if len(expansions):
+            delta = self.centers[:, :, None, :] - numpy.asarray(expansions, dtype=float)[None, None, :, :]
+            distance_sq = numpy.einsum('ijkl,ijkl->ijk', delta, delta).min(axis=2)
+            self.expansion_proximity = numpy.exp(-distance_sq / (2 * EXPANSION_PROXIMITY_SIGMA**2))
+        else:
+            self.expansion_proximity = numpy.zeros(self.shape)
+        self.enemy_strength = numpy.zeros(self.shape)
+        self._visible_counts = numpy.zeros(self.shape, dtype=int)
+        self._last_visible = numpy.zeros(self.shape)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(shape={self.shape}, block_size={self.block_size})"
+
+    def update_visibility(self, entering: tuple[ndarray, ndarray], leaving: tuple[ndarray, ndarray],
+                          previous_time: float) -> None:
+        """Update from the cell indices that entered and left vision since the previous step, at previous_time."""
+        was_visible = self._visible_counts > 0
+        numpy.add.at(self._visible_counts, (entering[0] // self.block_size, entering[1] // self.block_size), 1)
+        numpy.subtract.at(self._visible_counts, (leaving[0] // self.block_size, leaving[1] // self.block_size), 1)
+        self._last_visible[was_visible & (self._visible_counts == 0)] = previous_time
+
+    def update_enemies(self, positions: ndarray, strengths: ndarray) -> None:
+        """Set the remembered enemy strength per block."""
+        self.enemy_strength[:] = 0
+        indices = numpy.floor((positions - numpy.asarray(self.offset)) / self.block_size).astype(int).reshape(-1, 2)
+        inside = ((indices[:, 0] >= 0) & (indices[:, 0] < self.shape[0])
+                  & (indices[:, 1] >= 0) & (indices[:, 1] < self.shape[1]))
+        numpy.add.at(self.enemy_strength, (indices[inside, 0], indices[inside, 1]), strengths[inside])
+
+    def get_time_since_visible(self, time: float) -> ndarray:
+        return numpy.where(self._visible_counts > 0, 0.0, time - self._last_visible)
+
+    def get_scores(self, time: float, *,
+                   expansion_weight: float = 1.0,
+                   enemy_weight: float = 0.0,
+                   distance_penalties: Sequence[tuple[Point2, float]] = ()) -> ndarray:
+        """Time since visible, weighted by expansion proximity, plus remembered enemy strength, minus the distance to
+        each reference point times its factor. Blocks without pathable cells score -inf.
+        """
+        weights = 1 + expansion_weight * (self.expansion_proximity - 1)
+        scores = self.get_time_since_visible(time) * weights + enemy_weight * self.enemy_strength
+        for point, factor in distance_penalties:
+            scores -= factor * numpy.linalg.norm(self.centers - numpy.asarray(point), axis=-1)
+        return numpy.where(self.valid, scores, -numpy.inf)
+
+    def get_best_location(self, time: float, *,
+                          expansion_weight: float = 1.0,
+                          enemy_weight: float = 0.0,
+                          distance_penalties: Sequence[tuple[Point2, float]] = ()) -> Point2:
+        """Pathable centroid of the block with the highest score, see get_scores."""
+        scores = self.get_scores(time, expansion_weight=expansion_weight, enemy_weight=enemy_weight,
+                                 distance_penalties=distance_penalties)
+        i, j = numpy.unravel_index(numpy.argmax(scores), scores.shape)
+        return Point2(self.centers[i, j].tolist())
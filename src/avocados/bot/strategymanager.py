@@ -295,11 +295,8 @@ class StrategyManager(BotManager):
                 target = enemy_structures.closest_to(api.army.center).position
             else:
                 reference_point = self.intel.last_known_enemy_base.center or self.map.center
-                targets = {exp: (time
-                                 - 0.1 * exp.center.distance_to(reference_point)
-                                 - 0.1 * exp.center.distance_to(api.army.center))
-                           for exp, time in self.intel.get_time_since_expansions_last_visible().items()}
-                target = max(targets.keys(), key=targets.get).center
+                target = self.intel.scouting.get_best_location(
+                    api.time, distance_penalties=((reference_point, 0.1), (api.army.center, 0.1)))
             area = Circle(target, 16.0)
 
             self.objectives.add_attack_objective(area, priority=self.aggression,
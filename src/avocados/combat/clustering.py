@@ -0,0 +1,25 @@
+import numpy
+from numpy import ndarray
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import connected_components
+from scipy.spatial import cKDTree
+
+
+def get_proximity_clusters(positions: ndarray, radius: float) -> ndarray:
+    """Cluster label per position, for the connected components of the graph linking positions within radius.
+
+    Uses a KD-tree for the radius query, which is O(n log n) for the sparse unit distributions of a game.
+    """
+    number = len(positions)
+    if number == 0:
+        return numpy.empty(0, dtype=int)
+    pairs = cKDTree(positions).query_pairs(radius, output_type='ndarray')
+    graph = coo_array((numpy.ones(len(pairs), dtype=bool), (pairs[:, 0], pairs[:, 1])), shape=(number, number))
+    _, labels = connected_components(graph, directed=False)
+    return labels
+
+
+def get_spacing_matrix(centers: ndarray, radii: ndarray) -> ndarray:
+    """Pairwise distance between the circles (centers, radii); negative for overlapping circles."""
+    delta = centers[:, None, :] - centers[None, :, :]
+    return numpy.sqrt(numpy.einsum('ijk,ijk->ij', delta, delta)) - radii[:, None] - radii[None, :]
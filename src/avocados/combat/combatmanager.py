@@ -1,6 +1,9 @@
+import math
 from time import perf_counter
 from typing import Optional
 
+import numpy
+from numpy import ndarray
 from sc2.ids.ability_id import AbilityId
 from sc2.ids.buff_id import BuffId
 from sc2.ids.unit_typeid import UnitTypeId
@@ -9,56 +12,73 @@ from sc2.unit import Unit
 from sc2.units import Units
 
 from avocados import api
+from avocados.bot.intelmanager import IntelManager
 from avocados.bot.memorymanager import MemoryManager
 from avocados.bot.taunts import TauntManager
-from avocados.combat.squad import Squad, SquadAttackTask, SquadDefendTask, SquadStatus, SquadJoinTask, SquadRetreatTask
+from avocados.combat.focusfire import allocate_focus_fire
+from avocados.combat.parameters import CombatParameters
+from avocados.combat.squad import (Squad, SquadTask, SquadAttackTask, SquadDefendTask, SquadStatus, SquadJoinTask,
+                                   SquadRetreatTask)
 from avocados.combat.squadmanager import SquadManager
+from avocados.combat.steering import get_steering_targets, stabilize_move_target
 from avocados.combat.weapons import Weapons
 from avocados.core.constants import (TECHLAB_TYPE_IDS, REACTOR_TYPE_IDS, GAS_TYPE_IDS, TOWNHALL_TYPE_IDS,
                                      UPGRADE_BUILDING_TYPE_IDS, PRODUCTION_BUILDING_TYPE_IDS, TECH_BUILDING_TYPE_IDS)
 from avocados.core.manager import BotManager
-from avocados.core.unitutil import get_closest_sq_distance
 from avocados.core.util import lerp, clip
+from avocados.geometry.distance import get_closest_sq_distances, get_positions
 from avocados.geometry.util import squared_distance
 
 
+SAFEST_POINT_RADIUS = 3.0
+ENEMY_SCAN_RANGE = 5.0
+EXCLUDED_ENEMY_TYPE_IDS = [UnitTypeId.EGG.value, UnitTypeId.LARVA.value, UnitTypeId.DISRUPTORPHASED.value]
+
+
 class CombatManager(BotManager):
     memory: MemoryManager
+    intel: IntelManager
     taunt: TauntManager
     squads: SquadManager
 
-    # Parameters
-    attack_priority_base_weight: float
-    attack_priority_weakness_weight: float
-    attack_priority_distance_weight: float
-    attack_priority_base_weakness_correlation: float
-    attack_priority_base_distance_correlation: float
-    attack_priority_weakness_distance_correlation: float
-    attack_priority_threshold: float
-    defense_priority_threshold: float
+    parameters: CombatParameters
+    # Level of detail: squads without enemies nearby are only micro'd every lod_interval steps
+    lod_interval: int
+    lod_margin: float
+    _last_micro: dict[int, tuple[int, Optional[SquadTask]]]
 
     def __init__(self, *,
                  memory_manager: MemoryManager,
+                 intel_manager: IntelManager,
                  taunt_manager: TauntManager,
-                 squad_manager: SquadManager) -> None:
+                 squad_manager: SquadManager,
+                 parameters: Optional[CombatParameters] = None,
+                 lod_interval: int = 8,
+                 lod_margin: float = 5.0) -> None:
         super().__init__()
         self.memory = memory_manager
+        self.intel = intel_manager
         self.taunt = taunt_manager
         self.squads = squad_manager
 
-        self.attack_priority_base_weight = 0.75
-        self.attack_priority_weakness_weight = 0.10
-        self.attack_priority_distance_weight = 0.05
-        self.attack_priority_base_weakness_correlation = 0.05
-        self.attack_priority_base_distance_correlation = 0.05
-        self.attack_priority_weakness_distance_correlation = 0.00
-        self.attack_priority_threshold = 0.375  # attack_priority_base_weight/2
-        self.defense_priority_threshold = 0.50
+        self.parameters = parameters or CombatParameters()
+        self.lod_interval = lod_interval
+        self.lod_margin = lod_margin
+        self._last_micro = {}
 
     async def on_step(self, step: int) -> None:
         t0 = perf_counter()
+        last_micro = {}
         for squad in self.squads:
+            if self._skip_micro(squad):
+                self.timings['micro_squad'].skip()
+                last_micro[squad.id] = self._last_micro[squad.id]
+                continue
+            t1 = perf_counter()
             await self.micro_squad(squad)
+            self.timings['micro_squad'].add(t1)
+            last_micro[squad.id] = (api.step, squad.task)
+        self._last_micro = last_micro
         self.timings['step'].add(t0)
 
     async def micro_squad(self, squad: Squad, *,
@@ -66,13 +86,17 @@ class CombatManager(BotManager):
         # TODO: Move parts into SquadManager?
         t0 = perf_counter()
         if enemies is None:
-            enemies = self._get_enemies(squad.units)
+            enemies = api.ext.enemy_snapshot.take(self._get_enemies(squad.units))
         self.timings['get_enemies'].add(t0)
 
         t0 = perf_counter()
         squad_attack_priorities = self._get_attack_priorities(squad.units, enemies)
         self.timings['attack_priority'].add(t0)
 
+        t0 = perf_counter()
+        focus_fire_targets = allocate_focus_fire(squad.units.filter(self.weapon_ready), squad_attack_priorities)
+        self.timings['focus_fire'].add(t0)
+
         if squad_attack_priorities:
             squad_target, squad_target_priority = max(squad_attack_priorities.items(), key=lambda kv: kv[1])
             # TODO DEBUG
@@ -89,7 +113,7 @@ class CombatManager(BotManager):
             squad_target = None
             squad_target_priority = 0
 
-        if squad_target_priority >= self.attack_priority_threshold:
+        if squad_target_priority >= self.parameters.attack_priority_threshold:
             squad.set_status(SquadStatus.COMBAT)
             self.taunt.taunt()
         else:
@@ -113,8 +137,16 @@ class CombatManager(BotManager):
         #self.timings['abilities'].add(t0)
 
         t0 = perf_counter()
+        if squad_target is not None and squad_target_priority >= self.parameters.attack_priority_threshold:
+            intercept_points = api.ext.intercept_units(squad.units, squad_target)
+        else:
+            intercept_points = None
+        self.timings['intercept'].add(t0)
+
+        t0 = perf_counter()
+        steering_targets = None
         #for unit, unit_abilities in zip(squad.units, abilities):
-        for unit in squad.units:
+        for index, unit in enumerate(squad.units):
             unit_abilities = []
             microd = self._micro_unit(
                 unit,
@@ -123,20 +155,37 @@ class CombatManager(BotManager):
                 squad=squad,
                 squad_attack_priorities=squad_attack_priorities,
                 squad_target_priority=squad_target_priority,
-                squad_target=squad_target
+                squad_target=squad_target,
+                intercept_point=Point2(intercept_points[index].tolist()) if intercept_points is not None else None,
+                focus_fire_targets=focus_fire_targets
             )
             if not microd:
                 if isinstance(squad.task, (SquadAttackTask, SquadDefendTask)):
                     if unit.position not in squad.task.target:
-                        api.order.move(unit, squad.task.target.center)
+                        if steering_targets is None:
+                            steering_targets = self._get_steering_targets(squad, squad.task.target.center)
+                        api.order.move(unit, stabilize_move_target(unit, Point2(steering_targets[index].tolist())))
                     elif enemies_in_area := enemies.filter(lambda e: e.position in squad.task.target):
                         api.order.attack(unit, enemies_in_area.closest_to(unit))
                     elif unit.is_idle:
                         api.order.move(unit, squad.task.target.random)
                 elif isinstance(squad.task, SquadJoinTask):
-                    api.order.move(unit, squad.task.target.center)
+                    if steering_targets is None:
+                        steering_targets = self._get_steering_targets(squad, squad.task.target.center)
+                    api.order.move(unit, stabilize_move_target(unit, Point2(steering_targets[index].tolist())))
         self.timings['micro'].add(t0)
 
+    def _get_steering_targets(self, squad: Squad, target: Point2) -> ndarray:
+        """Move targets for all squad units, in the order of squad.units."""
+        t0 = perf_counter()
+        geometry = squad.geometry
+        threat = self.intel.air_threat if all(unit.is_flying for unit in squad.units) else self.intel.ground_threat
+        targets = get_steering_targets(geometry.positions, api.ext.unit_snapshot.radii[squad.unit_indices],
+                                       numpy.asarray(squad.center), numpy.asarray(target),
+                                       leash_range=squad.leash_range, threat=threat)
+        self.timings['steering'].add(t0)
+        return targets
+
     # ---
 
     def weapon_ready(self, unit: Unit) -> bool:
@@ -339,21 +388,13 @@ class CombatManager(BotManager):
         """
         priorities: dict[Unit, float] = {}
         # TODO testing
-        min_sq_distance = max(get_closest_sq_distance(attacker, targets), 1)
-        for target in targets:
-            floor, ceil = 0.0, 1.0
+        target_sq_distances = get_closest_sq_distances(get_positions(targets), get_positions(attacker))
+        min_sq_distance = max(target_sq_distances.min(initial=numpy.inf), 1)
+        for target, target_sq_distance in zip(targets, target_sq_distances.tolist()):
             base = self._get_attack_base_priority(target)
             weakness = clip(1 - target.shield_health_percentage**2)
-            distance = min_sq_distance / max(get_closest_sq_distance(attacker, target), 1)
-            priority = (
-                    self.attack_priority_base_weight * base
-                    + self.attack_priority_weakness_weight * weakness
-                    + self.attack_priority_distance_weight * distance
-                    + self.attack_priority_base_weakness_correlation * base * weakness
-                    + self.attack_priority_base_distance_correlation * base * distance
-                    + self.attack_priority_weakness_distance_correlation * weakness * distance
-            )
-            priorities[target] = clip(priority, floor, ceil)
+            distance = min_sq_distance / max(target_sq_distance, 1)
+            priorities[target] = float(self.parameters.get_attack_priority(base, weakness, distance))
         return priorities
 
     def _get_defense_priority(self, defender: Unit, threat: Unit) -> float:
@@ -409,16 +450,50 @@ class CombatManager(BotManager):
     #
     #     return damage, attackers
 
-    def _get_enemies(self, units: Units, *, scan_range: float = 5.0) -> Units:
-        enemies = []
-        excluded = {UnitTypeId.EGG, UnitTypeId.LARVA, UnitTypeId.DISRUPTORPHASED}
-        for enemy in api.all_enemy_units.exclude_type(excluded):
-            for unit in units:
-                max_dist = (unit.ground_range + scan_range)**2
-                if squared_distance(unit, enemy) <= max_dist:
-                    enemies.append(enemy)
-                    break
-        return Units(enemies, api)
+    def _skip_micro(self, squad: Squad) -> bool:
+        if self.lod_interval <= 1 or squad.status == SquadStatus.COMBAT:
+            return False
+        if squad.id not in self._last_micro:
+            return False
+        last_micro_step, last_task = self._last_micro[squad.id]
+        if api.step - last_micro_step >= self.lod_interval or squad.task != last_task:
+            return False
+        return not self._has_enemies_nearby(squad, margin=self.lod_margin)
+
+    def _has_enemies_nearby(self, squad: Squad, *, margin: float = 0.0) -> bool:
+        """Check for enemies within the bounding circle of the squad plus scan range and margin."""
+        units = squad.units
+        if not units:
+            return False
+        positions, ranges = self._get_positions_and_scan_ranges(units)
+        return len(self._get_enemy_candidates(positions, ranges, margin=margin)) > 0
+
+    def _get_enemies(self, units: Units, *, scan_range: float = ENEMY_SCAN_RANGE) -> ndarray:
+        """Row indices into the enemy snapshot of enemies within ground range plus scan range of any unit."""
+        if not units:
+            return numpy.empty(0, dtype=int)
+        positions, ranges = self._get_positions_and_scan_ranges(units, scan_range=scan_range)
+        candidates = self._get_enemy_candidates(positions, ranges)
+        if len(candidates) == 0:
+            return candidates
+        delta = api.ext.enemy_snapshot.positions[candidates, None, :] - positions[None, :, :]
+        in_range = (numpy.einsum('ijk,ijk->ij', delta, delta) <= ranges * ranges).any(axis=1)
+        return candidates[in_range]
+
+    def _get_positions_and_scan_ranges(self, units: Units, *,
+                                       scan_range: float = ENEMY_SCAN_RANGE) -> tuple[ndarray, ndarray]:
+        positions = numpy.array([unit.position_tuple for unit in units])
+        ranges = numpy.fromiter((unit.ground_range + scan_range for unit in units), dtype=float, count=len(units))
+        return positions, ranges
+
+    def _get_enemy_candidates(self, positions: ndarray, ranges: ndarray, *, margin: float = 0.0) -> ndarray:
+        """Prefilter enemies against the bounding circle of the positions, extended by the maximum range."""
+        snapshot = api.ext.enemy_snapshot
+        center = positions.mean(axis=0)
+        delta = positions - center
+        radius = math.sqrt(numpy.einsum('ij,ij->i', delta, delta).max())
+        candidates = snapshot.within(center, radius + ranges.max() + margin)
+        return candidates[~numpy.isin(snapshot.type_ids[candidates], EXCLUDED_ENEMY_TYPE_IDS)]
 
     def _micro_unit(self, unit: Unit, *,
                     enemies: Units,
@@ -426,7 +501,9 @@ class CombatManager(BotManager):
                     squad: Squad,
                     squad_attack_priorities: dict[Unit, float],
                     squad_target_priority: float,
-                    squad_target: Optional[Unit]) -> bool:
+                    squad_target: Optional[Unit],
+                    intercept_point: Optional[Point2],
+                    focus_fire_targets: dict[int, Unit]) -> bool:
 
         # if squad_target and isinstance(squad.task, (SquadAttackTask, SquadDefendTask, SquadRetreatTask)):
         #     task_target = squad.task.target.center
@@ -436,14 +513,7 @@ class CombatManager(BotManager):
         #     squad_target_is_closer = True
 
         # --- Offense
-        weapon_ready = self.weapon_ready(unit)
-        if weapon_ready and squad_attack_priorities:
-            attack_prio, target = self._evaluate_offense(unit, squad_attack_priorities=squad_attack_priorities)
-        else:
-            attack_prio = 0
-            target = None
-
-        if target:
+        if target := focus_fire_targets.get(unit.tag):
             api.order.attack(unit, target)
             return True
 
@@ -456,21 +526,22 @@ class CombatManager(BotManager):
                 return True
 
         if isinstance(squad.task, SquadRetreatTask):
-            api.order.move(unit, squad.task.target.center)
+            api.order.move(unit, squad.task.next_waypoint(squad.center))
             return True
 
-        if squad_target_priority >= self.attack_priority_threshold and squad_target:
+        if squad_target_priority >= self.parameters.attack_priority_threshold and squad_target:
             dist_sq = (unit.ground_range + unit.radius + squad_target.radius + unit.distance_to_weapon_ready)**2
             if unit.distance_to_squared(squad_target) >= dist_sq:
-                api.order.attack(unit, squad_target)
-                #intercept_point = self.bot.intercept_unit(unit, squad_target)
-                #return api.order.attack(unit, intercept_point)
+                if intercept_point is not None:
+                    api.order.attack(unit, stabilize_move_target(unit, intercept_point, attack=True))
+                else:
+                    api.order.attack(unit, squad_target)
                 return True
 
         # --- Defense
         defense_prio, defense_position = self._evaluate_defense(unit, enemies=enemies)
 
-        if defense_prio >= self.defense_priority_threshold:  # or (defense_position and unit.shield_health_percentage < 0.2):
+        if defense_prio >= self.parameters.defense_priority_threshold:  # or (defense_position and unit.shield_health_percentage < 0.2):
             api.order.move(unit, defense_position)
             return True
 
@@ -478,10 +549,8 @@ class CombatManager(BotManager):
             api.order.move(unit, defense_position)
             return True
 
-        if squad_target_priority >= self.attack_priority_threshold and squad_target:
+        if squad_target_priority >= self.parameters.attack_priority_threshold and squad_target:
             api.order.attack(unit, squad_target)
-            #intercept_point = self.bot.intercept_unit(unit, squad_target)
-            #return api.order.attack(unit, intercept_point)
             return True
 
         # --- Regroup
@@ -505,36 +574,17 @@ class CombatManager(BotManager):
             step = -3
 
         defense_position = unit.position.towards(threat, distance=step * unit.distance_per_step)
+        if step < 0:
+            # Prefer the safest nearby cell of the threat map, if it is safer than where we are
+            safest_position = self.intel.get_safest_point(unit.position, radius=SAFEST_POINT_RADIUS,
+                                                          air=unit.is_flying)
+            if (self.intel.get_threat(safest_position, air=unit.is_flying)
+                    < self.intel.get_threat(unit.position, air=unit.is_flying)):
+                defense_position = safest_position
         # if not self.bot.game_info.pathing_grid[(int(defense_position.x), int(defense_position.y))]:
         #    defense_position = marine.position.towards_with_random_angle(threat.position, distance=-2)
         return defense_prio, defense_position
 
-    def _target_in_range(self, unit: Unit, target: Unit) -> bool:
-        # TODO
-        return unit.target_in_range(target)
-        # if target.type_id == UnitTypeId.SIEGETANKSIEGED:
-        #     bonus_distance = 0
-        # else:
-        #     bonus_distance = 0
-        # return unit.target_in_range(target, bonus_distance=bonus_distance)
-
-    def _evaluate_offense(self, unit: Unit, *,
-                          squad_attack_priorities: dict[Unit, float]) -> tuple[float, Optional[Unit]]:
-
-        # scan_range = self.get_scan_range(unit)
-        # attack_priorities_scan_range = {target: priority for target, priority
-        #                                 in group_attack_priorities.items()
-        #                                 if squared_distance(unit, target) <= scan_range ** 2}
-        attack_priorities_attack_range = {target: priority for target, priority
-                                          in squad_attack_priorities.items()
-                                          if self._target_in_range(unit, target)}
-
-        if not attack_priorities_attack_range:
-            return 0, None
-
-        target, attack_prio = max(attack_priorities_attack_range.items(), key=lambda kv: kv[1])
-        return attack_prio, target
-
     def _evaluate_ability(self, unit: Unit, *,
                           abilities: list[AbilityId],
                           group_attack_priorities: dict[Unit, float]
@@ -0,0 +1,99 @@
+import numpy
+from numpy import ndarray
+from sc2.data import TargetType
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+MIN_DAMAGE_PER_ATTACK = 0.5
+
+
+# Damage and number of attacks vs ground and air of units attacking without a weapon in their type data
+WEAPONLESS_ATTACK_STATS: dict[UnitTypeId, tuple[tuple[float, int], tuple[float, int]]] = {
+    UnitTypeId.BATTLECRUISER: ((8.0, 1), (5.0, 1)),
+    UnitTypeId.ORACLE: ((15.0, 1), (0.0, 0)),
+}
+
+
+def get_attack_stats(unit: Unit, *, air: bool) -> tuple[float, float, int]:
+    """Range, damage per attack (without bonuses and upgrades) and number of attacks vs ground or air.
+
+    Range and the ability to attack come from python-sc2, which handles the special cases; only damage and number
+    of attacks are read from the weapons.
+    """
+    if not (unit.can_attack_air if air else unit.can_attack_ground):
+        return 0.0, 0.0, 0
+    weapon_range = unit.air_range if air else unit.ground_range
+    target_type = TargetType.Air.value if air else TargetType.Ground.value
+    for weapon in unit._weapons:
+        if weapon.type in {target_type, TargetType.Any.value}:
+            return weapon_range, weapon.damage, weapon.attacks
+    if (stats := WEAPONLESS_ATTACK_STATS.get(unit.type_id)) is not None:
+        damage, attacks = stats[1] if air else stats[0]
+        return weapon_range, damage, attacks
+    return 0.0, 0.0, 0
+
+
+def allocate_targets(attacker_positions: ndarray,
+                     attacker_radii: ndarray,
+                     attacker_stats: ndarray,
+                     target_positions: ndarray,
+                     target_radii: ndarray,
+                     target_flying: ndarray,
+                     target_hp: ndarray,
+                     target_armor: ndarray,
+                     target_priorities: ndarray) -> ndarray:
+    """Greedy overkill-aware assignment of attackers to targets in weapon range.
+
+    attacker_stats has shape (n, 6): ground range, damage, attacks, air range, damage, attacks.
+    Attackers with the fewest targets in range choose first. Each picks the highest priority target which
+    is not yet expected to die, or the highest priority target in range if all of them are.
+    Returns the target index per attacker, -1 for attackers without target in range.
+    """
+    flying = target_flying[None, :]
+    weapon_range = numpy.where(flying, attacker_stats[:, 3, None], attacker_stats[:, 0, None])
+    damage = numpy.where(flying, attacker_stats[:, 4, None], attacker_stats[:, 1, None])
+    attacks = numpy.where(flying, attacker_stats[:, 5, None], attacker_stats[:, 2, None])
+    damage = numpy.maximum(damage - target_armor[None, :], MIN_DAMAGE_PER_ATTACK) * attacks
+
+    delta = attacker_positions[:, None, :] - target_positions[None, :, :]
+    sq_distance = numpy.einsum('ijk,ijk->ij', delta, delta)
+    max_distance = weapon_range + attacker_radii[:, None] + target_radii[None, :]
+    in_range = (attacks > 0) & (sq_distance <= max_distance * max_distance)
+
+    assignment = numpy.full(len(attacker_positions), -1, dtype=int)
+    options = in_range.sum(axis=1)
+    order = numpy.argsort(options, kind='stable')
+    order = order[options[order] > 0]
+    remaining_hp = target_hp.astype(float)
+    for attacker in order:
+        candidates = in_range[attacker]
+        alive = candidates & (remaining_hp > 0)
+        if not alive.any():
+            alive = candidates
+        target = numpy.argmax(numpy.where(alive, target_priorities, -numpy.inf))
+        remaining_hp[target] -= damage[attacker, target]
+        assignment[attacker] = target
+    return assignment
+
+
+def allocate_focus_fire(attackers: Units, target_priorities: dict[Unit, float]) -> dict[int, Unit]:
+    """Maps attacker tags to their allocated target, see allocate_targets."""
+    if not attackers or not target_priorities:
+        return {}
+    targets = list(target_priorities)
+    attacker_stats = numpy.array([get_attack_stats(unit, air=False) + get_attack_stats(unit, air=True)
+                                  for unit in attackers], dtype=float)
+    assignment = allocate_targets(
+        attacker_positions=numpy.array([unit.position_tuple for unit in attackers]),
+        attacker_radii=numpy.array([unit.radius for unit in attackers]),
+        attacker_stats=attacker_stats,
+        target_positions=numpy.array([target.position_tuple for target in targets]),
+        target_radii=numpy.array([target.radius for target in targets]),
+        target_flying=numpy.array([target.is_flying for target in targets]),
+        target_hp=numpy.array([target.health + target.shield for target in targets], dtype=float),
+        target_armor=numpy.array([target.armor for target in targets], dtype=float),
+        target_priorities=numpy.array(list(target_priorities.values()), dtype=float),
+    )
+    return {unit.tag: targets[index] for unit, index in zip(attackers, assignment) if index >= 0}
@@ -0,0 +1,56 @@
+import json
+from dataclasses import dataclass, asdict, fields
+from pathlib import Path
+from typing import Self
+
+import numpy
+from numpy import ndarray
+
+
+@dataclass
+class CombatParameters:
+    attack_priority_base_weight: float = 0.75
+    attack_priority_weakness_weight: float = 0.10
+    attack_priority_distance_weight: float = 0.05
+    attack_priority_base_weakness_correlation: float = 0.05
+    attack_priority_base_distance_correlation: float = 0.05
+    attack_priority_weakness_distance_correlation: float = 0.00
+    attack_priority_threshold: float = 0.375  # attack_priority_base_weight/2
+    defense_priority_threshold: float = 0.50
+
+    @classmethod
+    def names(cls) -> list[str]:
+        return [f.name for f in fields(cls)]
+
+    @classmethod
+    def from_array(cls, values: ndarray | list[float]) -> Self:
+        return cls(**{name: float(value) for name, value in zip(cls.names(), values, strict=True)})
+
+    def to_array(self) -> ndarray:
+        return numpy.asarray([getattr(self, name) for name in self.names()], dtype=float)
+
+    @classmethod
+    def load(cls, path: str | Path, *, rank: int = 0) -> Self:
+        """Load parameters from a JSON object, or from a ranked list of {"parameters": {...}} entries."""
+        with open(path) as file:
+            data = json.load(file)
+        if isinstance(data, list):
+            data = data[rank]['parameters']
+        return cls(**data)
+
+    def save(self, path: str | Path) -> None:
+        with open(path, 'w') as file:
+            json.dump(asdict(self), file, indent=4)
+
+    def get_attack_priority(self, base: float | ndarray, weakness: float | ndarray,
+                            distance: float | ndarray) -> float | ndarray:
+        """Attack priority in [0, 1] from base, weakness and distance, each in [0, 1]."""
+        priority = (
+                self.attack_priority_base_weight * base
+                + self.attack_priority_weakness_weight * weakness
+                + self.attack_priority_distance_weight * distance
+                + self.attack_priority_base_weakness_correlation * base * weakness
+                + self.attack_priority_base_distance_correlation * base * distance
+                + self.attack_priority_weakness_distance_correlation * weakness * distance
+        )
+        return numpy.clip(priority, 0.0, 1.0)
@@ -0,0 +1,102 @@
+from dataclasses import dataclass, field
+
+import numpy
+from scipy.ndimage import maximum_filter
+from scipy.sparse.csgraph import dijkstra
+from sc2.position import Point2
+
+from avocados import api
+from avocados.bot.intelmanager import IntelManager
+from avocados.combat.squad import Squad
+from avocados.geometry.util import get_grid_graph
+from avocados.mapdata import MapManager
+
+
+PLANNER_RADIUS = 24
+THREAT_COST_WEIGHT = 5.0
+THREAT_MARGIN = 1
+RALLY_THREAT_WEIGHT = 100.0
+# Must be below 1, otherwise no rally cell can be better than staying at the start
+RALLY_PATH_COST_WEIGHT = 0.5
+WAYPOINT_SPACING = 4
+CACHE_DURATION = 22  # Steps
+
+
+@dataclass(frozen=True)
+class RetreatPlan:
+    rally: Point2
+    waypoints: list[Point2] = field(compare=False)
+    threat: float
+    step: int
+
+
+class RetreatPlanner:
+    """Plans retreats with a Dijkstra search over the pathing grid, where enemy threat increases the cost."""
+    map: MapManager
+    intel: IntelManager
+    radius: int
+    cache_duration: int
+    _cache: dict[int, RetreatPlan]
+
+    def __init__(self, *,
+                 map_manager: MapManager,
+                 intel_manager: IntelManager,
+                 radius: int = PLANNER_RADIUS,
+                 cache_duration: int = CACHE_DURATION) -> None:
+        self.map = map_manager
+        self.intel = intel_manager
+        self.radius = radius
+        self.cache_duration = cache_duration
+        self._cache = {}
+
+    def plan(self, squad: Squad, destination: Point2) -> RetreatPlan:
+        """Safest reachable rally cell within radius of the squad, preferring short paths towards destination."""
+        if (plan := self._cache.get(squad.id)) is not None and api.step < plan.step + self.cache_duration:
+            return plan
+        air = all(unit.is_flying for unit in squad.units)
+        plan = self._plan(squad.center, destination, air=air)
+        self._cache = {squad_id: plan for squad_id, plan in self._cache.items()
+                       if api.step < plan.step + self.cache_duration}
+        self._cache[squad.id] = plan
+        return plan
+
+    def _plan(self, start: Point2, destination: Point2, *, air: bool) -> RetreatPlan:
+        threat_field = self.intel.air_threat if air else self.intel.ground_threat
+        x, y = threat_field.point_to_indices(start)
+        x0, x1 = max(x - self.radius, 0), min(x + self.radius + 1, threat_field.width)
+        y0, y1 = max(y - self.radius, 0), min(y + self.radius + 1, threat_field.height)
+        threat = threat_field.data[x0:x1, y0:y1]
+        xs = numpy.arange(x0, x1)[:, None]
+        ys = numpy.arange(y0, y1)[None, :]
+        valid = (xs - x)**2 + (ys - y)**2 <= self.radius**2
+        if not air:
+            valid &= self.map.pathing_grid.data[x0:x1, y0:y1] > 0
+        if not valid.any():
+            return RetreatPlan(rally=start, waypoints=[start], threat=float('inf'), step=api.step)
+
+        # Threat margin keeps paths away from the edges of weapon ranges
+        cost = 1 + THREAT_COST_WEIGHT * maximum_filter(threat, size=2 * THREAT_MARGIN + 1)
+        graph = get_grid_graph(valid, cost)
+        # Start from the nearest valid cell, in case the squad center is not pathable
+        distance_sq = numpy.where(valid, (xs - x)**2 + (ys - y)**2, numpy.iinfo(int).max)
+        source = int(numpy.argmin(distance_sq))
+        path_cost, predecessors = dijkstra(graph, indices=source, return_predecessors=True)
+
+        offset = threat_field.offset
+        destination_distance = numpy.sqrt((xs + 0.5 + offset.x - destination.x)**2
+                                           + (ys + 0.5 + offset.y - destination.y)**2)
+        score = (RALLY_THREAT_WEIGHT * threat + RALLY_PATH_COST_WEIGHT * path_cost.reshape(valid.shape)
+                 + destination_distance)
+        score = numpy.where(valid & numpy.isfinite(score), score, numpy.inf)
+        rally = int(numpy.argmin(score))
+
+        path = [rally]
+        while path[-1] != source and predecessors[path[-1]] >= 0:
+            path.append(int(predecessors[path[-1]]))
+        path.reverse()
+        cells = path[WAYPOINT_SPACING::WAYPOINT_SPACING]
+        if not cells or cells[-1] != rally:
+            cells.append(rally)
+        height = y1 - y0
+        waypoints = [Point2((x0 + cell // height + 0.5, y0 + cell % height + 0.5)) + offset for cell in cells]
+        return RetreatPlan(rally=waypoints[-1], waypoints=waypoints, threat=float(threat.flat[rally]), step=api.step)
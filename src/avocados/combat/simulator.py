@@ -0,0 +1,300 @@
+"""Simplified 2D combat simulation of micro scenarios, which does not require a running game.
+
+Only the unit types in UNIT_STATS are supported. Units are discs without collision, attacks hit instantly
+and upgrades are ignored. Player 1 is micro'd like CombatManager.micro_squad with a given set of
+CombatParameters, player 2 attack-moves towards the closest enemy.
+"""
+from dataclasses import dataclass, field
+from typing import Optional, Self
+
+import numpy
+from numpy import ndarray
+from sc2.ids.unit_typeid import UnitTypeId
+
+from avocados.combat.focusfire import allocate_targets
+from avocados.combat.parameters import CombatParameters
+from avocados.core.util import lerp
+
+
+STEP_DURATION = 2 / 22.4
+ENEMY_SCAN_RANGE = 5.0
+OPPONENT_SIGHT_RANGE = 10.0
+SPAWN_OFFSET = 8.0
+SPAWN_SPREAD = 1.0
+ARENA_SIZE = 22.0
+VESPENE_VALUE = 2.0
+
+
+@dataclass(frozen=True)
+class UnitStats:
+    health: float
+    armor: float
+    damage: float
+    cooldown: float
+    range: float
+    speed: float
+    radius: float
+    minerals: int
+    vespene: int
+    # Base attack priority as in CombatManager._get_attack_base_priority
+    priority: float
+    # Defense priority as (attack distance, priority) points as in CombatManager._get_defense_priority
+    defense: tuple[tuple[float, float], ...] = ((0.0, 0.2),)
+    shield: float = 0.0
+    attacks: int = 1
+    can_attack_air: bool = False
+    light: bool = False
+    armored: bool = False
+    bonus_light: float = 0.0
+    bonus_armored: float = 0.0
+    min_range: float = 0.0
+    splash: float = 0.0
+    suicide: bool = False
+
+
+UNIT_STATS: dict[UnitTypeId, UnitStats] = {
+    UnitTypeId.MARINE: UnitStats(
+        health=45, armor=0, damage=6, cooldown=0.61, range=5, speed=3.15, radius=0.375, minerals=50, vespene=0,
+        priority=0.60, defense=((5, 0.2), (6, 0.1)), can_attack_air=True, light=True),
+    UnitTypeId.MARAUDER: UnitStats(
+        health=125, armor=1, damage=10, cooldown=1.07, range=6, speed=3.15, radius=0.5625, minerals=100, vespene=25,
+        priority=0.55, armored=True, bonus_armored=10),
+    UnitTypeId.REAPER: UnitStats(
+        health=60, armor=0, damage=4, attacks=2, cooldown=0.79, range=5, speed=5.25, radius=0.375, minerals=50,
+        vespene=50, priority=0.65, defense=((5, 0.2), (6, 0.1)), light=True),
+    UnitTypeId.SIEGETANKSIEGED: UnitStats(
+        health=175, armor=1, damage=40, cooldown=2.14, range=13, speed=0, radius=0.875, minerals=150, vespene=125,
+        priority=0.80, defense=((2, 0.8), (11, 0.8), (13, 0.2)), armored=True, bonus_armored=30, min_range=2,
+        splash=1.25),
+    UnitTypeId.ZERGLING: UnitStats(
+        health=35, armor=0, damage=5, cooldown=0.497, range=0.1, speed=4.13, radius=0.375, minerals=25, vespene=0,
+        priority=0.60, defense=((0.5, 0.8), (1.5, 0.5), (5.0, 0.2)), light=True),
+    UnitTypeId.BANELING: UnitStats(
+        health=30, armor=0, damage=16, cooldown=0.83, range=0.25, speed=3.5, radius=0.375, minerals=50,
+        vespene=25, priority=1.00, defense=((2.0, 1.0), (2.0, 0.5), (5.0, 0.3)), bonus_light=19, splash=2.2,
+        suicide=True),
+    UnitTypeId.ROACH: UnitStats(
+        health=145, armor=1, damage=16, cooldown=1.43, range=4, speed=3.15, radius=0.625, minerals=75, vespene=25,
+        priority=0.55, armored=True),
+    UnitTypeId.ZEALOT: UnitStats(
+        health=100, shield=50, armor=1, damage=8, attacks=2, cooldown=0.86, range=0.1, speed=3.15, radius=0.5,
+        minerals=100, vespene=0, priority=0.55, defense=((0.5, 0.8), (2.0, 0.5), (5.0, 0.2)), light=True),
+    UnitTypeId.STALKER: UnitStats(
+        health=80, shield=80, armor=1, damage=13, cooldown=1.34, range=6, speed=4.13, radius=0.625, minerals=125,
+        vespene=50, priority=0.60, can_attack_air=True, armored=True, bonus_armored=5),
+}
+
+
+@dataclass
+class SimulationResult:
+    duration: float
+    winner: int
+    lost_p1: tuple[float, float]
+    lost_p2: tuple[float, float]
+
+    def get_rating(self, *, vespene_value: float = VESPENE_VALUE) -> float:
+        """Share of the total resources lost which were lost by player 2, as in MicroScenarioManager.analyse."""
+        resources_lost_p1 = self.lost_p1[0] + vespene_value * self.lost_p1[1]
+        resources_lost_p2 = self.lost_p2[0] + vespene_value * self.lost_p2[1]
+        total = resources_lost_p1 + resources_lost_p2
+        if total == 0:
+            return 0.5
+        return resources_lost_p2 / total
+
+
+@dataclass
+class _Army:
+    stats: list[UnitStats]
+    positions: ndarray
+    health: ndarray = field(init=False)
+    shield: ndarray = field(init=False)
+    cooldown: ndarray = field(init=False)
+    health_max: ndarray = field(init=False)
+    radii: ndarray = field(init=False)
+    ranges: ndarray = field(init=False)
+    speeds: ndarray = field(init=False)
+    armor: ndarray = field(init=False)
+    priorities: ndarray = field(init=False)
+
+    def __post_init__(self) -> None:
+        self.health = numpy.array([s.health for s in self.stats], dtype=float)
+        self.shield = numpy.array([s.shield for s in self.stats], dtype=float)
+        self.cooldown = numpy.zeros(len(self.stats))
+        self.health_max = self.health + self.shield
+        self.radii = numpy.array([s.radius for s in self.stats])
+        self.ranges = numpy.array([s.range for s in self.stats])
+        self.speeds = numpy.array([s.speed for s in self.stats])
+        self.armor = numpy.array([s.armor for s in self.stats])
+        self.priorities = numpy.array([s.priority for s in self.stats])
+
+    @classmethod
+    def spawn(cls, unit_types: dict[UnitTypeId, int], center: ndarray, rng: numpy.random.Generator) -> Self:
+        stats = [UNIT_STATS[utype] for utype, number in unit_types.items() for _ in range(number)]
+        positions = center + rng.normal(scale=SPAWN_SPREAD, size=(len(stats), 2))
+        return cls(stats, positions)
+
+    @property
+    def alive(self) -> ndarray:
+        return self.health > 0
+
+    def get_losses(self) -> tuple[float, float]:
+        dead = ~self.alive
+        minerals = sum(s.minerals for s, d in zip(self.stats, dead) if d)
+        vespene = sum(s.vespene for s, d in zip(self.stats, dead) if d)
+        return minerals, vespene
+
+    def move_towards(self, index: int, target: ndarray, *, distance: Optional[float] = None) -> None:
+        delta = target - self.positions[index]
+        length = numpy.hypot(*delta)
+        if distance is None:
+            distance = min(self.speeds[index] * STEP_DURATION, length)
+        if length > 1e-6:
+            self.positions[index] += distance * delta / length
+        numpy.clip(self.positions[index], -ARENA_SIZE / 2, ARENA_SIZE / 2, out=self.positions[index])
+
+
+def _get_sq_distances(positions1: ndarray, positions2: ndarray) -> ndarray:
+    delta = positions1[:, None, :] - positions2[None, :, :]
+    return numpy.einsum('ijk,ijk->ij', delta, delta)
+
+
+def _attack(attacker: _Army, index: int, defender: _Army, target: int) -> None:
+    stats = attacker.stats[index]
+    if stats.splash > 0:
+        sq_distances = _get_sq_distances(defender.positions[[target]], defender.positions)[0]
+        hit = numpy.flatnonzero(defender.alive & (sq_distances <= stats.splash**2))
+    else:
+        hit = [target]
+    for victim in hit:
+        victim_stats = defender.stats[victim]
+        damage = (stats.damage + victim_stats.light * stats.bonus_light
+                  + victim_stats.armored * stats.bonus_armored)
+        damage = stats.attacks * max(damage - victim_stats.armor, 0.5)
+        absorbed = min(defender.shield[victim], damage)
+        defender.shield[victim] -= absorbed
+        defender.health[victim] -= damage - absorbed
+    attacker.cooldown[index] = stats.cooldown
+    if stats.suicide:
+        attacker.health[index] = 0
+
+
+def _in_range(attacker: _Army, index: int, defender: _Army, sq_distances: ndarray) -> ndarray:
+    stats = attacker.stats[index]
+    max_distance = stats.range + stats.radius + defender.radii
+    return defender.alive & (sq_distances <= max_distance**2) & (sq_distances >= stats.min_range**2)
+
+
+def _step_player1(army: _Army, enemies: _Army, parameters: CombatParameters, location: ndarray) -> None:
+    alive = numpy.flatnonzero(army.alive)
+    sq_distances = _get_sq_distances(army.positions, enemies.positions)
+    scan_ranges = army.ranges + ENEMY_SCAN_RANGE
+    visible = enemies.alive & (sq_distances[alive] <= scan_ranges[alive, None]**2).any(axis=0)
+    targets = numpy.flatnonzero(visible)
+
+    squad_target = None
+    squad_target_priority = 0.0
+    assignment = numpy.full(len(army.stats), -1)
+    if len(targets):
+        closest_sq_distances = numpy.maximum(sq_distances[numpy.ix_(alive, targets)].min(axis=0), 1)
+        weakness = numpy.clip(1 - ((enemies.health[targets] + enemies.shield[targets])
+                                   / enemies.health_max[targets])**2, 0, 1)
+        distance = closest_sq_distances.min() / closest_sq_distances
+        priorities = parameters.get_attack_priority(enemies.priorities[targets], weakness, distance)
+        squad_target = targets[numpy.argmax(priorities)]
+        squad_target_priority = priorities.max()
+
+        ready = alive[army.cooldown[alive] <= 0]
+        if len(ready):
+            stats = numpy.array([(army.ranges[i], s.damage, s.attacks, s.range if s.can_attack_air else 0,
+                                  s.damage, s.attacks if s.can_attack_air else 0)
+                                 for i, s in ((i, army.stats[i]) for i in ready)], dtype=float)
+            ready_assignment = allocate_targets(
+                attacker_positions=army.positions[ready],
+                attacker_radii=army.radii[ready],
+                attacker_stats=stats,
+                target_positions=enemies.positions[targets],
+                target_radii=enemies.radii[targets],
+                target_flying=numpy.zeros(len(targets), dtype=bool),
+                target_hp=enemies.health[targets] + enemies.shield[targets],
+                target_armor=enemies.armor[targets],
+                target_priorities=priorities,
+            )
+            valid = ready_assignment >= 0
+            assignment[ready[valid]] = targets[ready_assignment[valid]]
+
+    engage = squad_target is not None and squad_target_priority >= parameters.attack_priority_threshold
+    for index in alive:
+        if assignment[index] >= 0:
+            if enemies.alive[assignment[index]]:
+                _attack(army, index, enemies, assignment[index])
+            continue
+        if engage:
+            distance_to_target = numpy.sqrt(sq_distances[index, squad_target])
+            weapon_ready_distance = army.speeds[index] * max(army.cooldown[index], 0)
+            if distance_to_target >= (army.ranges[index] + army.radii[index] + enemies.radii[squad_target]
+                                      + weapon_ready_distance):
+                army.move_towards(index, enemies.positions[squad_target])
+                continue
+        # Defense
+        threats = numpy.flatnonzero(visible & (sq_distances[index] <= scan_ranges[index]**2))
+        if len(threats):
+            attack_distances = (numpy.sqrt(sq_distances[index, threats]) - army.radii[index]
+                                - enemies.radii[threats])
+            defense_priorities = [lerp(d, *enemies.stats[t].defense) for t, d in zip(threats, attack_distances)]
+            threat = threats[numpy.argmax(defense_priorities)]
+            defense_priority = max(defense_priorities)
+            health_percentage = (army.health[index] + army.shield[index]) / army.health_max[index]
+            if (defense_priority >= parameters.defense_priority_threshold
+                    or (defense_priority > 0 and health_percentage < 0.8)):
+                step = 3 if enemies.stats[threat].min_range > 0 and sq_distances[index, threat] <= 9**2 else -3
+                army.move_towards(index, enemies.positions[threat],
+                                  distance=step * army.speeds[index] * STEP_DURATION)
+                continue
+        if engage:
+            army.move_towards(index, enemies.positions[squad_target])
+        elif squad_target is None:
+            army.move_towards(index, location)
+
+
+def _step_player2(army: _Army, enemies: _Army, location: ndarray) -> None:
+    sq_distances = _get_sq_distances(army.positions, enemies.positions)
+    for index in numpy.flatnonzero(army.alive):
+        if not enemies.alive.any():
+            return
+        distances = numpy.where(enemies.alive, sq_distances[index], numpy.inf)
+        closest = int(numpy.argmin(distances))
+        in_range = _in_range(army, index, enemies, sq_distances[index])
+        if in_range.any():
+            if army.cooldown[index] <= 0:
+                _attack(army, index, enemies, int(numpy.argmin(numpy.where(in_range, distances, numpy.inf))))
+        elif army.speeds[index] > 0:
+            if distances[closest] <= OPPONENT_SIGHT_RANGE**2:
+                army.move_towards(index, enemies.positions[closest])
+            else:
+                army.move_towards(index, location)
+
+
+def simulate(units: tuple[dict[UnitTypeId, int], dict[UnitTypeId, int]],
+             parameters: CombatParameters, *,
+             seed: int = 0,
+             max_duration: float = 60.0) -> SimulationResult:
+    """Simulate a micro scenario, with units spawned left and right of the arena center like MicroScenario."""
+    rng = numpy.random.default_rng(seed)
+    location = numpy.zeros(2)
+    army1 = _Army.spawn(units[0], location - (SPAWN_OFFSET, 0), rng)
+    army2 = _Army.spawn(units[1], location + (SPAWN_OFFSET, 0), rng)
+    time = 0.0
+    while time < max_duration and army1.alive.any() and army2.alive.any():
+        _step_player1(army1, army2, parameters, location)
+        _step_player2(army2, army1, location)
+        for army in (army1, army2):
+            army.cooldown -= STEP_DURATION
+        time += STEP_DURATION
+
+    if army1.alive.any() and not army2.alive.any():
+        winner = 1
+    elif army2.alive.any() and not army1.alive.any():
+        winner = 2
+    else:
+        winner = 0
+    return SimulationResult(duration=time, winner=winner, lost_p1=army1.get_losses(), lost_p2=army2.get_losses())
@@ -1,9 +1,11 @@
 import math
-from collections import Counter, deque
+from collections import Counter
 from dataclasses import dataclass, field
 from enum import StrEnum
 from typing import Optional, Protocol, runtime_checkable, Any
 
+import numpy
+from numpy import ndarray
 from sc2.ids.unit_typeid import UnitTypeId
 from sc2.position import Point2
 from sc2.unit import Unit
@@ -12,8 +14,10 @@ from sc2.units import Units
 from avocados import api
 from avocados.combat.util import get_strength
 from avocados.core.botobject import BotObject
-from avocados.core.unitutil import get_unit_type_counts, get_unique_unit_types
-from avocados.geometry import Area, Circle
+from avocados.core.timeseries import WindowedSum
+from avocados.core.unitutil import get_unit_type_counts
+from avocados.geometry import Area, Circle, Rectangle
+from avocados.geometry.util import convex_hull
 
 
 @runtime_checkable
@@ -42,6 +46,13 @@ class SquadRetreatTask(SquadTask):
     target: Area
     priority: float = field(default=0.5, compare=False)
     started: float = field(default=0.0, compare=False)
+    waypoints: list[Point2] = field(default_factory=list, compare=False)
+
+    def next_waypoint(self, position: Point2, *, reached_distance: float = 2.0) -> Point2:
+        """First waypoint not yet reached from position, or the target center."""
+        while self.waypoints and position.distance_to(self.waypoints[0]) < reached_distance:
+            self.waypoints.pop(0)
+        return self.waypoints[0] if self.waypoints else self.target.center
 
 
 @dataclass
@@ -58,6 +69,43 @@ class SquadStatus(StrEnum):
     AT_TARGET= "T"
 
 
+@dataclass(frozen=True)
+class SquadGeometry:
+    positions: ndarray
+    centroid: Point2
+    medoid: Unit
+    radius: float
+    covariance: ndarray
+    hull: ndarray
+    bounds: Rectangle
+    spacing: float
+
+    @classmethod
+    def of_units(cls, units: Units, positions: ndarray, radii: ndarray, *, spacing: float) -> 'SquadGeometry':
+        """Medoid ties are broken by the lowest tag. The effective radius is based on the total unit area."""
+        centroid = positions.mean(axis=0)
+        delta = positions[:, None, :] - positions[None, :, :]
+        distance_sums = numpy.sqrt(numpy.einsum('ijk,ijk->ij', delta, delta)).sum(axis=1)
+        candidates = numpy.flatnonzero(distance_sums <= distance_sums.min() + 1e-9)
+        medoid = min((units[index] for index in candidates), key=lambda unit: unit.tag)
+        if len(units) == 1:
+            radius = float(radii[0])
+        else:
+            radius = math.sqrt(2 * numpy.sum((radii + spacing)**2))
+        lower = positions.min(axis=0)
+        upper = positions.max(axis=0)
+        return cls(
+            positions=positions,
+            centroid=Point2((float(centroid[0]), float(centroid[1]))),
+            medoid=medoid,
+            radius=radius,
+            covariance=numpy.cov(positions, rowvar=False, bias=True).reshape(2, 2),
+            hull=convex_hull(positions),
+            bounds=Rectangle(float(lower[0]), float(lower[1]), float(upper[0] - lower[0]), float(upper[1] - lower[1])),
+            spacing=spacing,
+        )
+
+
 leash_range: dict[SquadStatus, float] = {
     SquadStatus.IDLE: 8.0,
     SquadStatus.MOVING: 1.0,
@@ -73,20 +121,34 @@ class Squad(BotObject):
     target_strength: float
     _tags: set[int]
     _tasks: list[SquadTask]
-    damage_taken: deque[float]
+    damage_taken: WindowedSum
+    _health_max: float
+    _unit_health_max: dict[int, float]
+    # Resolved once per step or after membership changes
+    _units: Optional[Units]
+    _unit_indices: Optional[ndarray]
+    _units_step: int
+    _geometry: Optional[SquadGeometry]
 
     def __init__(self, tags: Optional[set[int]] = None, *,
                  target_strength: float,
                  _code: bool = False) -> None:
         super().__init__()
         assert _code, "Squads should only be created by the SquadManager"
-        self._tags = tags or set()
+        self._tags = set()
+        self._health_max = 0.0
+        self._unit_health_max = {}
+        self._add_tags(tags or set())
         self._tasks = []
         self.target_strength = target_strength
         self.spacing = 0.0
         self.status = SquadStatus.IDLE
         self.status_changed = 0.0
-        self.damage_taken = deque(maxlen=100)
+        self.damage_taken = WindowedSum(100)
+        self._units = None
+        self._unit_indices = None
+        self._units_step = -1
+        self._geometry = None
 
     def __repr__(self) -> str:
         return (f"{type(self).__name__}(id={self.id}, size={self.size}, spacing={self.spacing},"
@@ -101,11 +163,44 @@ class Squad(BotObject):
 
     @property
     def units(self) -> Units:
-        return api.units.tags_in(self._tags)
+        self._resolve_units()
+        return self._units
+
+    @property
+    def unit_indices(self) -> ndarray:
+        """Row indices of the squad's units in api.ext.unit_snapshot."""
+        self._resolve_units()
+        return self._unit_indices
 
     def __contains__(self, tag: int) -> bool:
         return tag in self._tags
 
+    def _add_tags(self, tags: set[int]) -> None:
+        """Membership changes should only be made by the SquadManager."""
+        for tag in tags - self._tags:
+            snapshot = api.ext.unit_snapshot
+            health_max = snapshot[index].health_max if (index := snapshot.index(tag)) is not None else 0.0
+            self._unit_health_max[tag] = health_max
+            self._health_max += health_max
+        self._tags.update(tags)
+        self._units = None
+
+    def _remove_tags(self, tags: set[int]) -> None:
+        for tag in tags & self._tags:
+            self._health_max -= self._unit_health_max.pop(tag, 0.0)
+        self._tags.difference_update(tags)
+        self._units = None
+
+    def _resolve_units(self) -> None:
+        if self._units is not None and self._units_step == api.step:
+            return
+        snapshot = api.ext.unit_snapshot
+        indices = (index for tag in self._tags if (index := snapshot.index(tag)) is not None)
+        self._unit_indices = numpy.sort(numpy.fromiter(indices, dtype=int))
+        self._units = snapshot.take(self._unit_indices)
+        self._units_step = api.step
+        self._geometry = None
+
     def set_status(self, status: SquadStatus) -> None:
         if status != self.status:
             self.status_changed = api.time
@@ -123,11 +218,18 @@ class Squad(BotObject):
 
     @property
     def health_max(self) -> float:
-        return sum(u.health_max for u in self.units)
+        """Maintained as units join or leave the squad."""
+        return self._health_max
 
     @property
     def damage_taken_percentage(self) -> float:
-        return sum(self.damage_taken) / self.health_max
+        if self._health_max <= 0:
+            return 0.0
+        return self.damage_taken.sum / self._health_max
+
+    @property
+    def damage_per_second(self) -> float:
+        return self.damage_taken.rate()
 
     # --- Distance
 
@@ -155,7 +257,7 @@ class Squad(BotObject):
         if len(self) == 0:
             return float('inf')
         if isinstance(target, Area):
-            return target.closest(self.units)[1]
+            return math.sqrt(target.closest(self.units)[1])
         if isinstance(target, Unit):
             target = target.position
         return target.distance_to_closest(self.units)
@@ -199,8 +301,9 @@ class Squad(BotObject):
         self._add_task(task, queue=queue)
         return task
 
-    def retreat(self, area: Area, *, priority: float = 0.5, queue: bool = False) -> SquadRetreatTask:
-        task = SquadRetreatTask(area, priority=priority, started=api.time)
+    def retreat(self, area: Area, *, priority: float = 0.5, waypoints: Optional[list[Point2]] = None,
+                queue: bool = False) -> SquadRetreatTask:
+        task = SquadRetreatTask(area, priority=priority, started=api.time, waypoints=list(waypoints or []))
         self._add_task(task, queue=queue)
         return task
 
@@ -216,53 +319,59 @@ class Squad(BotObject):
 
     # --- Position
 
+    @property
+    def geometry(self) -> Optional[SquadGeometry]:
+        """Computed once per step, or after membership or spacing changes."""
+        units = self.units
+        if units.empty:
+            return None
+        if self._geometry is None or self._geometry.spacing != self.spacing:
+            snapshot = api.ext.unit_snapshot
+            self._geometry = SquadGeometry.of_units(units, snapshot.positions[self._unit_indices],
+                                                    snapshot.radii[self._unit_indices], spacing=self.spacing)
+        return self._geometry
+
     @property
     def radius_squared(self) -> float:
-        """Caching may not be correct, as units can change during frame."""
-        if len(self) == 0:
-            return 0.0
-        if len(self) == 1:
-            return self.units.first.radius**2
-        unit_sq_radius = sum(number * (unit.radius + self.spacing)**2
-                             for unit, number in get_unique_unit_types(self.units).items())
-        return 2 * unit_sq_radius
+        return self.radius**2
 
     @property
     def radius(self) -> float:
-        return math.sqrt(self.radius_squared)
+        if (geometry := self.geometry) is None:
+            return 0.0
+        return geometry.radius
 
     @property
     def leash_range(self) -> float:
-        return math.sqrt(self.radius_squared) + leash_range[self.status]
+        return self.radius + leash_range[self.status]
 
     @property
     def center_unit(self) -> Optional[Unit]:
-        """Caching may not be correct, as units can change during frame."""
-        if self.units.empty:
+        if (geometry := self.geometry) is None:
             return None
-        if len(self) == 2:
-            return self.units.first if self.units.first.tag < self.units[-1].tag else self.units[-1]
-        return self.units.closest_to(self.geometric_center)
+        return geometry.medoid
 
     @property
     def center(self) -> Optional[Point2]:
-        """Caching may not be correct, as units can change during frame."""
-        if self.units.empty:
+        if (geometry := self.geometry) is None:
             return None
-        return self.center_unit.position
+        return geometry.medoid.position
 
     @property
     def geometric_center(self) -> Optional[Point2]:
-        """Caching may not be correct, as units can change during frame."""
-        if self.units.empty:
+        if (geometry := self.geometry) is None:
+            return None
+        return geometry.centroid
+
+    def get_position_covariance(self) -> Optional[ndarray]:
+        if (geometry := self.geometry) is None:
             return None
-        return self.units.center
-
-    # def get_position_covariance(self) -> Optional[numpy.ndarray]:
-    #     if self.units.empty:
-    #         return None
-    #     center = self.units.center
-    #     deltas = [unit.position - center for unit in self.units]
-    #     dx = sum(d[0] for d in deltas)
-    #     dy = sum(d[1] for d in deltas)
-    #     return numpy.asarray([[dx*dx, dx*dy], [dy*dx, dy*dy]])
+        return geometry.covariance
+
+    def get_far_units(self, distance: float) -> Units:
+        """Units further than distance from the squad center."""
+        if (geometry := self.geometry) is None:
+            return self.units
+        delta = geometry.positions - numpy.asarray(geometry.medoid.position_tuple)
+        far = numpy.einsum('ij,ij->i', delta, delta) > distance * distance
+        return Units([unit for unit, is_far in zip(self.units, far) if is_far], api)
@@ -1,14 +1,21 @@
 import random
+from collections import defaultdict
 from collections.abc import Iterator, Callable
 from time import perf_counter
 from typing import Optional
 
+import numpy
+from numpy import ndarray
 from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
 
 from avocados import api
+from avocados.bot.intelmanager import IntelManager
+from avocados.combat.clustering import get_proximity_clusters, get_spacing_matrix
+from avocados.combat.retreat import RetreatPlanner
 from avocados.combat.util import get_strength
+from avocados.core.constants import RESOURCE_COLLECTOR_TYPE_IDS
 from avocados.core.manager import BotManager
 from avocados.geometry import Circle
 from avocados.geometry.util import squared_distance
@@ -25,69 +32,135 @@ RETREAT_HEALTH_PERCENTAGE = 0.40
 RETREAT_SAFETY_DISTANCE = 10.0
 RETREAT_TIMEOUT = 15.0
 SQUAD_JOIN_DISTANCE = 2.0
+FAR_UNIT_DISTANCE = 14.0
+# Far units connected to the squad center by a chain of clustered units are kept up to this distance
+MAX_UNIT_DISTANCE = 28.0
+CLUSTER_RADIUS = 3.0
 
 
 class SquadManager(BotManager):
     map: MapManager
+    retreat_planner: RetreatPlanner
+
+    validate: bool
 
     _squads: dict[int, Squad]
     _tag_to_squad: dict[int, int]
-
-    def __init__(self, *, map_manager: MapManager) -> None:
+    # Per step proximity data
+    _cluster_labels: Optional[ndarray]
+    _cluster_step: int
+    _spacings: Optional[ndarray]
+    _spacing_step: int
+    _spacing_index: dict[int, int]
+
+    def __init__(self, *, map_manager: MapManager, intel_manager: IntelManager, validate: bool = False) -> None:
         super().__init__()
         self.map = map_manager
+        self.retreat_planner = RetreatPlanner(map_manager=map_manager, intel_manager=intel_manager)
+        self.validate = validate
 
         self._squads = {}
         self._tag_to_squad = {}
+        self._cluster_labels = None
+        self._cluster_step = -1
+        self._spacings = None
+        self._spacing_step = -1
+        self._spacing_index = {}
 
     async def on_step_start(self, step: int) -> None:
-        # Remove dead tags
-        self._tag_to_squad = {tag: squad_id for tag, squad_id in self._tag_to_squad.items()
-                              if tag in api.alive_tags}
+        # Dead units, which were not visible in the previous step, do not trigger on_unit_destroyed
+        for tag in api.state.dead_units:
+            self._remove_dead_tag(tag)
 
         for squad in list(self._squads.values()):
-            squad._tags &= api.alive_tags
             if len(squad) == 0:
                 self.delete(squad)
 
+    async def on_unit_destroyed(self, unit_tag: int) -> None:
+        self._remove_dead_tag(unit_tag)
+
     async def on_step(self, step: int) -> None:
         t0 = perf_counter()
         # Join squads
 
         self._join_squads()
 
+        damage_per_squad: dict[int, float] = defaultdict(float)
+        for tag, damage in api.damage_received.items():
+            if (squad_id := self._tag_to_squad.get(tag)) is not None:
+                damage_per_squad[squad_id] += damage
         for squad in self:
-            damage = sum(api.damage_received[unit.tag] for unit in squad.units)
-            squad.damage_taken.appendleft(damage)
+            squad.damage_taken.push(damage_per_squad.get(squad.id, 0.0), api.step)
 
         self._start_retreat()
         self._stop_retreat()
 
-        # Remove far units
+        # Remove far units, unless still connected to the squad center
         for squad in list(self._squads.values()):
-            far_units = squad.units.further_than(14.0, squad.center)
-            self.remove_units(squad, far_units)
-
-        if step % 1000 == 0:
-            self.status_dump()
+            if far_units := squad.get_far_units(FAR_UNIT_DISTANCE):
+                center_cluster = self.get_cluster_labels(Units([squad.center_unit], api))[0]
+                # Label -1 marks units without cluster, which are not connected to anything
+                if center_cluster >= 0:
+                    too_far = {unit.tag for unit in squad.get_far_units(MAX_UNIT_DISTANCE)}
+                    far_units = Units([unit for unit, cluster in zip(far_units, self.get_cluster_labels(far_units))
+                                       if cluster != center_cluster or unit.tag in too_far], api)
+                self.remove_units(squad, far_units)
+
+        if self.validate:
+            self.check_invariants()
 
         self.timings['step'].add(t0)
 
-    def status_dump(self):
-        self.logger.debug("{} Status Dump:", self)
-        known_unit_ids = set()
+    def get_cluster_labels(self, units: Optional[Units] = None) -> ndarray:
+        """Proximity cluster labels of army units, computed once per step; -1 for non-army units.
+
+        Without units, the labels of all rows of api.ext.unit_snapshot are returned.
+        """
+        snapshot = api.ext.unit_snapshot
+        if self._cluster_labels is None or self._cluster_step != api.step:
+            army = ~numpy.isin(snapshot.type_ids, [utype.value for utype in RESOURCE_COLLECTOR_TYPE_IDS])
+            self._cluster_labels = numpy.full(len(snapshot), -1)
+            self._cluster_labels[army] = get_proximity_clusters(snapshot.positions[army], CLUSTER_RADIUS)
+            self._cluster_step = api.step
+        if units is None:
+            return self._cluster_labels
+        return numpy.fromiter((self._cluster_labels[index] if (index := snapshot.index(unit.tag)) is not None
+                               else -1 for unit in units), dtype=int, count=len(units))
+
+    def get_spacing(self, squad: Squad, other: Squad) -> float:
+        """Squad spacing from a matrix computed once per step or after membership changes."""
+        if self._spacings is None or self._spacing_step != api.step:
+            squads = [s for s in self if len(s) > 0]
+            self._spacing_index = {s.id: index for index, s in enumerate(squads)}
+            centers = numpy.array([s.center_unit.position_tuple for s in squads]).reshape(-1, 2)
+            self._spacings = get_spacing_matrix(centers, numpy.array([s.radius for s in squads]))
+            self._spacing_step = api.step
+        index1 = self._spacing_index.get(squad.id)
+        index2 = self._spacing_index.get(other.id)
+        if index1 is None or index2 is None:
+            return squad.spacing_to_squad(other)
+        return float(self._spacings[index1, index2])
+
+    def check_invariants(self) -> bool:
+        """Verify the membership index against the squads. Intended for debugging only."""
+        valid = True
+        assigned_tags: set[int] = set()
         for squad in self:
-            self.logger.debug("{}", squad)
-            already_known = squad._tags & known_unit_ids
-            if already_known:
-                api.log.error("Units in more than one squad")
-            already_known.update(squad._tags)
-            for unit in squad.units:
-                s = self._tag_to_squad.get(unit.tag, None)
-                if s is None:
-                    api.log.error("tag_to_squad is missing tag")
-                if s != squad.id:
-                    api.log.error("tag_to_squad pointing to wrong squad id")
+            if duplicate_tags := squad._tags & assigned_tags:
+                api.log.error("Tags {} are in more than one squad", duplicate_tags)
+                valid = False
+            assigned_tags.update(squad._tags)
+            for tag in squad._tags:
+                if self._tag_to_squad.get(tag) != squad.id:
+                    api.log.error("Tag {} of {} is not indexed correctly", tag, squad)
+                    valid = False
+        if stale_tags := self._tag_to_squad.keys() - assigned_tags:
+            api.log.error("Index contains tags {} which are not in any squad", stale_tags)
+            valid = False
+        if dead_tags := assigned_tags & api.dead_tags:
+            api.log.error("Squads contain dead tags {}", dead_tags)
+            valid = False
+        return valid
 
     def __len__(self) -> int:
         return len(self._squads)
@@ -113,13 +186,11 @@ class SquadManager(BotManager):
         return squads
 
     def _filter_tags(self, tags: set[int]) -> set[int]:
-        tags_filtered = tags.copy()
-        # TODO: use _tags_to_squad
-        for squad in self:
-            if common_tags := tags & squad._tags:
-                api.log.warning("Tags {} are already assigned to {}", common_tags, squad)
-                tags_filtered -= common_tags
-        return tags_filtered
+        if common_tags := {tag for tag in tags if tag in self._tag_to_squad}:
+            api.log.warning("Tags {} are already assigned to squads {}", common_tags,
+                            {self._tag_to_squad[tag] for tag in common_tags})
+            return tags - common_tags
+        return tags
 
     def create(self, units: Units | set[int], *,
                target_strength: Optional[float] = None,
@@ -146,7 +217,7 @@ class SquadManager(BotManager):
         if squad is None:
             api.log.warning("Squad {} not found", id_)
         else:
-            self.remove_units(squad, squad._tags)
+            self.remove_units(squad, squad._tags.copy())
             self.logger.debug("Deleted squad {}", squad)
 
     def add_units(self, squad: Squad, units: Unit | Units | int | set[int], *,
@@ -157,7 +228,8 @@ class SquadManager(BotManager):
         tags = self._filter_tags(tags)
         for tag in tags:
             self._tag_to_squad[tag] = squad.id
-        squad._tags.update(tags)
+        squad._add_tags(tags)
+        self._spacings = None
 
     def transfer_units(self, source: Squad, target: Squad, *, units: Optional[Units] = None) -> None:
         if units is None:
@@ -172,7 +244,8 @@ class SquadManager(BotManager):
                 self._tag_to_squad.pop(tag)
             else:
                 api.log.warning("Tag {} was not assigned to {}", tag, squad)
-        squad._tags.difference_update(tags)
+        squad._remove_tags(tags)
+        self._spacings = None
 
     def has_squad(self, unit: Unit | int) -> bool:
         tag = unit.tag if isinstance(unit, Unit) else unit
@@ -235,13 +308,17 @@ class SquadManager(BotManager):
 
     # --- Private
 
+    def _remove_dead_tag(self, tag: int) -> None:
+        if (squad_id := self._tag_to_squad.pop(tag, None)) is not None:
+            self._squads[squad_id]._remove_tags({tag})
+
     def _join_squads(self) -> None:
         for squad in self.with_task(task_type=SquadJoinTask):
             target_squad = squad.task.target
             if len(target_squad) == 0:
                 squad.remove_task()
                 continue
-            if squad.spacing_to_squad(target_squad) <= SQUAD_JOIN_DISTANCE:
+            if self.get_spacing(squad, target_squad) <= SQUAD_JOIN_DISTANCE:
                 self.join(target_squad, squad)
 
     def _start_retreat(self) -> None:
@@ -250,10 +327,12 @@ class SquadManager(BotManager):
             if ((squad.damage_taken_percentage > RETREAT_HEALTH_PERCENTAGE
                  or squad.strength < get_strength(api.all_enemy_units.closer_than(8, squad.center)))
                     and squad.center.distance_to(self.map.base.center) > RETREAT_MIN_BASE_DISTANCE):
-                retreat_point = self.map.nearest_pathable(squad.center.towards(self.map.center, RETREAT_DISTANCE))
-                retreat_area = Circle(retreat_point, 1.5)
-                self.logger.debug("Ordering {} to retreat to {}", squad, retreat_area)
-                squad.retreat(retreat_area, priority=1)  # , priority=min(squad.task_priority+0.1, ))
+                destination = self.map.nearest_pathable(squad.center.towards(self.map.center, RETREAT_DISTANCE))
+                plan = self.retreat_planner.plan(squad, destination or self.map.center)
+                retreat_area = Circle(plan.rally, 1.5)
+                self.logger.debug("Ordering {} to retreat to {} via {} waypoints", squad, retreat_area,
+                                  len(plan.waypoints))
+                squad.retreat(retreat_area, priority=1, waypoints=plan.waypoints)  # , priority=min(squad.task_priority+0.1, ))
 
     def _stop_retreat(self) -> None:
         for squad in self.with_task(task_type=SquadRetreatTask):
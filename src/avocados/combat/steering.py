@@ -0,0 +1,74 @@
+from dataclasses import dataclass
+
+import numpy
+from numpy import ndarray
+from sc2.ids.ability_id import AbilityId
+from sc2.position import Point2
+from sc2.unit import Unit
+
+from avocados.geometry.field import Field
+
+
+MOVE_TOLERANCE = 1.5
+
+
+@dataclass(frozen=True)
+class SteeringWeights:
+    separation: float = 1.5
+    cohesion: float = 0.5
+    target: float = 1.0
+    threat: float = 2.0
+    separation_distance: float = 1.0  # Added to the unit radii
+    look_ahead: float = 3.0
+
+
+def get_threat_gradient(threat: Field, positions: ndarray) -> ndarray:
+    """Central difference gradient of the threat field at positions, shape (n, 2)."""
+    indices = numpy.floor(positions - numpy.asarray(threat.offset)).astype(int)
+    x = numpy.clip(indices[:, 0], 1, threat.width - 2)
+    y = numpy.clip(indices[:, 1], 1, threat.height - 2)
+    data = threat.data
+    return 0.5 * numpy.column_stack((data[x + 1, y] - data[x - 1, y], data[x, y + 1] - data[x, y - 1]))
+
+
+def get_steering_targets(positions: ndarray, radii: ndarray, center: ndarray, target: ndarray, *,
+                         leash_range: float,
+                         threat: Field | None = None,
+                         weights: SteeringWeights = SteeringWeights()) -> ndarray:
+    """Move target per unit from separation, cohesion towards center, attraction to target and threat repulsion.
+
+    Cohesion only acts beyond leash_range from the center and grows linearly with the excess distance.
+    """
+    # Separation: linear falloff over the desired gap between each pair
+    delta = positions[:, None, :] - positions[None, :, :]
+    distance = numpy.sqrt(numpy.einsum('ijk,ijk->ij', delta, delta))
+    numpy.fill_diagonal(distance, numpy.inf)
+    gap = radii[:, None] + radii[None, :] + weights.separation_distance
+    push = numpy.clip(gap - distance, 0, None) / numpy.maximum(distance * gap, 1e-6)
+    separation = numpy.einsum('ij,ijk->ik', push, delta)
+
+    to_center = center - positions
+    center_distance = numpy.linalg.norm(to_center, axis=1, keepdims=True)
+    cohesion = to_center * numpy.clip(center_distance - leash_range, 0, None) / numpy.maximum(center_distance, 1e-6)
+
+    to_target = target - positions
+    attraction = to_target / numpy.maximum(numpy.linalg.norm(to_target, axis=1, keepdims=True), 1e-6)
+
+    force = weights.separation * separation + weights.cohesion * cohesion + weights.target * attraction
+    if threat is not None:
+        force -= weights.threat * get_threat_gradient(threat, positions)
+    norm = numpy.linalg.norm(force, axis=1, keepdims=True)
+    return positions + weights.look_ahead * force / numpy.maximum(norm, 1e-6)
+
+
+def stabilize_move_target(unit: Unit, target: Point2, *, tolerance: float = MOVE_TOLERANCE,
+                          attack: bool = False) -> Point2:
+    """Keep the current move (or attack-move) target of the unit if the new one is within tolerance, to avoid
+    reissuing orders.
+    """
+    abilities = (AbilityId.ATTACK, AbilityId.ATTACK_ATTACK) if attack else (AbilityId.MOVE_MOVE,)
+    if unit.orders and unit.orders[0].ability.exact_id in abilities:
+        current = unit.orders[0].target
+        if isinstance(current, Point2) and current.distance_to(target) <= tolerance:
+            return current
+    return target
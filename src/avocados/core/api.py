@@ -146,6 +146,7 @@ class Api(BotAI):
         self.alive_tags.difference_update(self.dead_tags)
 
         await self.order.on_step_start(step)
+        await self.ext.on_step_start(step)
 
         for callback in self._on_step_callbacks:
             await callback(step)
@@ -1,8 +1,9 @@
-import math
-from collections.abc import Callable, Iterable
+from collections.abc import Callable, Iterable, Sequence
 from enum import Enum
 from typing import Optional, TYPE_CHECKING
 
+import numpy
+from numpy import ndarray
 from sc2.constants import (PROTOSS_TECH_REQUIREMENT, TERRAN_TECH_REQUIREMENT, ZERG_TECH_REQUIREMENT,
                            EQUIVALENTS_FOR_TECH_PROGRESS, CREATION_ABILITY_FIX, abilityid_to_unittypeid)
 from sc2.data import Race
@@ -16,9 +17,11 @@ from sc2.units import Units
 
 from avocados.core.constants import (TRAINERS, TERRANBUILD_TO_STRUCTURE, MINOR_STRUCTURES, UNIT_CREATION_ABILITIES,
                                      UPGRADE_ABILITIES)
+from avocados.core.kinematics import Kinematics
 from avocados.core.ordermanager import OrderManager
+from avocados.core.snapshot import UnitSnapshot
 from avocados.core.unitutil import UnitCost
-from avocados.geometry.util import dot
+from avocados.geometry.intercept import get_intercept_points
 
 if TYPE_CHECKING:
     from avocados.core.api import Api
@@ -29,11 +32,17 @@ class ApiExtensions:
     worker_utype: UnitTypeId
     townhall_utype: UnitTypeId
     supply_utype: UnitTypeId
+    _unit_snapshot: Optional[UnitSnapshot]
+    _enemy_snapshot: Optional[UnitSnapshot]
+    kinematics: Kinematics
 
     def __init__(self, api: 'Api') -> None:
         super().__init__()
         self.api = api
         self.order = OrderManager()
+        self._unit_snapshot = None
+        self._enemy_snapshot = None
+        self.kinematics = Kinematics()
 
     async def on_start(self) -> None:
 
@@ -64,8 +73,25 @@ class ApiExtensions:
             Race.Protoss: (UnitTypeId.PROBE, UnitTypeId.NEXUS, UnitTypeId.PYLON),
         }[self.api.race]
 
+    async def on_step_start(self, step: int) -> None:
+        self.kinematics.update(UnitSnapshot(self.api.units + self.api.all_enemy_units, step=self.api.state.game_loop))
+
     # ---
 
+    @property
+    def unit_snapshot(self) -> UnitSnapshot:
+        """Snapshot of own units (without structures), taken once per step."""
+        if self._unit_snapshot is None or self._unit_snapshot.step != self.api.state.game_loop:
+            self._unit_snapshot = UnitSnapshot(self.api.units, step=self.api.state.game_loop)
+        return self._unit_snapshot
+
+    @property
+    def enemy_snapshot(self) -> UnitSnapshot:
+        """Snapshot of all enemy units, taken once per step."""
+        if self._enemy_snapshot is None or self._enemy_snapshot.step != self.api.state.game_loop:
+            self._enemy_snapshot = UnitSnapshot(self.api.all_enemy_units, step=self.api.state.game_loop)
+        return self._enemy_snapshot
+
     @property
     def enemy_major_structures(self) -> Units:
         return self.api.enemy_structures.exclude_type(MINOR_STRUCTURES)
@@ -113,15 +139,8 @@ class ApiExtensions:
         return mineral_rate, vespene_rate
 
     def get_unit_velocity_vector(self, unit: Unit | int) -> Optional[Point2]:
-        tag = unit.tag if isinstance(unit, Unit) else unit
-        unit_prev = self.api._all_units_previous_map.get(tag)
-        if unit_prev is None:
-            return None
-        unit_now = unit if isinstance(unit, Unit) else self.api.all_units.find_by_tag(tag)
-        if unit_now is None:
-            return None
-        delta = unit_now.position - unit_prev.position
-        return delta / 22.4
+        """Velocity in distance per game second, from the kinematics table."""
+        return self.kinematics.get_velocity(unit.tag if isinstance(unit, Unit) else unit)
 
     def get_creation_ability(self, utype: UnitTypeId) -> AbilityId:
         return UNIT_CREATION_ABILITIES[utype]
@@ -218,36 +237,20 @@ class ApiExtensions:
 
     def intercept_unit(self, unit: Unit, target: Unit, *,
                        max_intercept_distance: float = 10.0) -> Point2:
-        """TODO: friendly units"""
-        d = target.position - unit.position
-        dsq = dot(d, d)
-        # if dsq > 200:
-        #     # Far away, don't try to intercept
-        #     return target.position
-
-        v = self.get_unit_velocity_vector(target)
-        if v is None:
-            #self.logger.debug("No target velocity")
-            return target.position
-        s = 1.4 * unit.real_speed
-        vsq = dot(v, v)
-        ssq = s * s
-        denominator = vsq - ssq
-        if abs(denominator) < 1e-8:
-            #self.logger.debug("Linear case")
-            # TODO: linear case
-            return target.position
-
-        dv = dot(d, v)
-        disc = dv*dv - denominator * dsq
-        if disc < 0:
-            #self.logger.debug("No real solution")
-            # no real solution
-            return target.position
-        sqrt = math.sqrt(disc)
-        tau1 = (-dv + sqrt) / denominator
-        tau2 = (-dv - sqrt) / denominator
-        tau = min(tau1, tau2)
-        intercept = target.position + tau * v
-        #self.logger.debug("{} intercepting {} at {}", unit.position, target.position, intercept)
-        return intercept
+        return Point2(self.intercept_units([unit], target,
+                                           max_intercept_distance=max_intercept_distance)[0].tolist())
+
+    def intercept_units(self, units: Sequence[Unit], targets: Sequence[Unit] | Unit, *,
+                        max_intercept_distance: float = 10.0) -> ndarray:
+        """Intercept points of units against their targets (one per unit, or a single target for all), shape (n, 2).
+
+        Target velocities are taken from the kinematics table; targets not in it are treated as stationary.
+        """
+        if isinstance(targets, Unit):
+            targets = [targets] * len(units)
+        target_positions = numpy.array([target.position_tuple for target in targets], dtype=float).reshape(-1, 2)
+        target_velocities = self.kinematics.get_velocities(target.tag for target in targets)
+        positions = numpy.array([unit.position_tuple for unit in units], dtype=float).reshape(-1, 2)
+        speeds = numpy.fromiter((1.4 * unit.real_speed for unit in units), dtype=float, count=len(units))
+        return get_intercept_points(positions, speeds, target_positions, target_velocities,
+                                    max_intercept_distance=max_intercept_distance)
@@ -0,0 +1,134 @@
+from collections import deque
+from collections.abc import Iterable
+from typing import Optional
+
+import numpy
+from numpy import ndarray
+from sc2.position import Point2
+
+from avocados.core.snapshot import UnitSnapshot
+
+
+KINEMATICS_HISTORY: int = 8
+GAME_LOOPS_PER_SECOND: float = 22.4
+
+
+class Kinematics:
+    """Motion estimates for all units of the latest snapshot, from the last snapshots.
+
+    Each snapshot is linked to its predecessor by tag once, when it is added; a unit's track ends where it is
+    missing from a snapshot. All rates are per game second. Rows correspond to the rows of the latest snapshot.
+    """
+    history: deque[tuple[UnitSnapshot, ndarray]]
+    velocities: ndarray
+    accelerations: ndarray
+    speeds: ndarray
+    smoothed_speeds: ndarray
+    headings: ndarray
+    track_lengths: ndarray
+
+    def __init__(self, *, history: int = KINEMATICS_HISTORY) -> None:
+        super().__init__()
+        self.history = deque(maxlen=history)
+        self._set_empty()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={len(self)}, history={len(self.history)})"
+
+    def __len__(self) -> int:
+        return len(self.velocities)
+
+    @property
+    def snapshot(self) -> Optional[UnitSnapshot]:
+        return self.history[-1][0] if self.history else None
+
+    @property
+    def positions(self) -> ndarray:
+        return self.snapshot.positions if self.history else numpy.zeros((0, 2))
+
+    def update(self, snapshot: UnitSnapshot) -> None:
+        if self.history and self.history[-1][0].step == snapshot.step:
+            return
+        links = (snapshot.get_matching_indices(self.history[-1][0]) if self.history
+                 else numpy.full(len(snapshot), -1))
+        self.history.append((snapshot, links))
+        self._estimate()
+
+    def index(self, tag: int) -> Optional[int]:
+        return self.snapshot.index(tag) if self.history else None
+
+    def get_velocity(self, tag: int) -> Optional[Point2]:
+        if (index := self.index(tag)) is None:
+            return None
+        return Point2(self.velocities[index].tolist())
+
+    def get_velocities(self, tags: Iterable[int]) -> ndarray:
+        """Velocities of the units with tags, shape (n, 2); zero for units not in the latest snapshot."""
+        rows = numpy.fromiter((-1 if (index := self.index(tag)) is None else index for tag in tags), dtype=int)
+        velocities = numpy.zeros((len(rows), 2))
+        found = rows >= 0
+        velocities[found] = self.velocities[rows[found]]
+        return velocities
+
+    def extrapolate(self, horizon: float, rows: Optional[ndarray] = None) -> ndarray:
+        """Positions after horizon game seconds at constant velocity, shape (n, 2)."""
+        if rows is None:
+            return self.positions + horizon * self.velocities
+        return self.positions[rows] + horizon * self.velocities[rows]
+
+    # --- Private
+
+    def _set_empty(self) -> None:
+        self.velocities = numpy.zeros((0, 2))
+        self.accelerations = numpy.zeros((0, 2))
+        self.speeds = numpy.zeros(0)
+        self.smoothed_speeds = numpy.zeros(0)
+        self.headings = numpy.zeros(0)
+        self.track_lengths = numpy.zeros(0, dtype=int)
+
+    def _get_tracks(self) -> tuple[ndarray, ndarray]:
+        """Positions of the current units in each snapshot, newest first, shape (history, n, 2), NaN where
+        untracked; and the snapshot times in game seconds.
+        """
+        current = self.history[-1][0]
+        tracks = numpy.full((len(self.history), len(current), 2), numpy.nan)
+        times = numpy.empty(len(self.history))
+        rows = numpy.arange(len(current))
+        for age, (snapshot, links) in enumerate(reversed(self.history)):
+            found = rows >= 0
+            tracks[age, found] = snapshot.positions[rows[found]]
+            times[age] = snapshot.step / GAME_LOOPS_PER_SECOND
+            rows = numpy.where(found, links[numpy.maximum(rows, 0)], -1) if len(links) else rows
+        return tracks, times
+
+    def _estimate(self) -> None:
+        if len(self.history[-1][0]) == 0:
+            self._set_empty()
+            return
+        tracks, times = self._get_tracks()
+        # Finite differences between consecutive snapshots, newest first
+        differences = (tracks[:-1] - tracks[1:]) / (times[:-1] - times[1:])[:, None, None]
+        valid = ~numpy.isnan(differences[..., 0])
+        self.track_lengths = 1 + numpy.cumprod(valid, axis=0).sum(axis=0)
+
+        if len(differences) > 0:
+            self.velocities = numpy.where(valid[0, :, None], differences[0], 0.0)
+        else:
+            self.velocities = numpy.zeros_like(tracks[0])
+        self.speeds = numpy.linalg.norm(self.velocities, axis=1)
+
+        if len(differences) > 1:
+            dt = (times[0] - times[2]) / 2
+            both = valid[0] & valid[1]
+            self.accelerations = numpy.where(both[:, None], (differences[0] - differences[1]) / dt, 0.0)
+        else:
+            self.accelerations = numpy.zeros_like(self.velocities)
+
+        # Averages over the tracked part of the window
+        count = numpy.maximum(valid.sum(axis=0), 1)
+        zeroed = numpy.where(valid[..., None], differences, 0.0)
+        self.smoothed_speeds = numpy.linalg.norm(zeroed, axis=2).sum(axis=0) / count
+        mean_velocity = zeroed.sum(axis=0) / count[:, None]
+        moving = numpy.any(mean_velocity != 0, axis=1)
+        # Undefined for units that did not move
+        self.headings = numpy.where(moving, numpy.arctan2(mean_velocity[:, 1], mean_velocity[:, 0]), numpy.nan)
@@ -0,0 +1,66 @@
+from collections.abc import Sequence
+from typing import Optional
+
+import numpy
+from numpy import ndarray
+from sc2.position import Point2
+from sc2.unit import Unit
+from sc2.units import Units
+
+
+class UnitSnapshot:
+    """Array view of a Units collection, taken once per step.
+
+    Rows of tags, positions, radii and type IDs correspond to the units in the order of the collection.
+    """
+    units: Units
+    step: int
+    tags: ndarray
+    positions: ndarray
+    radii: ndarray
+    type_ids: ndarray
+    _tag_to_index: Optional[dict[int, int]]
+
+    def __init__(self, units: Units, *, step: int) -> None:
+        super().__init__()
+        self.units = units
+        self.step = step
+        self.tags = numpy.fromiter((unit.tag for unit in units), dtype=numpy.uint64, count=len(units))
+        self.positions = numpy.array([unit.position_tuple for unit in units], dtype=float).reshape(-1, 2)
+        self.radii = numpy.fromiter((unit.radius for unit in units), dtype=float, count=len(units))
+        self.type_ids = numpy.fromiter((unit.type_id.value for unit in units), dtype=int, count=len(units))
+        self._tag_to_index = None
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(size={len(self)}, step={self.step})"
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+    def __getitem__(self, index: int) -> Unit:
+        return self.units[index]
+
+    def index(self, tag: int) -> Optional[int]:
+        if self._tag_to_index is None:
+            self._tag_to_index = {unit.tag: index for index, unit in enumerate(self.units)}
+        return self._tag_to_index.get(tag)
+
+    def take(self, indices: Sequence[int] | ndarray) -> Units:
+        return Units([self.units[index] for index in indices], self.units._bot_object)
+
+    def get_matching_indices(self, other: 'UnitSnapshot') -> ndarray:
+        """Row in other of each unit of this snapshot, by tag; -1 for units not in other."""
+        if len(other) == 0:
+            return numpy.full(len(self), -1)
+        order = numpy.argsort(other.tags)
+        sorted_tags = other.tags[order]
+        indices = numpy.minimum(numpy.searchsorted(sorted_tags, self.tags), len(sorted_tags) - 1)
+        return numpy.where(sorted_tags[indices] == self.tags, order[indices], -1)
+
+    def within(self, center: Point2 | tuple[float, float] | ndarray, radius: float) -> ndarray:
+        """Row indices of units whose center is within radius of center."""
+        delta = self.positions - numpy.asarray(center, dtype=float)
+        return numpy.flatnonzero(numpy.einsum('ij,ij->i', delta, delta) <= radius * radius)
+
+    def any_within(self, center: Point2 | tuple[float, float] | ndarray, radius: float) -> bool:
+        return len(self.within(center, radius)) > 0
@@ -18,6 +18,58 @@ class AbstractTimeSeries(ABC):
         pass
 
 
+class WindowedSum:
+    """Running sum over the last window values pushed, with O(1) push and query."""
+    _values: ndarray
+    _steps: ndarray
+    _index: int
+    _count: int
+    _sum: float
+
+    def __init__(self, window: int) -> None:
+        super().__init__()
+        self._values = numpy.zeros(window)
+        self._steps = numpy.zeros(window, dtype=int)
+        self._index = 0
+        self._count = 0
+        self._sum = 0.0
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(sum={self.sum}, size={len(self)}, window={self.window})"
+
+    def __len__(self) -> int:
+        return self._count
+
+    @property
+    def window(self) -> int:
+        return len(self._values)
+
+    @property
+    def sum(self) -> float:
+        return self._sum
+
+    def push(self, value: float, step: int) -> None:
+        self._sum += value - self._values[self._index]
+        self._values[self._index] = value
+        self._steps[self._index] = step
+        self._index = (self._index + 1) % self.window
+        self._count = min(self._count + 1, self.window)
+        if self._index == 0:
+            # Remove accumulated rounding errors once per cycle
+            self._sum = float(self._values.sum())
+
+    def rate(self) -> float:
+        """Sum per second, with the window duration estimated from the steps of the first and last value."""
+        if self._count < 2:
+            return 0.0
+        first = self._steps[(self._index - self._count) % self.window]
+        last = self._steps[(self._index - 1) % self.window]
+        duration = (last - first) * self._count / (self._count - 1) / 22.4
+        if duration <= 0:
+            return 0.0
+        return self._sum / duration
+
+
 class Timeseries[T](AbstractTimeSeries):
     _values: ndarray
     _max_size: Optional[int]
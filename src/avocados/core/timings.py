@@ -9,6 +9,7 @@ class Timings:
     total_time: float
     steps: int
     calls: int
+    skips: int
     _previous_step: int
     _time_step: float
 
@@ -17,14 +18,16 @@ class Timings:
         self.reset()
 
     def __repr__(self) -> str:
+        skips = f", skips={self.skips}" if self.skips else ""
         return (f"{type(self).__name__}(avg={self.average * 1000:.3f}ms, max={self.max * 1000:.3f}ms,"
-                f" calls={self.calls})")
+                f" calls={self.calls}{skips})")
 
     def reset(self) -> None:
         self.max_time = 0
         self.total_time = 0
         self.steps = 0
         self.calls = 0
+        self.skips = 0
         self._previous_step = -1
         self._time_step = 0
 
@@ -52,3 +55,7 @@ class Timings:
         self.max_time = max(self._time_step, self.max_time)
         self.total_time += time
         self.calls += 1
+
+    def skip(self) -> None:
+        """Count a call which was skipped, e.g., by a reduced update rate."""
+        self.skips += 1
@@ -9,7 +9,7 @@ from sc2.position import Point2
 from sc2.unit import Unit
 from sc2.units import Units
 
-from avocados.geometry.util import squared_distance
+from avocados.geometry.distance import get_positions, get_min_sq_distance
 
 
 def normalize_tags(unit: Unit | int | Units | set[int]) -> set[int]:
@@ -22,19 +22,11 @@ def normalize_tags(unit: Unit | int | Units | set[int]) -> set[int]:
     return unit
 
 
-def get_closest_sq_distance(points1: Units, points2: Units | Unit | Point2) -> float:
-    closest = float('inf')
-    if isinstance(points2, Units):
-        for p1 in points1:
-            for p2 in points2:
-                closest = min(closest, squared_distance(p1, p2))
-    else:
-        for p1 in points1:
-            closest = min(closest, squared_distance(p1, points2))
-    return closest
+def get_closest_sq_distance(points1: Units | Unit, points2: Units | Unit | Point2) -> float:
+    return get_min_sq_distance(get_positions(points1), get_positions(points2))
 
 
-def get_closest_distance(points1: Units, points2: Units | Unit | Point2) -> float:
+def get_closest_distance(points1: Units | Unit, points2: Units | Unit | Point2) -> float:
     return math.sqrt(get_closest_sq_distance(points1, points2))
 
 
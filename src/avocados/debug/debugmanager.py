@@ -511,7 +511,8 @@ class DebugManager(BotManager):
             else:
                 task_code = 'NON'
             self.text(f"{squad.id}  {len(squad)}  {squad.status}  {squad.strength:.1f}  {task_code}"
-                            f"  {squad.damage_taken_percentage:.1%}", squad.center, color=color)
+                            f"  {squad.damage_taken_percentage:.1%}  {squad.damage_per_second:.0f}/s", squad.center,
+                      color=color)
             for unit in squad.units:
                 #self.text_world(f"{squad.id}", unit, color=color)
                 self.line(unit, squad.center, color=color)
@@ -574,14 +575,13 @@ class DebugManager(BotManager):
         (x0, y0), (x1, y1) = view_area
         color0 = normalize_color(colormap[0])
         color1 = normalize_color(colormap[1])
-        for x in range(int(x0), int(x1)):
-            for y in range(int(y0), int(y1)):
-                point = Point2((x + 0.5, y + 0.5))
-                if point not in field:
-                    continue
-                value = field[point]
-                color = mix_colors(color0, color1, value/(field.max() or 1))
-                self.draw_tile(point, color=color, text=f"{value:{text_format}}" if with_text else None)
+        points = Rectangle(int(x0), int(y0), int(x1) - int(x0), int(y1) - int(y0)).get_grid_points().reshape(-1, 2)
+        points = points[field.contains(points)]
+        values = field.gather(points)
+        scale = field.max() or 1
+        for point, value in zip(points.tolist(), values.tolist()):
+            color = mix_colors(color0, color1, value / scale)
+            self.draw_tile(Point2(point), color=color, text=f"{value:{text_format}}" if with_text else None)
 
     def _draw_region(self, region: Region, *, color: ColorType = Color.YELLOW) -> None:
         for point in region:
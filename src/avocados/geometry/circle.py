@@ -75,20 +75,13 @@ class Circle:
         ymin = int(math.floor(self.center.y - self.radius - 0.5))
         ymax = int(math.ceil(self.center.y + self.radius - 0.5))
 
-        # Make a grid of (x, y)
-        xs, ys = numpy.meshgrid(numpy.arange(xmin, xmax + 1), numpy.arange(ymin, ymax + 1))
+        # Cell centers, shifted by 0.5
+        x = (numpy.arange(xmin, xmax + 1) + 0.5)[:, None]
+        y = (numpy.arange(ymin, ymax + 1) + 0.5)[None, :]
 
-        # Shift by 0.5 to get center of each cell
-        x = xs + 0.5
-        y = ys + 0.5
-
-        # Mask points inside circle
+        # Mask cells inside circle
         mask = (x - self.center.x) ** 2 + (y - self.center.y) ** 2 <= self.radius * self.radius
-
-        # Extract coordinates
-        array = numpy.stack([x[mask], y[mask]], axis=-1)
-        points = {Point2(row) for row in array}
-        return Region(points)
+        return Region.from_mask(mask, (xmin, ymin))
 
 
 def get_circle_intersections(circle1: Circle, circle2: Circle) -> list[Point2]:
@@ -0,0 +1,97 @@
+from collections.abc import Iterable
+
+import numpy
+from numpy import ndarray
+from scipy.spatial.distance import cdist
+from sc2.position import Point2
+from sc2.unit import Unit
+
+
+# Maximum number of entries of a distance matrix computed at once; larger problems are split into row chunks
+MAX_CHUNK_SIZE: int = 2**18
+
+
+def get_positions(points: Unit | Point2 | Iterable[Unit | Point2] | ndarray) -> ndarray:
+    """(N, 2) float array of the positions of units or points; a single unit or point gives N = 1."""
+    if isinstance(points, ndarray):
+        return points.astype(float, copy=False).reshape(-1, 2)
+    if isinstance(points, Unit):
+        return numpy.array([points.position], dtype=float)
+    if isinstance(points, Point2):
+        return numpy.array([points], dtype=float)
+    positions = [point.position if isinstance(point, Unit) else point for point in points]
+    return numpy.array(positions, dtype=float).reshape(-1, 2)
+
+
+def get_sq_distances(positions1: ndarray, positions2: ndarray) -> ndarray:
+    """(N, M) matrix of squared distances between two position arrays."""
+    return cdist(positions1, positions2, 'sqeuclidean')
+
+
+def _row_chunks(positions1: ndarray, positions2: ndarray) -> Iterable[tuple[slice, ndarray]]:
+    rows = max(MAX_CHUNK_SIZE // max(len(positions2), 1), 1)
+    for start in range(0, len(positions1), rows):
+        chunk = slice(start, start + rows)
+        yield chunk, get_sq_distances(positions1[chunk], positions2)
+
+
+def get_closest_indices(positions1: ndarray, positions2: ndarray) -> tuple[ndarray, ndarray]:
+    """Index of the closest position in positions2 for each position in positions1, and its squared distance.
+
+    positions2 must not be empty.
+    """
+    if len(positions2) == 0:
+        raise ValueError('positions2 is empty')
+    indices = numpy.empty(len(positions1), dtype=int)
+    sq_distances = numpy.empty(len(positions1))
+    for chunk, distances in _row_chunks(positions1, positions2):
+        indices[chunk] = numpy.argmin(distances, axis=1)
+        sq_distances[chunk] = numpy.take_along_axis(distances, indices[chunk, None], axis=1)[:, 0]
+    return indices, sq_distances
+
+
+def get_furthest_indices(positions1: ndarray, positions2: ndarray) -> tuple[ndarray, ndarray]:
+    """Index of the furthest position in positions2 for each position in positions1, and its squared distance."""
+    if len(positions2) == 0:
+        raise ValueError('positions2 is empty')
+    indices = numpy.empty(len(positions1), dtype=int)
+    sq_distances = numpy.empty(len(positions1))
+    for chunk, distances in _row_chunks(positions1, positions2):
+        indices[chunk] = numpy.argmax(distances, axis=1)
+        sq_distances[chunk] = numpy.take_along_axis(distances, indices[chunk, None], axis=1)[:, 0]
+    return indices, sq_distances
+
+
+def get_closest_sq_distances(positions1: ndarray, positions2: ndarray) -> ndarray:
+    """Squared distance from each position in positions1 to the closest in positions2; inf if positions2 is empty."""
+    if len(positions2) == 0:
+        return numpy.full(len(positions1), numpy.inf)
+    return get_closest_indices(positions1, positions2)[1]
+
+
+def get_min_sq_distance(positions1: ndarray, positions2: ndarray) -> float:
+    """Smallest squared distance between any pair; inf if either array is empty."""
+    if len(positions1) == 0 or len(positions2) == 0:
+        return float('inf')
+    # Chunk over the larger array
+    if len(positions1) < len(positions2):
+        positions1, positions2 = positions2, positions1
+    return float(get_closest_sq_distances(positions1, positions2).min())
+
+
+def get_k_nearest(positions1: ndarray, positions2: ndarray, k: int) -> tuple[ndarray, ndarray]:
+    """Indices into positions2 of the k nearest positions for each position in positions1, sorted by distance,
+    and their squared distances. Both arrays have shape (N, min(k, M)).
+    """
+    k = min(k, len(positions2))
+    indices = numpy.empty((len(positions1), k), dtype=int)
+    sq_distances = numpy.empty((len(positions1), k))
+    if k == 0:
+        return indices, sq_distances
+    for chunk, distances in _row_chunks(positions1, positions2):
+        nearest = numpy.argpartition(distances, k - 1, axis=1)[:, :k]
+        nearest_distances = numpy.take_along_axis(distances, nearest, axis=1)
+        order = numpy.argsort(nearest_distances, axis=1, kind='stable')
+        indices[chunk] = numpy.take_along_axis(nearest, order, axis=1)
+        sq_distances[chunk] = numpy.take_along_axis(nearest_distances, order, axis=1)
+    return indices, sq_distances
@@ -1,3 +1,5 @@
+import math
+from functools import cache, lru_cache
 from pathlib import Path
 from typing import Optional, Self, Any
 
@@ -6,13 +8,60 @@ from numpy import ndarray
 from sc2.position import Point2
 from scipy.ndimage import gaussian_filter
 
+from avocados.geometry.circle import Circle
 from avocados.geometry.region import Region
 from avocados.geometry.util import Rectangle
 
 
+type AreaWindow = tuple[tuple[slice, slice], ndarray]
+
+
+@cache
+def get_disc_stamp(radius: float) -> ndarray:
+    """Boolean disc of cells whose centers are within radius of the central cell's center."""
+    half = int(math.ceil(radius))
+    offsets = numpy.arange(-half, half + 1)
+    dx, dy = numpy.meshgrid(offsets, offsets, indexing='ij')
+    stamp = (dx * dx + dy * dy) <= radius * radius
+    stamp.flags.writeable = False
+    return stamp
+
+
+@lru_cache(maxsize=1024)
+def get_area_window(area: Circle | Rectangle, offset: Point2, shape: tuple[int, int]) -> AreaWindow:
+    """Slices of the bounding box of area in a field with offset and shape, and the cell mask within it.
+
+    A cell belongs to the area if its center does. Masks are read-only, as they are shared between calls.
+    """
+    if isinstance(area, Circle):
+        x0 = max(int(math.floor(area.x - area.r - offset.x)), 0)
+        x1 = min(int(math.ceil(area.x + area.r - offset.x)) + 1, shape[0])
+        y0 = max(int(math.floor(area.y - area.r - offset.y)), 0)
+        y1 = min(int(math.ceil(area.y + area.r - offset.y)) + 1, shape[1])
+        x1, y1 = max(x0, x1), max(y0, y1)
+        dx = (numpy.arange(x0, x1) + 0.5 + offset.x - area.x)[:, None]
+        dy = (numpy.arange(y0, y1) + 0.5 + offset.y - area.y)[None, :]
+        mask = dx * dx + dy * dy <= area.r * area.r
+    elif isinstance(area, Rectangle):
+        rect = area - offset
+        x0, y0 = min(max(int(rect.x), 0), shape[0]), min(max(int(rect.y), 0), shape[1])
+        x1, y1 = min(max(int(rect.x_end), x0), shape[0]), min(max(int(rect.y_end), y0), shape[1])
+        mask = numpy.ones((x1 - x0, y1 - y0), dtype=bool)
+    else:
+        raise TypeError(f'invalid type: {type(area)}')
+    mask.flags.writeable = False
+    return (slice(x0, x1), slice(y0, y1)), mask
+
+
 class Field[T]:
-    data: ndarray
+    """2D grid of values with a world offset.
+
+    The summed-area table used for O(1) rectangle sums is built lazily. Writes through the Field methods or
+    assignments to data invalidate it; in-place writes to data (e.g. field.data[:] = ...) must call invalidate().
+    """
     offset: Point2
+    _data: ndarray
+    _integral: Optional[ndarray]
 
     def __init__(self, arg: ndarray | tuple[int, int], *, offset: Optional[Point2] = None) -> None:
         if isinstance(arg, tuple):
@@ -20,6 +69,30 @@ class Field[T]:
         self.data = arg
         self.offset = offset or Point2((0, 0))
 
+    @property
+    def data(self) -> ndarray:
+        return self._data
+
+    @data.setter
+    def data(self, value: ndarray) -> None:
+        self._data = value
+        self._integral = None
+
+    def invalidate(self) -> None:
+        """Mark the summed-area table as outdated, after in-place writes to data."""
+        self._integral = None
+
+    @property
+    def integral(self) -> ndarray:
+        """Summed-area table of shape (width + 1, height + 1), where integral[i, j] = data[:i, :j].sum()."""
+        if self._integral is None:
+            dtype = numpy.int64 if self.data.dtype.kind in 'biu' else numpy.float64
+            integral = numpy.zeros((self.width + 1, self.height + 1), dtype=dtype)
+            numpy.cumsum(self.data, axis=0, dtype=dtype, out=integral[1:, 1:])
+            numpy.cumsum(integral[1:, 1:], axis=1, out=integral[1:, 1:])
+            self._integral = integral
+        return self._integral
+
     @property
     def dtype(self) -> numpy.dtype:
         return self.data.dtype
@@ -43,16 +116,80 @@ class Field[T]:
     def size(self) -> int:
         return self.data.size
 
-    def min(self) -> T:
-        return self.data.min()
+    def min(self, area: Optional[Circle | Rectangle | Region] = None) -> T:
+        return self.data.min() if area is None else self.values(area).min()
+
+    def max(self, area: Optional[Circle | Rectangle | Region] = None) -> T:
+        return self.data.max() if area is None else self.values(area).max()
 
-    def max(self) -> T:
-        return self.data.max()
+    def mean(self, area: Optional[Circle | Rectangle | Region] = None) -> float:
+        if area is None:
+            return float(self.data.mean())
+        if isinstance(area, Rectangle):
+            (x0, x1), (y0, y1) = self._rect_to_bounds(area)
+            if x1 > x0 and y1 > y0:
+                return float(self.sum(area) / ((x1 - x0) * (y1 - y0)))
+        return float(self.values(area).mean())
 
-    def _point_to_indices(self, item: Point2) -> tuple[int, int]:
+    def point_to_indices(self, item: Point2) -> tuple[int, int]:
+        """Indices of the cell containing item; not checked against the bounds of the field."""
         point = item - self.offset
         return int(point[0]), int(point[1])
 
+    def points_to_indices(self, points: ndarray) -> tuple[ndarray, ndarray, ndarray]:
+        """Indices of an (N, 2) array of points, and whether each point lies inside the field."""
+        indices = numpy.floor(numpy.asarray(points, dtype=float) - numpy.asarray(self.offset)).astype(int)
+        x, y = indices[:, 0], indices[:, 1]
+        inside = (x >= 0) & (x < self.width) & (y >= 0) & (y < self.height)
+        return x, y, inside
+
+    def contains(self, points: ndarray) -> ndarray:
+        """Vectorized __contains__ for an (N, 2) array of points."""
+        return self.points_to_indices(points)[2]
+
+    def _area_window(self, area: Circle | Rectangle | Region) -> AreaWindow:
+        if isinstance(area, Region):
+            # Clip the region mask to the field
+            i0, j0 = area.offset[0] - int(math.floor(self.offset.x)), area.offset[1] - int(math.floor(self.offset.y))
+            x0, y0 = max(i0, 0), max(j0, 0)
+            x1 = max(min(i0 + area.mask.shape[0], self.width), x0)
+            y1 = max(min(j0 + area.mask.shape[1], self.height), y0)
+            return (slice(x0, x1), slice(y0, y1)), area.mask[x0 - i0:x1 - i0, y0 - j0:y1 - j0]
+        return get_area_window(area, self.offset, self.data.shape)
+
+    def get_mask(self, area: Circle | Rectangle | Region) -> ndarray:
+        """Boolean mask of the cells of area, with the shape of the field."""
+        slices, window_mask = self._area_window(area)
+        mask = numpy.zeros(self.data.shape, dtype=bool)
+        mask[slices] = window_mask
+        return mask
+
+    def get_indices(self, area: Circle | Rectangle | Region) -> tuple[ndarray, ndarray]:
+        """Index arrays (x, y) of the cells of area, e.g. to gather the same cells over many steps."""
+        slices, mask = self._area_window(area)
+        x, y = numpy.nonzero(mask)
+        return x + slices[0].start, y + slices[1].start
+
+    def values(self, area: Circle | Rectangle | Region) -> ndarray:
+        """Values of all cells of area, as a flat array."""
+        slices, mask = self._area_window(area)
+        return self.data[slices][mask]
+
+    def gather(self, points: ndarray, *, default: T = 0) -> ndarray:
+        """Values at an (N, 2) array of points; default for points outside the field."""
+        x, y, inside = self.points_to_indices(points)
+        result = numpy.full(len(x), default, dtype=self.dtype)
+        result[inside] = self.data[x[inside], y[inside]]
+        return result
+
+    def scatter(self, points: ndarray, values: T | ndarray) -> None:
+        """Set the cells at an (N, 2) array of points to values; points outside the field are ignored."""
+        x, y, inside = self.points_to_indices(points)
+        if isinstance(values, ndarray) and values.ndim > 0:
+            values = values[inside]
+        self.data[x[inside], y[inside]] = values
+        self.invalidate()
+
     def _rect_to_mask(self, item: Rectangle) -> tuple[slice, slice]:
         rect = item - self.offset
         #return slice(int(rect.x), int(math.ceil(rect.x_end))), slice(int(rect.y), int(math.ceil(rect.y_end)))
@@ -64,33 +201,108 @@ class Field[T]:
         #return slice(int(rect.x + 0.5), int(rect.x_end + 0.5)), slice(int(rect.y + 0.5), int(rect.y_end + 0.5))
         return mask
 
+    def _rect_to_bounds(self, item: Rectangle) -> tuple[tuple[int, int], tuple[int, int]]:
+        """Index bounds of the rectangle, clipped to the field."""
+        x_slice, y_slice = self._rect_to_mask(item)
+        x0, x1 = min(x_slice.start, self.width), min(x_slice.stop, self.width)
+        y0, y1 = min(y_slice.start, self.height), min(y_slice.stop, self.height)
+        return (x0, max(x0, x1)), (y0, max(y0, y1))
+
     def __contains__(self, item: Point2) -> bool:
-        x, y = self._point_to_indices(item)
+        x, y = self.point_to_indices(item)
         return 0 <= x < self.width and 0 <= y < self.height
 
-    def __getitem__(self, item: Point2 | Rectangle | Region) -> T | ndarray | dict[Point2, T]:
+    def __getitem__(self, item: Point2 | Rectangle | Circle | Region) -> T | ndarray | dict[Point2, T]:
         if isinstance(item, Point2):
-            return self.data[self._point_to_indices(item)]
+            return self.data[self.point_to_indices(item)]
         if isinstance(item, Rectangle):
             return self.data[self._rect_to_mask(item)]
+        if isinstance(item, Circle):
+            return self.values(item)
         if isinstance(item, Region):
-            return {point: self._point_to_indices(point) for point in item}
+            return dict(zip(item, self.gather(item.coordinates).tolist()))
         raise TypeError(f'invalid type: {type(item)}')
 
-    def __setitem__(self, item: Point2 | Rectangle | Region, value: T | ndarray | dict[Point2, T]) -> None:
+    def __setitem__(self, item: Point2 | Rectangle | Circle | Region,
+                    value: T | ndarray | dict[Point2, T]) -> None:
         if isinstance(item, Point2):
-            self.data[self._point_to_indices(item)] = value
+            self.data[self.point_to_indices(item)] = value
         elif isinstance(item, Rectangle):
             self.data[self._rect_to_mask(item)] = value
+        elif isinstance(item, Circle):
+            slices, mask = self._area_window(item)
+            self.data[slices][mask] = value
         elif isinstance(item, Region):
-            assert isinstance(value, dict)
-            for point, v in value.items():
-                self.data[self._point_to_indices(point)] = value
+            if isinstance(value, dict):
+                self.scatter(numpy.asarray(list(value.keys())), numpy.asarray(list(value.values())))
+            else:
+                slices, mask = self._area_window(item)
+                self.data[slices][mask] = value
         else:
             raise TypeError(f'invalid type: {type(item)}')
+        self.invalidate()
 
     def fill(self, value: T) -> None:
         self.data[:] = value
+        self.invalidate()
+
+    def sum(self, area: Circle | Rectangle | Region) -> T:
+        """Sum over the cells of area; O(1) for rectangles, using the summed-area table."""
+        if isinstance(area, Rectangle):
+            (x0, x1), (y0, y1) = self._rect_to_bounds(area)
+            integral = self.integral
+            return integral[x1, y1] - integral[x0, y1] - integral[x1, y0] + integral[x0, y0]
+        return self.values(area).sum()
+
+    def all(self, area: Circle | Rectangle | Region) -> bool:
+        if isinstance(area, Rectangle) and self.dtype == bool:
+            (x0, x1), (y0, y1) = self._rect_to_bounds(area)
+            return bool(self.sum(area) == (x1 - x0) * (y1 - y0))
+        return bool(numpy.all(self.values(area)))
+
+    def any(self, area: Circle | Rectangle | Region) -> bool:
+        if isinstance(area, Rectangle) and self.dtype == bool:
+            return bool(self.sum(area) != 0)
+        return bool(numpy.any(self.values(area)))
+
+    def window_sums(self, shape: tuple[int, int], area: Optional[Rectangle] = None) -> ndarray:
+        """Sums over all windows of shape, for each cell of area (or the full field).
+
+        Matches convolve2d(data[area], ones(shape), mode='same'): the window of cell i starts at i - shape // 2,
+        and cells outside of area count as zero.
+        """
+        if area is None:
+            (x0, x1), (y0, y1) = (0, self.width), (0, self.height)
+        else:
+            (x0, x1), (y0, y1) = self._rect_to_bounds(area)
+        xs = numpy.arange(x0, x1) - shape[0] // 2
+        ys = numpy.arange(y0, y1) - shape[1] // 2
+        integral = self.integral
+        # Row differences first, then column differences: two cheap 1D gathers instead of four 2D ones
+        rows = integral[numpy.clip(xs + shape[0], x0, x1)] - integral[numpy.clip(xs, x0, x1)]
+        return rows[:, numpy.clip(ys + shape[1], y0, y1)] - rows[:, numpy.clip(ys, y0, y1)]
+
+    def stamp_slices(self, center: Point2, shape: tuple[int, int]
+                     ) -> Optional[tuple[tuple[slice, slice], tuple[slice, slice]]]:
+        """Slices into data and stamp for a stamp centered at the cell containing center."""
+        x, y = self.point_to_indices(center)
+        hx, hy = shape[0] // 2, shape[1] // 2
+        x0, x1 = max(x - hx, 0), min(x + hx + 1, self.width)
+        y0, y1 = max(y - hy, 0), min(y + hy + 1, self.height)
+        if x0 >= x1 or y0 >= y1:
+            return None
+        sx, sy = x0 - (x - hx), y0 - (y - hy)
+        return ((slice(x0, x1), slice(y0, y1)),
+                (slice(sx, sx + x1 - x0), slice(sy, sy + y1 - y0)))
+
+    def add_stamp(self, center: Point2, stamp: ndarray, value: float = 1.0) -> None:
+        """Add value times stamp, centered at the cell containing center and clipped to the field."""
+        slices = self.stamp_slices(center, stamp.shape)
+        if slices is None:
+            return
+        data_slice, stamp_slice = slices
+        self.data[data_slice] += value * stamp[stamp_slice]
+        self.invalidate()
 
     def __add__(self, other: Any) -> Self:
         if isinstance(other, (int, float)):
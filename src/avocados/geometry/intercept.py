@@ -0,0 +1,43 @@
+import numpy
+from numpy import ndarray
+
+
+def get_intercept_times(positions: ndarray, speeds: ndarray, target_positions: ndarray, target_velocities: ndarray
+                        ) -> ndarray:
+    """Earliest time at which a pursuer moving at speed can reach a target moving at constant velocity.
+
+    Solves |d + v t| = s t for the smallest t >= 0, where d is the offset from pursuer to target. Rows without a
+    solution (target faster and moving away) are NaN.
+    """
+    d = target_positions - positions
+    v = target_velocities
+    dsq = numpy.einsum('ij,ij->i', d, d)
+    dv = numpy.einsum('ij,ij->i', d, v)
+    a = numpy.einsum('ij,ij->i', v, v) - speeds * speeds
+    # a t^2 + 2 dv t + dsq = 0
+    with numpy.errstate(divide='ignore', invalid='ignore'):
+        sqrt = numpy.sqrt(dv * dv - a * dsq)
+        t1 = (-dv - sqrt) / a
+        t2 = (-dv + sqrt) / a
+        linear = -dsq / (2 * dv)
+    t1 = numpy.where(t1 >= 0, t1, numpy.inf)
+    t2 = numpy.where(t2 >= 0, t2, numpy.inf)
+    times = numpy.minimum(t1, t2)
+    # Pursuer and target equally fast: only one root
+    times = numpy.where(numpy.abs(a) < 1e-8, numpy.where(linear >= 0, linear, numpy.inf), times)
+    times[dsq == 0] = 0
+    return numpy.where(numpy.isfinite(times), times, numpy.nan)
+
+
+def get_intercept_points(positions: ndarray, speeds: ndarray, target_positions: ndarray, target_velocities: ndarray,
+                         *, max_intercept_distance: float = 10.0) -> ndarray:
+    """Intercept point for each row of pursuer and target, shape (n, 2).
+
+    The lead along the target velocity is limited to max_intercept_distance. Without a solution, the intercept
+    point is the current target position.
+    """
+    times = numpy.nan_to_num(get_intercept_times(positions, speeds, target_positions, target_velocities), nan=0.0)
+    lead = times[:, None] * target_velocities
+    lead_length = numpy.linalg.norm(lead, axis=1, keepdims=True)
+    lead *= numpy.minimum(max_intercept_distance / numpy.maximum(lead_length, 1e-6), 1.0)
+    return target_positions + lead
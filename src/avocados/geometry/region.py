@@ -1,46 +1,139 @@
 import random
-from collections.abc import Iterator
-from typing import Optional
+from collections.abc import Iterator, Iterable
+from typing import Optional, Self
 
+import numpy
+from numpy import ndarray
 from sc2.position import Point2
 
 from avocados.geometry.util import Rectangle
 
 
 class Region:
-    points: set[Point2]
+    """Set of map cells, stored as a boolean mask over its bounding box.
 
-    def __init__(self, points: Optional[set[Point2]] = None):
-        self.points = points or set()
+    Cell (i, j) of the mask has its center at (offset[0] + i + 0.5, offset[1] + j + 0.5). Points are mapped to the
+    cell containing them, so a Region built from cell centers gives back the same points.
+    """
+    mask: ndarray
+    offset: tuple[int, int]
+    _coordinates: Optional[ndarray]
+
+    def __init__(self, points: Optional[Iterable[Point2]] = None) -> None:
+        points = list(points) if points is not None else []
+        coordinates = numpy.asarray(points, dtype=float).reshape(-1, 2)
+        self._set_from_indices(numpy.floor(coordinates).astype(int))
+
+    @classmethod
+    def from_mask(cls, mask: ndarray, offset: tuple[int, int] = (0, 0)) -> Self:
+        """Region of the True cells of mask, with cell (0, 0) at offset. The mask is cropped to its bounding box."""
+        region = cls.__new__(cls)
+        if not mask.any():
+            region._set_from_indices(numpy.empty((0, 2), dtype=int))
+            return region
+        xs, ys = numpy.nonzero(mask.any(axis=1))[0], numpy.nonzero(mask.any(axis=0))[0]
+        region.mask = mask[xs[0]:xs[-1] + 1, ys[0]:ys[-1] + 1].astype(bool, copy=True)
+        region.offset = (int(offset[0]) + int(xs[0]), int(offset[1]) + int(ys[0]))
+        region._coordinates = None
+        return region
+
+    @classmethod
+    def from_coordinates(cls, coordinates: ndarray) -> Self:
+        """Region of the cells containing an (N, 2) array of points."""
+        region = cls.__new__(cls)
+        region._set_from_indices(numpy.floor(coordinates).astype(int).reshape(-1, 2))
+        return region
+
+    def _set_from_indices(self, indices: ndarray) -> None:
+        if len(indices) == 0:
+            self.mask = numpy.zeros((0, 0), dtype=bool)
+            self.offset = (0, 0)
+        else:
+            x0, y0 = indices.min(axis=0)
+            x1, y1 = indices.max(axis=0)
+            self.mask = numpy.zeros((x1 - x0 + 1, y1 - y0 + 1), dtype=bool)
+            self.mask[indices[:, 0] - x0, indices[:, 1] - y0] = True
+            self.offset = (int(x0), int(y0))
+        self._coordinates = None
 
     def __repr__(self) -> str:
         return f"{type(self).__name__}(size={self.size})"
 
+    @property
+    def coordinates(self) -> ndarray:
+        """(N, 2) array of the cell centers, computed once."""
+        if self._coordinates is None:
+            self._coordinates = numpy.argwhere(self.mask) + numpy.asarray(self.offset) + 0.5
+            self._coordinates.flags.writeable = False
+        return self._coordinates
+
+    @property
+    def points(self) -> set[Point2]:
+        """Cell centers as a set, for code using the previous set-based Region."""
+        return {Point2(point) for point in self.coordinates.tolist()}
+
     @property
     def center(self) -> Point2:
-        if not self.points:
+        if self.size == 0:
             raise RuntimeError(f'region {self} has no points')
-        center = sum(self.points, start=Point2((0, 0))) / len(self.points)
-        return center
+        return Point2(self.coordinates.mean(axis=0).tolist())
 
     @property
     def size(self) -> int:
-        return len(self.points)
+        return int(numpy.count_nonzero(self.mask))
 
     def __contains__(self, point: Point2) -> bool:
-        return point in self.points
+        i = int(numpy.floor(point[0])) - self.offset[0]
+        j = int(numpy.floor(point[1])) - self.offset[1]
+        return 0 <= i < self.mask.shape[0] and 0 <= j < self.mask.shape[1] and bool(self.mask[i, j])
 
     def __iter__(self) -> Iterator[Point2]:
-        yield from self.points
+        for point in self.coordinates.tolist():
+            yield Point2(point)
 
     def random(self) -> Point2:
-        return random.choice(list(self.points))
+        return Point2(self.coordinates[random.randrange(self.size)].tolist())
 
     def bounding_rect(self) -> Rectangle:
-        x_min = min(p.x for p in self.points)
-        x_max = max(p.x for p in self.points)
-        y_min = min(p.y for p in self.points)
-        y_max = max(p.y for p in self.points)
-        width = x_max - x_min
-        height = y_max - y_min
-        return Rectangle(x_min, y_min, width, height)
+        """Rectangle spanned by the cell centers."""
+        (x_min, y_min), (x_max, y_max) = self.coordinates.min(axis=0), self.coordinates.max(axis=0)
+        return Rectangle(float(x_min), float(y_min), float(x_max - x_min), float(y_max - y_min))
+
+    # --- Set operations
+
+    def _aligned_masks(self, other: 'Region') -> tuple[ndarray, ndarray, tuple[int, int]]:
+        """Masks of both regions on their common bounding box, and its offset."""
+        regions = [region for region in (self, other) if region.mask.size > 0] or [self]
+        x0 = min(region.offset[0] for region in regions)
+        y0 = min(region.offset[1] for region in regions)
+        x1 = max(region.offset[0] + region.mask.shape[0] for region in regions)
+        y1 = max(region.offset[1] + region.mask.shape[1] for region in regions)
+        masks = []
+        for region in (self, other):
+            mask = numpy.zeros((x1 - x0, y1 - y0), dtype=bool)
+            if region.mask.size > 0:
+                i, j = region.offset[0] - x0, region.offset[1] - y0
+                mask[i:i + region.mask.shape[0], j:j + region.mask.shape[1]] = region.mask
+            masks.append(mask)
+        return masks[0], masks[1], (x0, y0)
+
+    def __or__(self, other: 'Region') -> 'Region':
+        mask1, mask2, offset = self._aligned_masks(other)
+        return Region.from_mask(mask1 | mask2, offset)
+
+    def __and__(self, other: 'Region') -> 'Region':
+        mask1, mask2, offset = self._aligned_masks(other)
+        return Region.from_mask(mask1 & mask2, offset)
+
+    def __sub__(self, other: 'Region') -> 'Region':
+        mask1, mask2, offset = self._aligned_masks(other)
+        return Region.from_mask(mask1 & ~mask2, offset)
+
+    def union(self, other: 'Region') -> 'Region':
+        return self | other
+
+    def intersection(self, other: 'Region') -> 'Region':
+        return self & other
+
+    def difference(self, other: 'Region') -> 'Region':
+        return self - other
@@ -7,9 +7,12 @@ from dataclasses import dataclass
 from typing import Any, Protocol, runtime_checkable, Self, Optional
 
 import numpy
+from scipy.sparse import csr_array
 from sc2.position import Point2, Rect
 from sc2.unit import Unit
 
+from avocados.geometry.distance import get_positions, get_closest_indices, get_furthest_indices
+
 
 _id_counter = itertools.count()
 
@@ -49,11 +52,59 @@ def get_best_score[T](values: Collection[T], score_func: Callable[[T], float], *
 
 
 def closest_point(points: Collection[Point2], target: Point2) -> tuple[Point2, float]:
-    return get_best_score(points, score_func=lambda p: squared_distance(p, target))
+    """Point closest to target and its squared distance."""
+    points = list(points)
+    indices, sq_distances = get_closest_indices(get_positions(target), get_positions(points))
+    return points[indices[0]], float(sq_distances[0])
 
 
 def furthest_point(points: Collection[Point2], target: Point2) -> tuple[Point2, float]:
-    return get_best_score(points, score_func=lambda p: -squared_distance(p, target))
+    """Point furthest from target and its squared distance."""
+    points = list(points)
+    indices, sq_distances = get_furthest_indices(get_positions(target), get_positions(points))
+    return points[indices[0]], float(sq_distances[0])
+
+
+GRID_NEIGHBOR_OFFSETS = ((1, 0), (-1, 0), (0, 1), (0, -1), (1, 1), (1, -1), (-1, 1), (-1, -1))
+
+
+def get_grid_graph(valid: numpy.ndarray, cost: numpy.ndarray) -> csr_array:
+    """8-connected graph of the valid cells of a grid, with edge weights of step length times destination cost.
+
+    Node i is cell numpy.unravel_index(i, valid.shape).
+    """
+    width, height = valid.shape
+    indices = numpy.arange(valid.size).reshape(valid.shape)
+    rows, cols, weights = [], [], []
+    for dx, dy in GRID_NEIGHBOR_OFFSETS:
+        src = (slice(max(-dx, 0), width - max(dx, 0)), slice(max(-dy, 0), height - max(dy, 0)))
+        dst = (slice(max(dx, 0), width - max(-dx, 0)), slice(max(dy, 0), height - max(-dy, 0)))
+        edges = valid[src] & valid[dst]
+        rows.append(indices[src][edges])
+        cols.append(indices[dst][edges])
+        weights.append(math.hypot(dx, dy) * cost[dst][edges])
+    return csr_array((numpy.concatenate(weights), (numpy.concatenate(rows), numpy.concatenate(cols))),
+                     shape=(valid.size, valid.size))
+
+
+def convex_hull(points: numpy.ndarray) -> numpy.ndarray:
+    """Vertices of the convex hull of (N, 2) points in counter-clockwise order (monotone chain)."""
+    points = numpy.unique(numpy.asarray(points, dtype=float).reshape(-1, 2), axis=0)
+    if len(points) <= 2:
+        return points
+
+    def half_hull(sorted_points: numpy.ndarray) -> list[numpy.ndarray]:
+        hull = []
+        for p in sorted_points:
+            while len(hull) >= 2 and ((hull[-1][0] - hull[-2][0]) * (p[1] - hull[-2][1])
+                                      - (hull[-1][1] - hull[-2][1]) * (p[0] - hull[-2][0])) <= 0:
+                hull.pop()
+            hull.append(p)
+        return hull
+
+    lower = half_hull(points)
+    upper = half_hull(points[::-1])
+    return numpy.asarray(lower[:-1] + upper[:-1])
 
 
 @runtime_checkable
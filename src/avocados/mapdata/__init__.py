@@ -1 +1,2 @@
 from .mapmanager import MapManager
+from .regions import MapRegions, MapRegion, Choke
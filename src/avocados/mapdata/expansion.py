@@ -1,5 +1,6 @@
 from typing import Any, TYPE_CHECKING, Optional, Self
 
+import numpy
 from sc2.game_info import Ramp
 from sc2.position import Point2
 from sc2.unit import Unit
@@ -89,16 +90,18 @@ class ExpansionLocation(BotObject):
         ymin = ymin0 = int(townhall_area.y)
         ymax = ymax0 = int(townhall_area.y_end)
         size = 3
-        for x in range(xmin - size, xmax + size + 1):
-            for y in range(ymin0 - size, ymax0 + size + 1):
-                point = Point2((x, y))  # TODO: why not +0.5, +0.5?
-                if point in townhall_area:
-                    continue
-                if self.mineral_fields.closest_distance_to(point) <= size:
-                    xmin = min(x, xmin)
-                    xmax = max(x, xmax)
-                    ymin = min(y, ymin)
-                    ymax = max(y, ymax)
+        xs, ys = numpy.meshgrid(numpy.arange(xmin - size, xmax + size + 1),
+                                numpy.arange(ymin0 - size, ymax0 + size + 1), indexing='ij')
+        points = numpy.column_stack((xs.ravel(), ys.ravel()))  # TODO: why not +0.5, +0.5?
+        outside_townhall = ~((townhall_area.x <= points[:, 0]) & (points[:, 0] < townhall_area.x_end)
+                             & (townhall_area.y <= points[:, 1]) & (points[:, 1] < townhall_area.y_end))
+        minerals = numpy.asarray([mf.position for mf in self.mineral_fields])
+        delta = points[:, None, :] - minerals[None, :, :]
+        near = numpy.min(numpy.einsum('ijk,ijk->ij', delta, delta), axis=1) <= size**2
+        selected = points[outside_townhall & near]
+        if len(selected) > 0:
+            xmin, ymin = min(xmin, int(selected[:, 0].min())), min(ymin, int(selected[:, 1].min()))
+            xmax, ymax = max(xmax, int(selected[:, 0].max())), max(ymax, int(selected[:, 1].max()))
         return Rectangle(xmin, ymin, xmax-xmin, ymax-ymin)
 
     def get_mineral_field(self, position: Point2) -> Optional[Unit]:
@@ -159,7 +162,7 @@ class StartLocation(ExpansionLocation):
         self._line_third = None
         self._triangle_third = None
         self._expansion_order = None
-        self._region = self.map.floodfill(self.center, lambda p: self.map.terrain_height[p] == self.terrain_height,
+        self._region = self.map.floodfill(self.center, self.map.terrain_height.data == self.terrain_height,
                                           max_distance=32)
 
     @property
@@ -1,4 +1,5 @@
-import itertools
+import math
+from time import perf_counter
 from collections.abc import Callable, Collection
 from typing import Optional
 
@@ -8,13 +9,20 @@ from sc2.pixel_map import PixelMap
 from sc2.position import Point2, Rect
 from sc2.unit import Unit
 from sc2.units import Units
+from scipy.ndimage import distance_transform_edt, label
 
 from avocados import api
-from avocados.geometry.field import Field
+from avocados.geometry.field import Field, get_disc_stamp
 from avocados.core.manager import BotManager
 from avocados.geometry.region import Region
 from avocados.geometry.util import Area, Rectangle
 from avocados.mapdata.expansion import ExpansionLocation, StartLocation
+from avocados.mapdata.regions import MapRegions, MapRegion, get_map_regions
+
+
+# Windowed refreshes of the nearest pathable lookup fall back to a full one above this fraction of the map
+NEAREST_PATHABLE_MAX_WINDOW_FRACTION = 0.25
+NEIGHBOR_OFFSETS = numpy.asarray([(dx, dy) for dx in (-1, 0, 1) for dy in (-1, 0, 1) if (dx, dy) != (0, 0)])
 
 
 class MapManager(BotManager):
@@ -23,6 +31,8 @@ class MapManager(BotManager):
     pathing_grid: Field[bool]
     creep: Field[bool]
     terrain_height: Field[int]
+    visibility: Field[int]
+    regions: MapRegions
     base: ExpansionLocation
     expansions: list[ExpansionLocation]
     expansion_distance_matrix: ndarray
@@ -31,6 +41,9 @@ class MapManager(BotManager):
     start_location: StartLocation
     enemy_start_locations: list[StartLocation]
     known_enemy_start_location: Optional[StartLocation] # Only set once known
+    # Nearest pathable cell of every cell, and the distance to it
+    _pathable_distance: ndarray
+    _nearest_pathable_indices: ndarray
 
     def __init__(self) -> None:
         super().__init__()
@@ -107,6 +120,15 @@ class MapManager(BotManager):
         self.pathing_grid = self.create_field_from_pixelmap(api.game_info.pathing_grid)
         self.creep = self.create_field_from_pixelmap(api.state.creep)
         self.terrain_height = self.create_field_from_pixelmap(api.game_info.terrain_height)
+        self.visibility = self.create_field_from_pixelmap(api.state.visibility)
+        self._update_nearest_pathable()
+        t0 = perf_counter()
+        # Structures and resources are not part of the static terrain
+        self.regions = get_map_regions(api.game_info.map_name,
+                                       Field(self.pathing_grid.data | self.placement_grid.data,
+                                             offset=self.playable_offset))
+        self.timings['regions'].add(t0)
+        self.logger.debug("Found {}", self.regions)
 
         self.logger.info(
             "Map={}, size={}x{}, playable={}, center={}, placement_grid={}, pathing_grid={}, creep={}",
@@ -135,8 +157,14 @@ class MapManager(BotManager):
         self.logger.debug("on_start finished")
 
     async def on_step_start(self, step: int) -> None:
-        self.pathing_grid.data = api.game_info.pathing_grid.data_numpy.transpose()[self.playable_mask]
-        self.creep.data = api.state.creep.data_numpy.transpose()[self.playable_mask]
+        t0 = perf_counter()
+        previous_pathing = self.pathing_grid.data
+        self.pathing_grid.data = self._pixelmap_to_array(api.game_info.pathing_grid)
+        if not numpy.array_equal(previous_pathing, self.pathing_grid.data):
+            self._update_nearest_pathable(previous_pathing)
+        self.timings['nearest_pathable'].add(t0)
+        self.creep.data = self._pixelmap_to_array(api.state.creep)
+        self.visibility.data = self._pixelmap_to_array(api.state.visibility)
 
         # check for enemy start location
 
@@ -155,36 +183,25 @@ class MapManager(BotManager):
                 self.logger.info("Enemy start location must be at {}", self.known_enemy_start_location)
 
     def create_field_from_pixelmap(self, pixelmap: PixelMap) -> Field:
-        return Field(pixelmap.data_numpy.transpose()[self.playable_mask], offset=self.playable_offset)
+        return Field(self._pixelmap_to_array(pixelmap), offset=self.playable_offset)
 
     def nearest_pathable(self, point: Point2) -> Optional[Point2]:
-        if api.in_pathing_grid(point):
+        """Point itself if pathable, else the center of the nearest pathable cell. O(1) by a precomputed lookup."""
+        x, y = self.pathing_grid.point_to_indices(point)
+        x, y = min(max(x, 0), self.width - 1), min(max(y, 0), self.height - 1)
+        if self.pathing_grid.data[x, y] and point in self.pathing_grid:
             return point
-
-        # TODO: This can be improved
-
-        def cells_by_distance(center: Point2, width: int, height: int) -> list[Point2]:
-            cells = [Point2((center.x + x, center.y + y))
-                     for x, y in itertools.product(range(-width, width+1), range(-height, height+1))]
-            cells.sort(key=lambda c: (c.x - 2*center.x) ** 2 + (c.y - 2*center.y) ** 2)
-            return cells
-
-        for size in range(3, 21, 2):
-            for point in cells_by_distance(point, size, size):
-                if api.in_pathing_grid(point):
-                    return point
-        else:
+        if numpy.isinf(self._pathable_distance[x, y]):
             return None
+        nx, ny = self._nearest_pathable_indices[:, x, y]
+        return Point2((self.playable_offset.x + int(nx) + 0.5, self.playable_offset.y + int(ny) + 0.5))
+
+    def region_at(self, point: Point2) -> Optional[MapRegion]:
+        """Map region of the cell containing point, None if unpathable."""
+        return self.regions.region_at(point)
 
     def any_part_of_area_is_visible(self, area: Area) -> bool:
-        bounds = area.bounding_rect(integral=True)
-        for x in range(int(bounds.x), int(bounds.x + bounds.width)):
-            for y in range(int(bounds.y), int(bounds.y + bounds.width)):
-                if (point := Point2((x, y))) not in area:
-                    continue
-                if api.state.visibility[point] > 0:    # 0: Hidden, 1: Fog, 2: Visible
-                    return True
-        return False
+        return self.visibility.any(area)    # 0: Hidden, 1: Fog, 2: Visible
 
     # def get_expansion(self, *,
     #                   func: Callable[[ExpansionLocation], float],
@@ -270,30 +287,119 @@ class MapManager(BotManager):
         speed = 1.4 * unit.real_speed
         return distance / speed
 
-    def floodfill(self, start: Point2, predicate: Callable[[Point2], bool], *,
+    def floodfill(self, start: Point2, predicate: Callable[[Point2], bool] | ndarray, *,
                   max_distance: Optional[float] = None,
                   in_placement_grid: bool = True) -> Region:
-        points: set[Point2] = set()
-        queue: list[Point2] = [start]
-        while queue:
-            point = queue.pop()
-            if point not in self.playable_rect:
-                continue
-            if point in points:
-                continue
-            if in_placement_grid and not self.placement_grid[point]:
-                continue
-            if max_distance is not None and point.distance_to(start) > max_distance:
-                continue
-            if predicate(point):
-                points.add(point)
-                queue += [Point2((point.x + dx, point.y + dy))
-                          for dx in [-1, 0, 1] for dy in [-1, 0, 1]
-                          if not (dx == 0 and dy == 0)]
-        return Region(points)
+        """8-connected region around start, of cells fulfilling predicate and within max_distance of start.
+
+        predicate is either a boolean mask with the shape of the playable area, which is labeled with
+        scipy.ndimage.label, or a function of a point, which is called once per candidate cell in a frontier BFS.
+        """
+        if isinstance(predicate, ndarray):
+            return self._floodfill_mask(start, predicate, max_distance=max_distance,
+                                        in_placement_grid=in_placement_grid)
+        visited = numpy.zeros((self.width, self.height), dtype=bool)
+        points: list[ndarray] = []
+        frontier = numpy.asarray([start], dtype=float)
+        start_array = numpy.asarray(start)
+        while len(frontier) > 0:
+            x, y, inside = self.placement_grid.points_to_indices(frontier)
+            frontier, x, y = frontier[inside], x[inside], y[inside]
+            # Deduplicate cells within the frontier and against visited cells
+            _, unique = numpy.unique(x * self.height + y, return_index=True)
+            frontier, x, y = frontier[unique], x[unique], y[unique]
+            new = ~visited[x, y]
+            frontier, x, y = frontier[new], x[new], y[new]
+            visited[x, y] = True
+            keep = numpy.ones(len(frontier), dtype=bool)
+            if in_placement_grid:
+                keep &= self.placement_grid.data[x, y] > 0
+            if max_distance is not None:
+                keep &= numpy.sum((frontier - start_array)**2, axis=1) <= max_distance**2
+            candidates = [Point2(p) for p in frontier[keep].tolist()]
+            accepted = numpy.asarray([point for point in candidates if predicate(point)]).reshape(-1, 2)
+            points.append(accepted)
+            frontier = (accepted[:, None, :] + NEIGHBOR_OFFSETS[None, :, :]).reshape(-1, 2)
+        return Region.from_coordinates(numpy.concatenate(points))
 
     # --- Private
 
+    def _update_nearest_pathable(self, previous_pathing: Optional[ndarray] = None) -> None:
+        """Refresh the nearest pathable lookup after pathing changes, in a window around the changes if possible."""
+        pathing = self.pathing_grid.data
+        if previous_pathing is None or previous_pathing.shape != pathing.shape or not pathing.any():
+            self._set_nearest_pathable(*self._get_nearest_pathable(pathing))
+            return
+        xs, ys = numpy.nonzero(previous_pathing != pathing)
+        if len(xs) == 0:
+            return
+        # Cells can only change their nearest pathable cell if the changed cells are at most as far as it
+        dx = numpy.maximum(numpy.maximum(xs.min() - numpy.arange(self.width), numpy.arange(self.width) - xs.max()), 0)
+        dy = numpy.maximum(numpy.maximum(ys.min() - numpy.arange(self.height), numpy.arange(self.height) - ys.max()), 0)
+        affected = numpy.hypot(dx[:, None], dy[None, :]) <= self._pathable_distance
+        ax, ay = numpy.nonzero(affected)
+        # The window must contain the new nearest cells: pad by the largest previous distance of the affected cells
+        margin = int(numpy.ceil(numpy.max(self._pathable_distance[ax, ay], initial=0.0))) + 2
+        x0, x1 = max(ax.min() - margin, 0), min(ax.max() + margin + 1, self.width)
+        y0, y1 = max(ay.min() - margin, 0), min(ay.max() + margin + 1, self.height)
+        if (x1 - x0) * (y1 - y0) > NEAREST_PATHABLE_MAX_WINDOW_FRACTION * pathing.size:
+            self._set_nearest_pathable(*self._get_nearest_pathable(pathing))
+            return
+        distance, indices = self._get_nearest_pathable(pathing[x0:x1, y0:y1])
+        # Results are exact if no cell outside the window can be closer than the nearest one inside of it
+        border_x = numpy.minimum(numpy.where(x0 > 0, ax - x0 + 1, numpy.inf),
+                                 numpy.where(x1 < self.width, x1 - ax, numpy.inf))
+        border_y = numpy.minimum(numpy.where(y0 > 0, ay - y0 + 1, numpy.inf),
+                                 numpy.where(y1 < self.height, y1 - ay, numpy.inf))
+        window_distance = distance[ax - x0, ay - y0]
+        if numpy.any(window_distance > numpy.minimum(border_x, border_y)):
+            self._set_nearest_pathable(*self._get_nearest_pathable(pathing))
+            return
+        self._pathable_distance[ax, ay] = window_distance
+        self._nearest_pathable_indices[0, ax, ay] = indices[0, ax - x0, ay - y0] + x0
+        self._nearest_pathable_indices[1, ax, ay] = indices[1, ax - x0, ay - y0] + y0
+
+    @staticmethod
+    def _get_nearest_pathable(pathing: ndarray) -> tuple[ndarray, ndarray]:
+        if not pathing.any():
+            return numpy.full(pathing.shape, numpy.inf), numpy.zeros((2,) + pathing.shape, dtype=int)
+        return distance_transform_edt(~pathing.astype(bool), return_indices=True)
+
+    def _set_nearest_pathable(self, distance: ndarray, indices: ndarray) -> None:
+        self._pathable_distance = distance
+        self._nearest_pathable_indices = indices
+
+    def _floodfill_mask(self, start: Point2, mask: ndarray, *,
+                        max_distance: Optional[float],
+                        in_placement_grid: bool) -> Region:
+        x, y = self.placement_grid.point_to_indices(start)
+        if not (0 <= x < self.width and 0 <= y < self.height):
+            return Region()
+        # Window around start; distances are measured between cell centers, as start moves in whole cells
+        if max_distance is not None:
+            disc = get_disc_stamp(max_distance)
+            slices = self.placement_grid.stamp_slices(start, disc.shape)
+            (window, disc_window) = slices
+            candidates = mask[window] & disc[disc_window]
+        else:
+            window = (slice(0, self.width), slice(0, self.height))
+            candidates = mask.copy()
+        if in_placement_grid:
+            candidates &= self.placement_grid.data[window]
+        x0, y0 = window[0].start, window[1].start
+        labels, _ = label(candidates, structure=numpy.ones((3, 3), dtype=bool))
+        start_label = labels[x - x0, y - y0]
+        if start_label == 0:
+            return Region()
+        # Cell offsets relative to start, so that the region contains start itself
+        origin = (int(math.floor(start.x)) - x + x0, int(math.floor(start.y)) - y + y0)
+        return Region.from_mask(labels == start_label, origin)
+
+    def _pixelmap_to_array(self, pixelmap: PixelMap) -> ndarray:
+        """Playable part of the pixelmap with [x, y] indexing; boolean for 1-bit maps."""
+        data = pixelmap.data_numpy.transpose()[self.playable_mask]
+        return data.astype(bool) if pixelmap.bits_per_pixel == 1 else data
+
     async def _calculate_expansion_distances(self, *, pathing_query_radius: float = 3) -> tuple[ndarray, ndarray]:
         expansions = self._get_ordered_expansion()
         number_expansions = len(expansions)
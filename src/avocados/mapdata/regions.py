@@ -0,0 +1,245 @@
+import hashlib
+from dataclasses import dataclass
+from typing import Optional
+
+import numpy
+from numpy import ndarray
+from sc2.position import Point2
+from scipy.ndimage import distance_transform_edt, label, maximum, maximum_filter, maximum_position
+from scipy.sparse import coo_array
+from scipy.sparse.csgraph import dijkstra, shortest_path
+
+from avocados.geometry.field import Field
+from avocados.geometry.region import Region
+from avocados.geometry.util import get_grid_graph
+
+
+PEAK_FOOTPRINT = 9
+MIN_PEAK_DISTANCE = 2.5
+# Neighboring regions are merged if their saddle distance reaches this fraction of the smaller peak distance
+MERGE_RATIO = 0.75
+MAX_MERGE_ITERATIONS = 10
+# Half of the 8-neighborhood; the other half is covered by symmetry
+BOUNDARY_OFFSETS = ((1, 0), (0, 1), (1, 1), (1, -1))
+
+
+@dataclass(frozen=True, eq=False)
+class Choke:
+    regions: tuple[int, int]
+    center: Point2
+    width: float
+    cells: ndarray
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(regions={self.regions}, center={self.center}, width={self.width:.1f})"
+
+    def other(self, region_id: int) -> int:
+        return self.regions[1] if self.regions[0] == region_id else self.regions[0]
+
+
+@dataclass(frozen=True)
+class MapRegion:
+    id: int
+    center: Point2
+    radius: float
+    region: Region
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(id={self.id}, center={self.center}, size={self.region.size})"
+
+    @property
+    def size(self) -> int:
+        return self.region.size
+
+
+class MapRegions:
+    """Decomposition of the pathable map into regions separated by chokes.
+
+    Regions grow from the local maxima of the distance transform of the pathable grid, see _segment.
+    Regions whose shared boundary is nearly as wide as the smaller basin are merged, the remaining boundaries are
+    the chokes. Region ids start at 1; 0 marks unpathable cells.
+    """
+    labels: Field[int]
+    distance: Field[float]
+    regions: dict[int, MapRegion]
+    chokes: list[Choke]
+    path_lengths: ndarray
+    _chokes_by_region: dict[int, list[Choke]]
+
+    def __init__(self, pathable: Field[bool]) -> None:
+        self.distance = Field(distance_transform_edt(pathable.data), offset=pathable.offset)
+        labels = _merge_regions(_segment(pathable.data, self.distance.data), self.distance.data)
+        self.labels = Field(labels, offset=pathable.offset)
+
+        ids = numpy.arange(1, labels.max() + 1)
+        offset = numpy.asarray(pathable.offset)
+        peaks = maximum_position(self.distance.data, labels, ids) if len(ids) else []
+        self.regions = {}
+        for region_id, peak in zip(ids.tolist(), peaks):
+            mask = labels == region_id
+            self.regions[region_id] = MapRegion(
+                id=region_id,
+                center=Point2((offset + numpy.asarray(peak) + 0.5).tolist()),
+                radius=float(self.distance.data[peak]),
+                region=Region.from_mask(mask, (int(offset[0]), int(offset[1]))),
+            )
+
+        self.chokes = []
+        for (a, b), (center, saddle, cells) in _get_boundaries(labels, self.distance.data).items():
+            self.chokes.append(Choke(regions=(a, b), center=Point2((offset + center + 0.5).tolist()),
+                                     width=2 * saddle, cells=offset + cells + 0.5))
+        self._chokes_by_region = {region_id: [] for region_id in self.regions}
+        for choke in self.chokes:
+            for region_id in choke.regions:
+                self._chokes_by_region[region_id].append(choke)
+        self.path_lengths = self._get_path_lengths()
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}(regions={len(self.regions)}, chokes={len(self.chokes)})"
+
+    def region_id_at(self, point: Point2) -> int:
+        """Region id of the cell containing point, 0 if unpathable or outside the map."""
+        if point not in self.labels:
+            return 0
+        return int(self.labels[point])
+
+    def region_at(self, point: Point2) -> Optional[MapRegion]:
+        return self.regions.get(self.region_id_at(point))
+
+    def get_chokes(self, region: int | MapRegion) -> list[Choke]:
+        region_id = region.id if isinstance(region, MapRegion) else region
+        return self._chokes_by_region.get(region_id, [])
+
+    def get_neighbors(self, region: int | MapRegion) -> list[MapRegion]:
+        region_id = region.id if isinstance(region, MapRegion) else region
+        return [self.regions[choke.other(region_id)] for choke in self.get_chokes(region_id)]
+
+    def get_path_length(self, region1: int | MapRegion, region2: int | MapRegion) -> float:
+        """Length of the shortest path between the region centers, through the chokes; inf if not connected."""
+        id1 = region1.id if isinstance(region1, MapRegion) else region1
+        id2 = region2.id if isinstance(region2, MapRegion) else region2
+        return float(self.path_lengths[id1 - 1, id2 - 1])
+
+    # --- Private
+
+    def _get_path_lengths(self) -> ndarray:
+        number = len(self.regions)
+        rows, cols, weights = [], [], []
+        for choke in self.chokes:
+            a, b = choke.regions
+            rows.append(a - 1)
+            cols.append(b - 1)
+            weights.append(self.regions[a].center.distance_to(choke.center)
+                           + choke.center.distance_to(self.regions[b].center))
+        graph = coo_array((weights, (rows, cols)), shape=(number, number)).tocsr()
+        return shortest_path(graph, directed=False)
+
+
+_map_regions_cache: dict[tuple[str, str], MapRegions] = {}
+
+
+def get_map_regions(map_name: str, pathable: Field[bool]) -> MapRegions:
+    """Map regions of the pathable grid, computed once per map and grid."""
+    key = (map_name, hashlib.sha1(numpy.ascontiguousarray(pathable.data)).hexdigest())
+    if (regions := _map_regions_cache.get(key)) is None:
+        regions = _map_regions_cache[key] = MapRegions(pathable)
+    return regions
+
+
+def _segment(pathable: ndarray, distance: ndarray) -> ndarray:
+    """Assign each pathable cell to the seed with the lowest geodesic cost, seeded at the distance maxima.
+
+    Steps cost (max distance / distance)**2, which makes narrow passages expensive, so that the region boundaries
+    fall onto the chokes. This behaves like a watershed of the distance transform, without the tie-breaking
+    artifacts of watershed_ift on plateaus.
+    """
+    pathable = pathable.astype(bool)
+    eight_connected = numpy.ones((3, 3), dtype=bool)
+    peaks = (maximum_filter(distance, size=PEAK_FOOTPRINT) == distance) & (distance >= MIN_PEAK_DISTANCE)
+    markers, number = label(peaks, structure=eight_connected)
+    # Every pathable component gets at least one seed, at its most open cell
+    components, number_components = label(pathable, structure=eight_connected)
+    seeded = numpy.zeros(number_components + 1, dtype=bool)
+    seeded[components[markers > 0]] = True
+    unseeded = numpy.flatnonzero(~seeded[1:]) + 1
+    if len(unseeded):
+        positions = numpy.asarray(maximum_position(distance, components, unseeded)).reshape(-1, 2)
+        markers[positions[:, 0], positions[:, 1]] = number + numpy.arange(1, len(unseeded) + 1)
+    if not markers.any():
+        return markers
+
+    cost = (distance.max() / numpy.maximum(distance, 1.0))**2
+    graph = get_grid_graph(pathable, cost)
+    seeds = numpy.flatnonzero(markers)
+    _, _, sources = dijkstra(graph, indices=seeds, min_only=True, return_predecessors=True)
+    labels = numpy.where(sources >= 0, markers.ravel()[numpy.maximum(sources, 0)], 0).reshape(markers.shape)
+    labels[~pathable] = 0
+    return labels
+
+
+def _get_boundaries(labels: ndarray, distance: ndarray) -> dict[tuple[int, int], tuple[ndarray, float, ndarray]]:
+    """Center cell, saddle distance and cells of the boundary between each pair of neighboring regions."""
+    width, height = labels.shape
+    pairs, values, cells = [], [], []
+    for dx, dy in BOUNDARY_OFFSETS:
+        src = (slice(max(-dx, 0), width - max(dx, 0)), slice(max(-dy, 0), height - max(dy, 0)))
+        dst = (slice(max(dx, 0), width - max(-dx, 0)), slice(max(dy, 0), height - max(-dy, 0)))
+        a, b = labels[src], labels[dst]
+        boundary = (a > 0) & (b > 0) & (a != b)
+        ia, ja = numpy.nonzero(boundary)
+        ia, ja = ia + src[0].start, ja + src[1].start
+        la, lb = labels[ia, ja], labels[ia + dx, ja + dy]
+        pairs.append(numpy.column_stack((numpy.minimum(la, lb), numpy.maximum(la, lb))))
+        # The saddle of a boundary pair is the lower of its two cells
+        values.append(numpy.minimum(distance[ia, ja], distance[ia + dx, ja + dy]))
+        cells.append(numpy.column_stack((ia, ja)))
+    pairs, values, cells = numpy.concatenate(pairs), numpy.concatenate(values), numpy.concatenate(cells)
+    if len(pairs) == 0:
+        return {}
+    order = numpy.lexsort((values, pairs[:, 1], pairs[:, 0]))
+    pairs, values, cells = pairs[order], values[order], cells[order]
+    keys, starts = numpy.unique(pairs, axis=0, return_index=True)
+    ends = numpy.append(starts[1:], len(pairs))
+    # Within each group, values are sorted ascending, so the last entry is the saddle
+    return {(int(a), int(b)): (cells[end - 1], float(values[end - 1]), numpy.unique(cells[start:end], axis=0))
+            for (a, b), start, end in zip(keys, starts, ends)}
+
+
+def _merge_regions(labels: ndarray, distance: ndarray) -> ndarray:
+    """Merge neighboring regions without a narrow boundary, and relabel to consecutive ids.
+
+    The region with the lower peak is absorbed into the neighbor with the widest qualifying boundary only. Merges are
+    therefore never transitive through a low-peak region, such as a long corridor between two open areas, whose
+    peak is about as wide as its saddles on both sides.
+    """
+    for _ in range(MAX_MERGE_ITERATIONS):
+        number = labels.max()
+        if number == 0:
+            break
+        peaks = numpy.zeros(number + 1)
+        peaks[1:] = maximum(distance, labels, numpy.arange(1, number + 1))
+        # Best (saddle, parent) per absorbed region
+        candidates: dict[int, tuple[float, int]] = {}
+        for (a, b), (_, saddle, _) in _get_boundaries(labels, distance).items():
+            if saddle < MERGE_RATIO * min(peaks[a], peaks[b]):
+                continue
+            # Ties of the peaks are broken by id, so that absorption never forms a cycle
+            child, parent = (a, b) if (peaks[a], a) < (peaks[b], b) else (b, a)
+            if child not in candidates or saddle > candidates[child][0]:
+                candidates[child] = (saddle, parent)
+        if not candidates:
+            break
+        roots = numpy.arange(number + 1)
+        for child, (_, parent) in candidates.items():
+            roots[child] = parent
+        # Parents have higher peaks than their children, so following the chain terminates
+        for _ in range(number):
+            following = roots[roots]
+            if numpy.array_equal(following, roots):
+                break
+            roots = following
+        labels = roots[labels]
+    # Consecutive ids, keeping 0 for unpathable cells
+    _, consecutive = numpy.unique(labels, return_inverse=True)
+    consecutive = consecutive.reshape(labels.shape)
+    return consecutive if labels.min() == 0 else consecutive + 1
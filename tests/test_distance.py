@@ -0,0 +1,93 @@
+import math
+
+import numpy
+import pytest
+from scipy.spatial.distance import cdist
+from sc2.position import Point2
+
+from avocados.combat.squad import Squad
+from avocados.geometry import distance
+from avocados.geometry.circle import Circle
+from avocados.geometry.distance import (get_closest_indices, get_furthest_indices, get_closest_sq_distances,
+                                        get_min_sq_distance, get_k_nearest)
+from avocados.geometry.util import closest_point, furthest_point
+
+
+@pytest.fixture
+def positions():
+    rng = numpy.random.default_rng(0)
+    return rng.uniform(0, 100, (57, 2)), rng.uniform(0, 100, (23, 2))
+
+
+@pytest.fixture(params=[distance.MAX_CHUNK_SIZE, 1, 50])
+def chunk_size(request, monkeypatch):
+    """Run with a single chunk, one row per chunk, and a few rows per chunk."""
+    monkeypatch.setattr(distance, 'MAX_CHUNK_SIZE', request.param)
+    return request.param
+
+
+def test_closest_and_furthest_indices(positions, chunk_size):
+    positions1, positions2 = positions
+    expected = cdist(positions1, positions2) ** 2
+    indices, sq_distances = get_closest_indices(positions1, positions2)
+    numpy.testing.assert_array_equal(indices, expected.argmin(axis=1))
+    numpy.testing.assert_allclose(sq_distances, expected.min(axis=1))
+    indices, sq_distances = get_furthest_indices(positions1, positions2)
+    numpy.testing.assert_array_equal(indices, expected.argmax(axis=1))
+    numpy.testing.assert_allclose(sq_distances, expected.max(axis=1))
+
+
+def test_closest_sq_distances(positions, chunk_size):
+    positions1, positions2 = positions
+    expected = cdist(positions1, positions2) ** 2
+    numpy.testing.assert_allclose(get_closest_sq_distances(positions1, positions2), expected.min(axis=1))
+    assert get_min_sq_distance(positions1, positions2) == pytest.approx(expected.min())
+    assert get_min_sq_distance(positions2, positions1) == pytest.approx(expected.min())
+
+
+def test_empty_positions():
+    positions = numpy.zeros((3, 2))
+    empty = numpy.zeros((0, 2))
+    numpy.testing.assert_array_equal(get_closest_sq_distances(positions, empty), numpy.full(3, numpy.inf))
+    assert get_min_sq_distance(empty, positions) == float('inf')
+    with pytest.raises(ValueError):
+        get_closest_indices(positions, empty)
+    with pytest.raises(ValueError):
+        get_furthest_indices(positions, empty)
+
+
+@pytest.mark.parametrize('k', [1, 5, 23, 30])
+def test_k_nearest(positions, chunk_size, k):
+    positions1, positions2 = positions
+    expected = cdist(positions1, positions2) ** 2
+    indices, sq_distances = get_k_nearest(positions1, positions2, k)
+    k = min(k, len(positions2))
+    assert indices.shape == sq_distances.shape == (len(positions1), k)
+    numpy.testing.assert_array_equal(indices, numpy.argsort(expected, axis=1, kind='stable')[:, :k])
+    numpy.testing.assert_allclose(sq_distances, numpy.sort(expected, axis=1)[:, :k])
+
+
+def test_closest_and_furthest_point():
+    points = [Point2((3, 4)), Point2((1, 0)), Point2((-6, 8))]
+    assert closest_point(points, Point2((0, 0))) == (Point2((1, 0)), pytest.approx(1))
+    assert furthest_point(points, Point2((0, 0))) == (Point2((-6, 8)), pytest.approx(100))
+    circle = Circle(Point2((0, 0)), 2)
+    assert circle.closest(points)[0] == Point2((1, 0))
+    assert circle.furthest(points)[0] == Point2((-6, 8))
+
+
+class _PointSquad:
+    """Stand-in with the attributes used by Squad.closest_distance_to."""
+
+    def __init__(self, points: list[Point2]) -> None:
+        self.units = points
+
+    def __len__(self) -> int:
+        return len(self.units)
+
+
+def test_squad_closest_distance_to_area():
+    squad = _PointSquad([Point2((3, 4)), Point2((10, 0))])
+    # Distance to the area center, not its square
+    assert Squad.closest_distance_to(squad, Circle(Point2((0, 0)), 1)) == pytest.approx(5)
+    assert Squad.closest_distance_to(_PointSquad([]), Circle(Point2((0, 0)), 1)) == math.inf
@@ -0,0 +1,80 @@
+import numpy
+import pytest
+from scipy.signal import convolve2d
+from sc2.position import Point2
+
+from avocados.geometry.field import Field
+from avocados.geometry.util import Rectangle
+
+
+FOOTPRINTS = [(1, 1), (2, 2), (3, 3), (4, 2), (5, 5), (7, 4)]
+
+
+@pytest.fixture(params=[bool, float])
+def field(request):
+    rng = numpy.random.default_rng(0)
+    data = rng.uniform(size=(23, 17))
+    if request.param is bool:
+        data = data < 0.7
+    return Field(data, offset=Point2((8, 4)))
+
+
+def reference_sums(data: numpy.ndarray, footprint: tuple[int, int]) -> numpy.ndarray:
+    return convolve2d(data.astype(float), numpy.ones(footprint), mode='same')
+
+
+@pytest.mark.parametrize('footprint', FOOTPRINTS)
+def test_window_sums_full_field(field, footprint):
+    numpy.testing.assert_allclose(field.window_sums(footprint), reference_sums(field.data, footprint))
+
+
+@pytest.mark.parametrize('footprint', FOOTPRINTS)
+@pytest.mark.parametrize('area', [
+    Rectangle(13, 9, 6, 5),
+    # Touching the borders of the field
+    Rectangle(8, 4, 4, 17),
+    Rectangle(25, 15, 6, 6),
+    # Partially outside of the field
+    Rectangle(0, 0, 12, 10),
+])
+def test_window_sums_area(field, footprint, area):
+    expected = reference_sums(field[area], footprint)
+    numpy.testing.assert_allclose(field.window_sums(footprint, area), expected)
+
+
+def test_rectangle_sum(field):
+    area = Rectangle(10, 6, 7, 5)
+    assert field.sum(area) == pytest.approx(field[area].sum())
+
+
+def test_integral_rebuilt_after_write(field):
+    area = Rectangle(10, 6, 7, 5)
+    field.window_sums((3, 3))
+    field.sum(area)
+    # Writes through Field methods invalidate the table themselves
+    field[Point2((12.5, 7.5))] = 1
+    field.scatter(numpy.array([[14.5, 8.5]]), 0)
+    numpy.testing.assert_allclose(field.window_sums((3, 3)), reference_sums(field.data, (3, 3)))
+    # In-place writes to data need invalidate()
+    field.data[:] = numpy.flip(field.data)
+    field.invalidate()
+    numpy.testing.assert_allclose(field.window_sums((3, 3)), reference_sums(field.data, (3, 3)))
+    assert field.sum(area) == pytest.approx(field[area].sum())
+
+
+def test_integral_rebuilt_after_data_assignment(field):
+    field.window_sums((3, 3))
+    field.data = numpy.zeros_like(field.data)
+    assert not field.window_sums((3, 3)).any()
+
+
+def test_stamp_slices():
+    field = Field((10, 8), offset=Point2((4, 2)))
+    assert field.point_to_indices(Point2((5.5, 2.5))) == (1, 0)
+    # 5x3 stamp at the lower border of the field: two rows of the stamp are cut off
+    data_slice, stamp_slice = field.stamp_slices(Point2((5.5, 2.5)), (5, 3))
+    assert data_slice == (slice(0, 4), slice(0, 2))
+    assert stamp_slice == (slice(1, 5), slice(1, 3))
+    assert field.stamp_slices(Point2((30, 30)), (5, 3)) is None
+    field.add_stamp(Point2((5.5, 2.5)), numpy.ones((5, 3)))
+    assert field.sum(Rectangle(4, 2, 10, 8)) == 8
@@ -0,0 +1,107 @@
+from types import SimpleNamespace
+
+import numpy
+import pytest
+from sc2.ids.unit_typeid import UnitTypeId
+
+from avocados.combat.focusfire import allocate_targets, get_attack_stats, WEAPONLESS_ATTACK_STATS
+
+
+def allocate(attacker_positions, attacker_stats, target_positions, target_hp, target_priorities, *,
+             target_flying=None):
+    attacker_positions = numpy.asarray(attacker_positions, dtype=float)
+    target_positions = numpy.asarray(target_positions, dtype=float)
+    if target_flying is None:
+        target_flying = numpy.zeros(len(target_positions), dtype=bool)
+    return allocate_targets(
+        attacker_positions=attacker_positions,
+        attacker_radii=numpy.full(len(attacker_positions), 0.5),
+        attacker_stats=numpy.asarray(attacker_stats, dtype=float).reshape(-1, 6),
+        target_positions=target_positions,
+        target_radii=numpy.full(len(target_positions), 0.5),
+        target_flying=numpy.asarray(target_flying, dtype=bool),
+        target_hp=numpy.asarray(target_hp, dtype=float),
+        target_armor=numpy.zeros(len(target_positions)),
+        target_priorities=numpy.asarray(target_priorities, dtype=float),
+    ).tolist()
+
+
+# Range 5, 10 damage vs ground only
+GROUND_STATS = (5, 10, 1, 0, 0, 0)
+
+
+def test_no_overkill():
+    # Two attacks kill the first target, the third attacker moves on to the next
+    assignment = allocate([(0, 0)] * 3, [GROUND_STATS] * 3, [(2, 0), (0, 2)], [15, 100], [2, 1])
+    assert assignment == [0, 0, 1]
+
+
+def test_all_targets_expected_dead():
+    # Once both targets are expected to die, the remaining attacker picks the highest priority target
+    assignment = allocate([(0, 0)] * 3, [GROUND_STATS] * 3, [(2, 0), (0, 2)], [5, 5], [1, 2])
+    assert assignment == [1, 0, 1]
+
+
+def test_fewest_options_first():
+    # The second attacker can only reach the first target and chooses first; the first attacker is left with
+    # the other target
+    assignment = allocate([(0, 0), (-4, 0)], [GROUND_STATS] * 2, [(0, 0), (4, 0)], [10, 10], [2, 1])
+    assert assignment == [1, 0]
+
+
+def test_out_of_range_unassigned():
+    # Range plus both radii is 6
+    assignment = allocate([(0, 0), (20, 0)], [GROUND_STATS] * 2, [(5.9, 0)], [100], [1])
+    assert assignment == [0, -1]
+
+
+def test_ground_weapon_cannot_target_air():
+    assignment = allocate([(0, 0)], [GROUND_STATS], [(1, 0)], [100], [1], target_flying=[True])
+    assert assignment == [-1]
+
+
+def test_armor_reduces_damage():
+    # Three attacks of 10 - 1 armor leave the 28 hp target alive
+    assignment = allocate_targets(
+        attacker_positions=numpy.zeros((4, 2)), attacker_radii=numpy.zeros(4),
+        attacker_stats=numpy.array([GROUND_STATS] * 4, dtype=float),
+        target_positions=numpy.array([[1.0, 0.0], [0.0, 1.0]]), target_radii=numpy.zeros(2),
+        target_flying=numpy.zeros(2, dtype=bool), target_hp=numpy.array([28.0, 100.0]),
+        target_armor=numpy.array([1.0, 0.0]), target_priorities=numpy.array([2.0, 1.0]))
+    assert assignment.tolist() == [0, 0, 0, 0]
+
+
+def weaponless_unit(type_id: UnitTypeId, *, can_attack_ground: bool, can_attack_air: bool, weapon_range: float
+                    ) -> SimpleNamespace:
+    """Stand-in with the Unit attributes used by get_attack_stats, without any weapons in its type data."""
+    return SimpleNamespace(type_id=type_id, _weapons=[],
+                           can_attack_ground=can_attack_ground, can_attack_air=can_attack_air,
+                           ground_range=weapon_range if can_attack_ground else 0.0,
+                           air_range=weapon_range if can_attack_air else 0.0)
+
+
+@pytest.mark.parametrize('type_id', list(WEAPONLESS_ATTACK_STATS))
+def test_weaponless_attack_stats(type_id):
+    (ground_damage, ground_attacks), (air_damage, air_attacks) = WEAPONLESS_ATTACK_STATS[type_id]
+    unit = weaponless_unit(type_id, can_attack_ground=ground_attacks > 0, can_attack_air=air_attacks > 0,
+                           weapon_range=6)
+    assert get_attack_stats(unit, air=False) == ((6, ground_damage, ground_attacks) if ground_attacks
+                                                 else (0.0, 0.0, 0))
+    assert get_attack_stats(unit, air=True) == ((6, air_damage, air_attacks) if air_attacks else (0.0, 0.0, 0))
+
+
+def test_weaponless_units_allocated():
+    battlecruiser = weaponless_unit(UnitTypeId.BATTLECRUISER, can_attack_ground=True, can_attack_air=True,
+                                    weapon_range=6)
+    oracle = weaponless_unit(UnitTypeId.ORACLE, can_attack_ground=True, can_attack_air=False, weapon_range=4)
+    stats = [get_attack_stats(unit, air=False) + get_attack_stats(unit, air=True) for unit in (battlecruiser, oracle)]
+    # The oracle cannot attack the air target
+    assignment = allocate([(0, 0), (0, 0)], stats, [(3, 0)], [100], [1], target_flying=[True])
+    assert assignment == [0, -1]
+    assignment = allocate([(0, 0), (0, 0)], stats, [(3, 0)], [100], [1], target_flying=[False])
+    assert assignment == [0, 0]
+
+
+def test_unknown_weaponless_unit():
+    unit = weaponless_unit(UnitTypeId.MARINE, can_attack_ground=True, can_attack_air=True, weapon_range=5)
+    assert get_attack_stats(unit, air=False) == (0.0, 0.0, 0)
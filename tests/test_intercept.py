@@ -0,0 +1,50 @@
+import numpy
+import pytest
+
+from avocados.geometry.intercept import get_intercept_times, get_intercept_points
+
+
+def intercept_time(position, speed, target_position, target_velocity) -> float:
+    return float(get_intercept_times(numpy.array([position], dtype=float), numpy.array([speed], dtype=float),
+                                     numpy.array([target_position], dtype=float),
+                                     numpy.array([target_velocity], dtype=float))[0])
+
+
+def test_target_moving_away_slower():
+    assert intercept_time((0, 0), 2, (10, 0), (1, 0)) == pytest.approx(10)
+
+
+def test_target_approaching():
+    assert intercept_time((0, 0), 2, (10, 0), (-3, 0)) == pytest.approx(2)
+
+
+def test_target_moving_away_faster():
+    assert numpy.isnan(intercept_time((0, 0), 1, (10, 0), (2, 0)))
+
+
+def test_equal_speed():
+    # Only the linear solution exists
+    assert intercept_time((0, 0), 1, (10, 0), (-1, 0)) == pytest.approx(5)
+    assert numpy.isnan(intercept_time((0, 0), 1, (10, 0), (1, 0)))
+
+
+def test_same_position():
+    assert intercept_time((3, 4), 1, (3, 4), (5, 0)) == 0
+
+
+def test_crossing_target():
+    # The pursuer reaches the intercept point at the same time as the target
+    position, speed, target_position, target_velocity = (0, 0), 3, (10, -5), (0, 2)
+    time = intercept_time(position, speed, target_position, target_velocity)
+    point = numpy.asarray(target_position) + time * numpy.asarray(target_velocity)
+    assert numpy.linalg.norm(point - position) == pytest.approx(speed * time)
+
+
+def test_intercept_points():
+    positions = numpy.zeros((3, 2))
+    speeds = numpy.array([2.0, 2.0, 1.0])
+    target_positions = numpy.array([[10.0, 0.0], [10.0, 0.0], [10.0, 0.0]])
+    target_velocities = numpy.array([[0.5, 0.0], [1.0, 0.0], [2.0, 0.0]])
+    points = get_intercept_points(positions, speeds, target_positions, target_velocities, max_intercept_distance=8)
+    # Lead of 20/3 * 0.5; lead of 10 limited to 8; no solution gives the target position
+    numpy.testing.assert_allclose(points, [[10 + 10 / 3, 0], [18, 0], [10, 0]])
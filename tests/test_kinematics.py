@@ -0,0 +1,107 @@
+import math
+from types import SimpleNamespace
+
+import numpy
+import pytest
+from sc2.ids.unit_typeid import UnitTypeId
+from sc2.units import Units
+
+from avocados.core.kinematics import Kinematics, GAME_LOOPS_PER_SECOND
+from avocados.core.snapshot import UnitSnapshot
+
+
+def snapshot(step: int, units: dict[int, tuple[float, float]]) -> UnitSnapshot:
+    """Snapshot of stand-in units with the attributes read by UnitSnapshot, from tag to position."""
+    return UnitSnapshot(Units([SimpleNamespace(tag=tag, position_tuple=position, radius=0.5,
+                                               type_id=UnitTypeId.MARINE) for tag, position in units.items()], None),
+                        step=step)
+
+
+def seconds(steps: int) -> float:
+    return steps / GAME_LOOPS_PER_SECOND
+
+
+def test_constant_velocity():
+    kinematics = Kinematics(history=4)
+    for step in range(0, 60, 10):
+        kinematics.update(snapshot(step, {1: (step * 0.1, 5.0), 2: (3.0, 3.0)}))
+    assert len(kinematics.history) == 4
+    speed = 1.0 / seconds(10)
+    numpy.testing.assert_allclose(kinematics.velocities, [[speed, 0], [0, 0]])
+    numpy.testing.assert_allclose(kinematics.accelerations, 0, atol=1e-9)
+    numpy.testing.assert_allclose(kinematics.speeds, [speed, 0])
+    numpy.testing.assert_allclose(kinematics.smoothed_speeds, [speed, 0])
+    assert kinematics.headings[0] == pytest.approx(0)
+    assert math.isnan(kinematics.headings[1])
+    numpy.testing.assert_array_equal(kinematics.track_lengths, [4, 4])
+    numpy.testing.assert_allclose(kinematics.extrapolate(seconds(10)), [[6.0, 5.0], [3.0, 3.0]])
+
+
+def test_constant_acceleration():
+    kinematics = Kinematics()
+    for step in (0, 10, 20):
+        kinematics.update(snapshot(step, {1: (0.0, (step / 10) ** 2)}))
+    numpy.testing.assert_allclose(kinematics.velocities, [[0, 3 / seconds(10)]])
+    numpy.testing.assert_allclose(kinematics.accelerations, [[0, 2 / seconds(10) ** 2]])
+    assert kinematics.headings[0] == pytest.approx(math.pi / 2)
+
+
+def test_linked_by_tag():
+    kinematics = Kinematics()
+    kinematics.update(snapshot(0, {1: (0.0, 0.0), 2: (10.0, 10.0)}))
+    # Rows in reverse order
+    kinematics.update(snapshot(10, {2: (10.0, 11.0), 1: (1.0, 0.0)}))
+    speed = 1.0 / seconds(10)
+    numpy.testing.assert_allclose(kinematics.velocities, [[0, speed], [speed, 0]])
+    numpy.testing.assert_allclose(kinematics.get_velocities([1, 2, 3]), [[speed, 0], [0, speed], [0, 0]])
+    assert kinematics.get_velocity(3) is None
+
+
+def test_unit_appearing_mid_window():
+    kinematics = Kinematics(history=5)
+    for step in range(0, 50, 10):
+        units = {1: (step * 0.1, 0.0)}
+        if step >= 20:
+            units[2] = (0.0, step * 0.2)
+        if step == 40:
+            units[3] = (7.0, 7.0)
+        kinematics.update(snapshot(step, units))
+    speed = 1.0 / seconds(10)
+    numpy.testing.assert_array_equal(kinematics.track_lengths, [5, 3, 1])
+    numpy.testing.assert_allclose(kinematics.velocities, [[speed, 0], [0, 2 * speed], [0, 0]])
+    # Averages only over the tracked part of the window, without NaN
+    numpy.testing.assert_allclose(kinematics.smoothed_speeds, [speed, 2 * speed, 0])
+    numpy.testing.assert_allclose(kinematics.accelerations, 0, atol=1e-9)
+    assert kinematics.headings[1] == pytest.approx(math.pi / 2)
+    assert math.isnan(kinematics.headings[2])
+
+
+def test_track_ends_at_gap():
+    kinematics = Kinematics()
+    kinematics.update(snapshot(0, {1: (0.0, 0.0)}))
+    kinematics.update(snapshot(10, {}))
+    kinematics.update(snapshot(20, {1: (50.0, 0.0)}))
+    numpy.testing.assert_array_equal(kinematics.track_lengths, [1])
+    numpy.testing.assert_allclose(kinematics.velocities, [[0, 0]])
+    kinematics.update(snapshot(30, {1: (51.0, 0.0)}))
+    numpy.testing.assert_array_equal(kinematics.track_lengths, [2])
+    numpy.testing.assert_allclose(kinematics.velocities, [[1 / seconds(10), 0]])
+
+
+def test_same_step_ignored():
+    kinematics = Kinematics()
+    kinematics.update(snapshot(0, {1: (0.0, 0.0)}))
+    kinematics.update(snapshot(10, {1: (1.0, 0.0)}))
+    kinematics.update(snapshot(10, {1: (5.0, 0.0)}))
+    assert len(kinematics.history) == 2
+    numpy.testing.assert_allclose(kinematics.positions, [[1.0, 0.0]])
+
+
+def test_empty():
+    kinematics = Kinematics()
+    assert len(kinematics) == 0
+    assert kinematics.snapshot is None
+    kinematics.update(snapshot(0, {1: (0.0, 0.0)}))
+    kinematics.update(snapshot(10, {}))
+    assert len(kinematics) == 0
+    assert kinematics.velocities.shape == (0, 2)
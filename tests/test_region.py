@@ -0,0 +1,100 @@
+import numpy
+import pytest
+from sc2.position import Point2
+
+from avocados.geometry.region import Region
+
+
+def cells(*points: tuple[float, float]) -> set[Point2]:
+    return {Point2(point) for point in points}
+
+
+def test_from_points():
+    region = Region([Point2((3.5, 4.5)), Point2((5.5, 4.5)), Point2((3.5, 4.5))])
+    assert region.size == 2
+    assert region.offset == (3, 4)
+    assert region.mask.shape == (3, 1)
+    # Cell centers give back the same points
+    assert region.points == cells((3.5, 4.5), (5.5, 4.5))
+    assert set(region) == region.points
+    assert region.center == Point2((4.5, 4.5))
+
+
+def test_size_does_not_compute_coordinates():
+    region = Region.from_mask(numpy.eye(4, dtype=bool), (10, 20))
+    assert region.size == 4
+    assert region._coordinates is None
+
+
+def test_empty():
+    region = Region()
+    assert region.size == 0
+    assert region.points == set()
+    assert Point2((0.5, 0.5)) not in region
+    with pytest.raises(RuntimeError):
+        _ = region.center
+    assert Region.from_mask(numpy.zeros((3, 3), dtype=bool)).size == 0
+
+
+def test_from_mask_crops_to_bounding_box():
+    mask = numpy.zeros((6, 5), dtype=bool)
+    mask[2, 1] = mask[3, 3] = True
+    region = Region.from_mask(mask, (10, 20))
+    assert region.offset == (12, 21)
+    assert region.mask.shape == (2, 3)
+    assert region.points == cells((12.5, 21.5), (13.5, 23.5))
+
+
+def test_from_coordinates():
+    region = Region.from_coordinates(numpy.array([[1.2, 2.9], [1.9, 2.1], [-0.5, 0.0]]))
+    assert region.points == cells((1.5, 2.5), (-0.5, 0.5))
+
+
+@pytest.mark.parametrize('point, expected', [
+    ((3.5, 4.5), True),
+    ((3.0, 4.0), True),
+    ((3.99, 4.99), True),
+    ((4.0, 4.5), False),
+    ((2.99, 4.5), False),
+    ((-3.5, -4.5), False),
+])
+def test_contains_uses_floor(point, expected):
+    region = Region([Point2((3.5, 4.5))])
+    assert (Point2(point) in region) is expected
+
+
+def test_contains_negative_coordinates():
+    region = Region([Point2((-0.5, -1.5))])
+    assert Point2((-0.2, -1.9)) in region
+    # int() would truncate -0.2 to 0
+    assert Point2((0.2, -1.5)) not in region
+
+
+@pytest.mark.parametrize('points1, points2', [
+    ([(0.5, 0.5), (1.5, 0.5), (2.5, 0.5)], [(1.5, 0.5), (5.5, 7.5)]),
+    ([(0.5, 0.5)], [(10.5, 10.5)]),
+    ([(-3.5, 2.5), (4.5, -1.5)], [(4.5, -1.5), (-3.5, 2.5)]),
+    ([], [(1.5, 1.5)]),
+    ([(1.5, 1.5)], []),
+])
+def test_set_operations(points1, points2):
+    set1, set2 = cells(*points1), cells(*points2)
+    region1, region2 = Region(set1), Region(set2)
+    assert (region1 | region2).points == set1 | set2
+    assert (region1 & region2).points == set1 & set2
+    assert (region1 - region2).points == set1 - set2
+    assert (region2 - region1).points == set2 - set1
+    assert region1.union(region2).points == set1 | set2
+    assert region1.intersection(region2).points == set1 & set2
+    assert region1.difference(region2).points == set1 - set2
+    assert (region1 | region2).size == len(set1 | set2)
+
+
+def test_bounding_rect():
+    rect = Region([Point2((1.5, 2.5)), Point2((4.5, 3.5))]).bounding_rect()
+    assert (rect.x, rect.y, rect.width, rect.height) == (1.5, 2.5, 3.0, 1.0)
+
+
+def test_random():
+    region = Region([Point2((1.5, 2.5)), Point2((4.5, 3.5))])
+    assert all(region.random() in region.points for _ in range(10))
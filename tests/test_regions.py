@@ -0,0 +1,36 @@
+import numpy
+import pytest
+from sc2.position import Point2
+
+from avocados.geometry.field import Field
+from avocados.mapdata.regions import MapRegions
+
+
+def get_two_rooms(corridor_length: int, corridor_width: int = 6) -> Field:
+    """Two 40x50 rooms joined by a straight corridor."""
+    grid = numpy.zeros((84 + corridor_length, 54), dtype=bool)
+    grid[2:42, 2:52] = True
+    grid[42 + corridor_length:82 + corridor_length, 2:52] = True
+    y0 = 27 - corridor_width // 2
+    grid[42:42 + corridor_length, y0:y0 + corridor_width] = True
+    return Field(grid, offset=Point2((0, 0)))
+
+
+@pytest.mark.parametrize('corridor_length', [2, 8, 10, 14, 20, 30])
+def test_two_rooms_with_corridor(corridor_length):
+    regions = MapRegions(get_two_rooms(corridor_length))
+    assert len(regions.regions) == 2
+    assert len(regions.chokes) == 1
+    assert regions.chokes[0].width == pytest.approx(6, abs=1)
+    room1, room2 = regions.region_at(Point2((20, 25))), regions.region_at(Point2((62 + corridor_length, 25)))
+    assert room1 is not None and room2 is not None and room1.id != room2.id
+
+
+def test_choke_hash_and_equality():
+    regions = MapRegions(get_two_rooms(10))
+    choke = regions.chokes[0]
+    assert choke == choke
+    assert choke in {choke}
+    assert {choke: 1}[choke] == 1
+    other = MapRegions(get_two_rooms(10)).chokes[0]
+    assert choke != other